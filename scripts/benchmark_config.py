@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Measure the time to parse and validate configurations with many plugins,
+using StrictYAML and using the fast loader of chrisomatic.spec.fastload.
+
+Usage: python scripts/benchmark_config.py [N ...]
+
+StrictYAML takes time which grows faster than linearly with the size of the input,
+so it is only measured for up to STRICTYAML_MAX plugins.
+"""
+
+import sys
+import time
+
+import strictyaml
+
+from chrisomatic.spec import fastload
+from chrisomatic.spec.schema import schema
+
+STRICTYAML_MAX = 1000
+
+
+def create_config(n: int) -> str:
+    lines = [
+        "on:",
+        "  cube_url: http://chris:8000/api/v1/",
+        "  chris_superuser:",
+        "    username: chris",
+        "    password: chris1234",
+        "cube:",
+        "  compute_resource:",
+        "    - name: host",
+        "      url: http://pfcon:5005/api/v1/",
+        "  plugins:",
+    ]
+    for i in range(n):
+        if i % 2 == 0:
+            lines.append(f"    - docker.io/fnndsc/pl-example{i}:1.0.{i}")
+        else:
+            lines.append(f"    - name: pl-example{i}")
+            lines.append(f"      version: 1.0.{i}")
+            lines.append(f"      dock_image: docker.io/fnndsc/pl-example{i}:1.0.{i}")
+            lines.append("      compute_resource:")
+            lines.append("        - host")
+    return "\n".join(lines) + "\n"
+
+
+def measure(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(sizes: list[int]):
+    if not fastload.is_available():
+        print("PyYAML with libyaml is not installed, only StrictYAML is measured.")
+    validate = fastload.compile_validator(schema)
+    print(f"{'plugins':>8} {'lines':>7} {'strictyaml':>12} {'fastload':>10}")
+    for n in sizes:
+        text = create_config(n)
+        slow = "-"
+        if n <= STRICTYAML_MAX:
+            slow = f"{measure(lambda: strictyaml.load(text, schema)):.3f}s"
+        fast = "-"
+        if fastload.is_available():
+            fast = f"{measure(lambda: fastload.load(text, validate)):.3f}s"
+        print(f"{n:>8} {text.count(chr(10)):>7} {slow:>12} {fast:>10}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000])
@@ -7,105 +7,214 @@ from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from typing import Sequence, Collection, Type, Optional
 
-from aiochris import ChrisAdminClient, AnonChrisClient
-from aiochris.models.data import UserData
+from aiochris import ChrisAdminClient
 from aiochris.models.public import ComputeResource
-from aiochris.types import ChrisURL
+from aiochris.types import ChrisURL, Username
 from aiodocker import Docker
 from rich.console import Console
 from rich.spinner import Spinner
 
+from chrisomatic.core.catalog import PluginCatalog, ComputeResourceIndex
+from chrisomatic.cli.caches import Caches
 from chrisomatic.core.computeenvs import ComputeResourceTask
-from chrisomatic.core.connect_peers import PeerConnectionTask
+from chrisomatic.core.connect_peers import (
+    PeerConnectionTask,
+    PeerCatalogTask,
+    PeerCatalogs,
+)
 from chrisomatic.core.create_superuser import SuperUserTask
-from chrisomatic.core.create_users import CreateUsersTask
-from chrisomatic.core.plugins import RegisterPluginTask, PluginRegistration
+from chrisomatic.core.create_users import CreateUsersTask, list_usernames
+from chrisomatic.core.docker import PullScheduler
+from chrisomatic.core.images import ImageIndex
+from chrisomatic.core.plugins import RegisterPluginTask
+from chrisomatic.framework.graph import TaskGraph
+from chrisomatic.framework.limits import ResourceLimiter, NO_LIMITS
 from chrisomatic.framework.outcome import Outcome
-from chrisomatic.framework.runner import (
-    TableTaskRunner,
-    TableDisplayConfig,
-    ProgressTaskRunner,
-)
+from chrisomatic.framework.reporter import Reporter
+from chrisomatic.framework.runner import TableDisplayConfig
+from chrisomatic.helpers.bulkusers import BulkUserCreation
+from chrisomatic.helpers.httpstats import HttpStats
+from chrisomatic.helpers.journal import Journal
 from chrisomatic.helpers.waitup import WaitUp
-from chrisomatic.spec.common import ComputeResource as GivenComputeResource, User
-from chrisomatic.spec.given import On, GivenCubePlugin
+from chrisomatic.spec.common import User
+from chrisomatic.spec.given import On, ExpandedCube
+from chrisomatic.spec.usersource import UserSource, batched
 
 
 @dataclass(frozen=True)
 class Actions:
     console: Console
+    reporter: Reporter
     chris_admin: ChrisAdminClient
+    caches: Caches = Caches()
+    limiter: ResourceLimiter = NO_LIMITS
+    http_stats: Optional[HttpStats] = None
+    verify_passwords: bool = False
+    bulk_users_threshold: int = 0
 
-    async def create_compute_resources(
+    async def provision(
         self,
-        existing: Collection[ComputeResource],
-        givens: Sequence[GivenComputeResource],
-    ) -> Sequence[tuple[Outcome, Optional[ComputeResource]]]:
-        runner = ProgressTaskRunner(
-            title="Adding compute resources",
-            tasks=[
-                ComputeResourceTask(self.chris_admin, given, existing)
-                for given in givens
-            ],
-            console=self.console,
-        )
-        return await runner.apply()
+        docker: Optional[Docker],
+        existing_compute_resources: Collection[ComputeResource],
+        cube: ExpandedCube,
+        peer_urls: Sequence[ChrisURL],
+        images: Optional[ImageIndex] = None,
+        pulls: Optional[PullScheduler] = None,
+    ) -> Sequence[tuple[Outcome, object]]:
+        """
+        Connect to peers, create compute resources and users, and register plugins,
+        all at once.
 
-    async def create_users(
-        self,
-        users: Sequence[User],
-        progress_title: str,
-    ) -> Sequence[tuple[Outcome, UserData]]:
-        runner = ProgressTaskRunner(
-            tasks=[
-                CreateUsersTask(self.chris_admin.url, user, self.connector)
-                for user in users
-            ],
-            title=progress_title,
-            console=self.console,
-        )
-        return await runner.apply()
-
-    async def discover_peers(
-        self, peer_urls: Collection[ChrisURL], progress_title: str
-    ) -> Sequence[AnonChrisClient]:
-        runner = ProgressTaskRunner(
-            tasks=[
-                PeerConnectionTask(url, connector=self.connector, connector_owner=False)
-                for url in peer_urls
-            ],
-            title=progress_title,
-            console=self.console,
-            noisy=False,
-            transient=True,
+        Each plugin is registered as soon as the peers were connected to and
+        the compute resources it names were created. Users do not depend on
+        anything else. Outcomes of connecting to peers are not returned.
+
+        Unless `verify_passwords`, existing users are found by listing all users once,
+        instead of logging in as every user. If at least `bulk_users_threshold`
+        users are missing and CUBE runs in Docker, they are created in the CUBE
+        container all at once.
+        """
+        existing_users = await self._list_existing_users() if cube.users else None
+        graph = TaskGraph()
+        compute_resources = {
+            given.name: graph.add(
+                ComputeResourceTask(
+                    self.chris_admin, given, existing_compute_resources, self.limiter
+                )
+            )
+            for given in cube.compute_resource
+        }
+        for task in self._create_users_tasks(docker, cube.users, existing_users):
+            graph.add(task)
+        peers = PeerCatalogs(peer_urls)
+        peer_nodes = [
+            graph.add(self._peer_catalog_task(url, peers)) for url in peer_urls
+        ]
+        catalog = PluginCatalog(self.chris_admin, limiter=self.limiter)
+        plugin_compute_resources = ComputeResourceIndex(
+            self.chris_admin, existing_compute_resources, limiter=self.limiter
         )
+        for plugin in cube.plugins:
+            task = RegisterPluginTask(
+                plugin=plugin,
+                other_stores=peers,
+                docker=docker,
+                cube=self.chris_admin,
+                catalog=catalog,
+                descriptions=self.caches.descriptions,
+                limiter=self.limiter,
+                images=images,
+                pulls=pulls,
+                compute_resources=plugin_compute_resources,
+            )
+            after = (
+                *peer_nodes,
+                *(
+                    compute_resources[name]
+                    for name in plugin.compute_resource
+                    if name in compute_resources
+                ),
+            )
+            graph.add(task, after)
+        runner = self.reporter.table(graph.nodes)
         results = await runner.apply()
+        if broken := peers.broken():
+            self.console.print(f"[yellow]WARNING[/yellow]: broken peer {broken}")
+        return [
+            result
+            for node, result in zip(graph.nodes, results)
+            if node not in peer_nodes
+        ]
 
-        good = [client for outcome, client in results if outcome is not Outcome.FAILED]
-        bad = frozenset(peer_urls) - frozenset(client.url for client in good)
-        if bad:
-            self.console.print(f"[yellow]WARNING[/yellow]: broken peer {bad}")
-        return good
+    async def provision_users_from(
+        self,
+        docker: Optional[Docker],
+        source: UserSource,
+        journal: Optional[Journal] = None,
+        batch_size: int = 500,
+    ) -> dict[Outcome, int]:
+        """
+        Create the users of a file, `batch_size` users at a time, so that only
+        one batch is in memory. Only the number of each outcome is kept.
+
+        For the same reason, the existing users of CUBE are not listed. Whether
+        the users of a batch exist is checked by creating them in the CUBE
+        container, which only looks up the users of the batch, or otherwise
+        by logging in as each of them.
+
+        After every batch, a checkpoint is written to `journal`, and users which
+        were done according to the journal are skipped. Checkpoints stop advancing
+        after a user fails, so that failed users are tried again when resuming.
+        """
+        counts = {outcome: 0 for outcome in Outcome}
+        fingerprint = source.fingerprint()
+        done = 0 if journal is None else journal.done(fingerprint)
+        if done > 0:
+            self.console.print(f"Resuming after {done} users of {source.path}")
+        for batch in batched(source.read(skip=done), batch_size):
+            tasks = self._create_users_tasks(docker, batch, None)
+            runner = self.reporter.progress(
+                tasks,
+                title=f"Creating users {done + 1}-{done + len(batch)}...",
+                noisy=False,
+                transient=True,
+            )
+            results = await runner.apply()
+            for user, (outcome, _) in zip(batch, results):
+                counts[outcome] += 1
+                if outcome is Outcome.FAILED:
+                    self.console.print(
+                        f"[red]Failed to create user[/red] {user.username}"
+                    )
+            done += len(batch)
+            if journal is not None and counts[Outcome.FAILED] == 0:
+                journal.checkpoint(fingerprint, done)
+        return counts
 
-    async def register_plugins(
+    async def _list_existing_users(self) -> Optional[frozenset[Username]]:
+        if self.verify_passwords:
+            return None
+        return await list_usernames(self.chris_admin, limiter=self.limiter)
+
+    def _create_users_tasks(
         self,
-        docker: Docker,
-        plugins: Sequence[GivenCubePlugin],
-        peers: Sequence[AnonChrisClient],
-    ) -> Sequence[tuple[Outcome, PluginRegistration]]:
-        runner = TableTaskRunner(
-            tasks=[
-                RegisterPluginTask(
-                    plugin=p,
-                    other_stores=peers,
-                    docker=docker,
-                    cube=self.chris_admin,
-                )
-                for p in plugins
-            ],
-            console=self.console,
+        docker: Optional[Docker],
+        users: Sequence[User],
+        existing_users: Optional[frozenset[Username]],
+    ) -> Sequence[CreateUsersTask]:
+        bulk = None
+        if not self.verify_passwords:
+            missing = [
+                user
+                for user in users
+                if existing_users is None or user.username not in existing_users
+            ]
+            if docker and 0 < self.bulk_users_threshold <= len(missing):
+                bulk = BulkUserCreation(docker, missing, self.limiter)
+        return [
+            CreateUsersTask(
+                self.chris_admin.url,
+                user,
+                self.connector,
+                self.limiter,
+                self.http_stats,
+                existing_users,
+                bulk,
+            )
+            for user in users
+        ]
+
+    def _peer_catalog_task(
+        self, url: ChrisURL, catalogs: PeerCatalogs
+    ) -> PeerCatalogTask:
+        connection = PeerConnectionTask(
+            url,
+            connector=self.connector,
+            connector_owner=False,
+            cache=self.caches.peers,
+            limiter=self.limiter,
         )
-        return await runner.apply()
+        return PeerCatalogTask(connection, catalogs, self.http_stats)
 
     @property
     def connector(self):
@@ -115,6 +224,12 @@ class Actions:
 @dataclass(frozen=True)
 class PreActions:
     console: Console
+    reporter: Reporter
+    caches: Caches = Caches()
+    limiter: ResourceLimiter = NO_LIMITS
+    http_stats: Optional[HttpStats] = None
+    verify_passwords: bool = False
+    bulk_users_threshold: int = 0
 
     async def wait_for_backends(self, cube_url: ChrisURL):
         all_urls = [cube_url]
@@ -128,14 +243,13 @@ class PreActions:
         interval: float = 2.0,
         timeout: float = 300.0,
     ) -> tuple[bool, Sequence[float]]:
-        runner = TableTaskRunner(
+        runner = self.reporter.table(
+            [WaitUp(url, good_status, interval, timeout) for url in urls],
             config=TableDisplayConfig(
                 spinner=Spinner("aesthetic"),
                 spinner_width=12,
                 polling_interval=interval / 4,
             ),
-            tasks=[WaitUp(url, good_status, interval, timeout) for url in urls],
-            console=self.console,
         )
         results = await runner.apply()
         all_good = all(outcome != Outcome.FAILED for outcome, _ in results)
@@ -146,9 +260,20 @@ class PreActions:
         self, on: On, docker: Docker
     ) -> tuple[Outcome, Optional[Actions]]:
         task = SuperUserTask(on=on, docker=docker)
-        runner = TableTaskRunner(tasks=[task], console=self.console)
+        runner = self.reporter.table([task])
         (result,) = await runner.apply()
         outcome, superuser_client = result
         if outcome is Outcome.FAILED:
             return outcome, None
-        return outcome, Actions(console=self.console, chris_admin=superuser_client)
+        if self.http_stats is not None:
+            self.http_stats.attach(superuser_client.s)
+        return outcome, Actions(
+            console=self.console,
+            reporter=self.reporter,
+            chris_admin=superuser_client,
+            caches=self.caches,
+            limiter=self.limiter,
+            http_stats=self.http_stats,
+            verify_passwords=self.verify_passwords,
+            bulk_users_threshold=self.bulk_users_threshold,
+        )
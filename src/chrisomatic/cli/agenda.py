@@ -1,102 +1,198 @@
 import asyncio
+import sys
 from typing import Sequence, Optional, Iterable
 
+import aiohttp
 import typer
-from aiodocker import Docker
+from aiochris.errors import InternalServerError
+from aiochris.types import ImageTag
+from aiodocker import Docker, DockerError
 from rich.console import Console
 from rich.text import Text
 
 from chrisomatic.cli.actions import PreActions
+from chrisomatic.cli.caches import Caches
 from chrisomatic.cli.final_result import FinalResult
+from chrisomatic.cli.options import Options, OutputFormat
 from chrisomatic.core.expand import smart_expand_config
+from chrisomatic.core.docker import PullScheduler
+from chrisomatic.core.images import ImageIndex
+from chrisomatic.framework.limits import ResourceLimiter, Resource
+from chrisomatic.framework.metrics import Metrics
+from chrisomatic.framework.ndjson import NdjsonWriter
 from chrisomatic.framework.outcome import Outcome
+from chrisomatic.framework.reporter import Reporter, RichReporter, NdjsonReporter
+from chrisomatic.helpers.httpstats import HttpStats, EndpointStats
+from chrisomatic.helpers.journal import Journal
+from chrisomatic.helpers.pldesc import CacheStats
 from chrisomatic.spec.common import User
-from chrisomatic.spec.given import GivenConfig, ValidationError
+from chrisomatic.spec.given import GivenConfig, GivenCube, ValidationError
+from chrisomatic.spec.usersource import UserSource
 
 
-async def agenda(given_config: GivenConfig, console: Console) -> FinalResult:
+async def agenda(
+    given_config: GivenConfig, console: Console, options: Options = Options()
+) -> FinalResult:
     docker = _maybe_docker(console)
-    pre_actions = PreActions(console)
+    caches = Caches.from_options(options)
+    limiter = ResourceLimiter.from_overrides(
+        {Resource(k): v for k, v in given_config.concurrency.items()},
+        options.limits,
+        adaptive=(
+            {Resource.CUBE_HTTP: _is_cube_congestion} if options.adaptive else None
+        ),
+    )
+    metrics = Metrics()
+    reporter = _create_reporter(console, options.output, metrics)
+    http_stats = None
+    if options.http_stats or options.http_stats_file is not None:
+        http_stats = HttpStats()
+    pre_actions = PreActions(
+        console,
+        reporter,
+        caches=caches,
+        limiter=limiter,
+        http_stats=http_stats,
+        verify_passwords=options.verify_passwords,
+        bulk_users_threshold=options.bulk_users_threshold,
+    )
     closables = []
     if docker:
         closables.append(docker)
 
+    # Expanding the config only depends on Docker, so it is done in the background
+    # while waiting for CUBE.
+    # Local images are listed once, and shared by expansion and plugin registration.
+    images = ImageIndex(docker) if docker else None
+    expansion = asyncio.create_task(smart_expand_config(given_config, docker, images))
+    # Pulls of the same image are merged, and limited by the docker_pull limit.
+    pulls = None
+    if docker:
+        pulls = PullScheduler(
+            docker, limiter.limits[Resource.DOCKER_PULL], images, options.pull_detail
+        )
+        # Images of plugins might be needed later, so they can be pulled already
+        # while waiting for CUBE.
+        if options.prefetch:
+            pulls.prefetch(_named_images(given_config.cube))
+
     async def close_all():
+        expansion.cancel()
+        if expansion.done() and not expansion.cancelled():
+            expansion.exception()  # reported, or the run was aborted before
+        if pulls is not None:
+            await pulls.close()
         closings = (client.close() for client in closables)
         await asyncio.gather(*closings)
+        caches.save()
+        if options.metrics_file is not None:
+            for resource, adaptive_limit in limiter.adaptive_limits.items():
+                metrics.adaptive_limits[resource.value] = adaptive_limit.trajectory
+            metrics.write(options.metrics_file)
+        if options.http_stats_file is not None:
+            http_stats.write(options.http_stats_file)
 
     # ------------------------------------------------------------
     # Wait for CUBE and friends to come online
     # ------------------------------------------------------------
     console.rule("[bold blue]Waiting for Backend Servers")
-    all_good, _ = await pre_actions.wait_for_backends(given_config.on.cube_url)
+    with metrics.phase("backends"):
+        all_good, _ = await pre_actions.wait_for_backends(given_config.on.cube_url)
     if not all_good:
         await close_all()
         raise typer.Abort()
 
+    # An invalid config aborts the run before anything is created.
+    try:
+        with metrics.phase("expand_config"):
+            config = await expansion
+    except (ValidationError, DockerError, aiohttp.ClientError) as e:
+        console.print(e)
+        await close_all()
+        raise typer.Abort()
+
     # ------------------------------------------------------------
     # Create superuser account if necessary
     # ------------------------------------------------------------
     console.rule("[bold blue]Creating Superuser Account")
-    superuser_creation, actions = await pre_actions.create_super_client(
-        given_config.on, docker
-    )
+    with metrics.phase("superuser"):
+        superuser_creation, actions = await pre_actions.create_super_client(
+            given_config.on, docker
+        )
     if superuser_creation == Outcome.FAILED:
         await close_all()
         raise typer.Abort()
     closables.append(actions.chris_admin)
 
     # ------------------------------------------------------------
-    # Add compute resources
+    # Connect to peers, add compute resources, create users, and register plugins
     # ------------------------------------------------------------
-    console.rule("[bold blue]Compute Resources")
-    existing_compute_resources = await actions.chris_admin.get_all_compute_resources()
-    create_compute_resources_results = await actions.create_compute_resources(
-        existing_compute_resources, given_config.cube.compute_resource
-    )
-
-    # ------------------------------------------------------------
-    # Create users
-    # ------------------------------------------------------------
-    console.rule("[bold blue]Creating Users")
-    user_creation = await actions.create_users(
-        given_config.cube.users,
-        "creating users in CUBE...",
-    )
-
-    # ------------------------------------------------------------
-    # Register plugins to CUBE
-    # ------------------------------------------------------------
-    console.rule("[bold blue]Registering plugins to CUBE")
-    try:
-        config = await smart_expand_config(given_config, docker)
-    except ValidationError as e:
-        console.print(e)
-        await close_all()
-        raise typer.Abort()
-
-    peer_clients = await actions.discover_peers(
-        config.on.public_store, "Connecting to peers..."
-    )
-    plugin_registrations = await actions.register_plugins(
-        docker, config.cube.plugins, peer_clients
+    console.rule("[bold blue]Compute Resources, Users, and Plugins")
+    with metrics.phase("provision"):
+        existing_compute_resources = (
+            await actions.chris_admin.get_all_compute_resources()
+        )
+        provisions = await actions.provision(
+            docker,
+            existing_compute_resources,
+            config.cube,
+            config.on.public_store,
+            images,
+            pulls,
+        )
+    # tasks of the provision phase run at the same time, so it is broken down by kind
+    metrics.task_phases(
+        {
+            "PeerConnectionTask": "provision.peers",
+            "ComputeResourceTask": "provision.compute_resources",
+            "CreateUsersTask": "provision.users",
+            "RegisterPluginTask": "provision.plugins",
+        }
     )
+    user_counts = None
+    if options.users_from is not None:
+        journal = None
+        if options.users_journal is not None:
+            journal = Journal(options.users_journal)
+        try:
+            with metrics.phase("users_from"):
+                user_counts = await actions.provision_users_from(
+                    docker,
+                    UserSource(options.users_from),
+                    journal,
+                    options.users_batch_size,
+                )
+        except (ValidationError, OSError) as e:
+            console.print(e)
+            await close_all()
+            raise typer.Abort()
 
     # ------------------------------------------------------------
     # Finish up
     # ------------------------------------------------------------
 
-    all_outcomes = _count_outcomes(
-        (
-            superuser_creation,
-            *(o for o, _ in create_compute_resources_results),
-            *(o for o, _ in user_creation),
-            *(o for o, _ in plugin_registrations),
-        )
-    )
-    console.rule(_to_summary(all_outcomes))
+    all_outcomes = _count_outcomes((superuser_creation, *(o for o, _ in provisions)))
+    if user_counts is not None:
+        all_outcomes = {o: n + user_counts[o] for o, n in all_outcomes.items()}
+    summary = _to_summary(all_outcomes)
+    description_cache_stats = None
+    if caches.descriptions is not None:
+        description_cache_stats = caches.descriptions.stats
+        summary.append_text(_to_cache_summary(description_cache_stats))
+    if http_stats is not None:
+        summary.append_text(_to_http_summary(http_stats.total()))
+    console.rule(summary)
+    reporter.finish(all_outcomes)
     await close_all()
-    return FinalResult(summary=all_outcomes)
+    return FinalResult(summary=all_outcomes, description_cache=description_cache_stats)
+
+
+def _named_images(cube: GivenCube) -> list[ImageTag]:
+    """
+    Get the images named by the plugins of `cube`, without duplicates.
+    """
+    plugins = (cube.resolve_plugin_type(plugin) for plugin in cube.plugins)
+    return list(dict.fromkeys(p.dock_image for p in plugins if p.dock_image))
 
 
 def _count_outcomes(outcomes: Iterable[Outcome]) -> dict[Outcome, int]:
@@ -118,6 +214,49 @@ def _to_summary(outcomes: dict[Outcome, int]) -> Text:
     return summary
 
 
+def _to_cache_summary(stats: CacheStats) -> Text:
+    summary = Text(style="dim")
+    summary.append(" (description cache: ")
+    summary.append(f"{stats.hits} hits, {stats.misses} misses, ")
+    summary.append(f"{stats.bytes_read} bytes read, ")
+    summary.append(f"{stats.bytes_written} bytes written)")
+    return summary
+
+
+def _to_http_summary(stats: EndpointStats) -> Text:
+    summary = Text(style="dim")
+    summary.append(f" (HTTP: {stats.requests} requests, ")
+    summary.append(f"{stats.retries} retries, {stats.errors} errors, ")
+    summary.append(f"{stats.bytes_received} bytes received, ")
+    summary.append(f"{stats.reused_connections} reused connections, ")
+    summary.append(f"p50 {stats.percentile(50) * 1000:.0f}ms, ")
+    summary.append(f"p99 {stats.percentile(99) * 1000:.0f}ms)")
+    return summary
+
+
+def _is_cube_congestion(e: BaseException) -> bool:
+    """
+    Whether an error means that CUBE is overloaded.
+    """
+    return isinstance(
+        e,
+        (
+            InternalServerError,
+            aiohttp.ServerDisconnectedError,
+            aiohttp.ClientOSError,
+            asyncio.TimeoutError,
+        ),
+    )
+
+
+def _create_reporter(
+    console: Console, output: OutputFormat, metrics: Metrics
+) -> Reporter:
+    if output is OutputFormat.ndjson:
+        return NdjsonReporter(NdjsonWriter(sys.stdout), metrics)
+    return RichReporter(console, metrics)
+
+
 def _maybe_docker(console: Console) -> Optional[Docker]:
     try:
         docker = Docker()
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import Optional, Self
+
+from chrisomatic.cli.options import Options
+from chrisomatic.core.catalog import PeerCatalogCache
+from chrisomatic.helpers.diskcache import DiskCache
+from chrisomatic.helpers.pldesc import DescriptionCache
+
+
+@dataclass(frozen=True)
+class Caches:
+    """
+    Persistent caches used during a run of chrisomatic.
+    """
+
+    peers: Optional[PeerCatalogCache] = None
+    descriptions: Optional[DescriptionCache] = None
+
+    @classmethod
+    def from_options(cls, options: Options) -> Self:
+        if options.cache_dir is None:
+            return cls()
+        return cls(
+            peers=PeerCatalogCache(
+                DiskCache(options.cache_dir / "peers"), ttl=options.cache_ttl
+            ),
+            descriptions=DescriptionCache(
+                DiskCache(options.cache_dir / "descriptions")
+            ),
+        )
+
+    def save(self) -> None:
+        """
+        Write what is only kept in memory during a run to disk.
+        """
+        if self.descriptions is not None:
+            self.descriptions.save()
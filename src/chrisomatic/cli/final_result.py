@@ -1,10 +1,14 @@
 from dataclasses import dataclass
+from typing import Optional
+
 from serde import serialize
 
 from chrisomatic.framework.outcome import Outcome
+from chrisomatic.helpers.pldesc import CacheStats
 
 
 @serialize
 @dataclass(frozen=True)
 class FinalResult:
     summary: dict[Outcome, int]
+    description_cache: Optional[CacheStats] = None
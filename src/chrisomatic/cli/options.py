@@ -0,0 +1,54 @@
+import enum
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from chrisomatic.framework.limits import Resource
+
+
+class OutputFormat(str, enum.Enum):
+    rich = "rich"
+    """Live display for a terminal."""
+    ndjson = "ndjson"
+    """One JSON object per line, for machines."""
+
+
+@dataclass(frozen=True)
+class Options:
+    """
+    Settings for `chrisomatic apply` which are given as command-line options.
+    """
+
+    cache_dir: Optional[Path] = None
+    """Directory of the persistent cache. If `None`, caching is disabled."""
+    cache_ttl: float = 3600.0
+    """Seconds during which cached data of peers are used without revalidation."""
+    limits: dict[Resource, int] = field(default_factory=dict)
+    """Limits on concurrent operations, which take precedence over the configuration file."""
+    output: OutputFormat = OutputFormat.rich
+    """How the progress of tasks is reported."""
+    metrics_file: Optional[Path] = None
+    """If given, timing information is written to this file at the end of the run."""
+    http_stats: bool = False
+    """Whether to collect statistics about HTTP requests and show them in the summary."""
+    http_stats_file: Optional[Path] = None
+    """If given, statistics about HTTP requests are written to this file as JSON."""
+    verify_passwords: bool = False
+    """Whether to check that existing users can log in with their given passwords."""
+    adaptive: bool = True
+    """Whether the concurrency of requests to CUBE adapts to how well CUBE copes."""
+    bulk_users_threshold: int = 50
+    """
+    Minimum number of users to create for them to be created in the CUBE container
+    instead of over HTTP. If `0`, users are always created over HTTP.
+    """
+    users_from: Optional[Path] = None
+    """CSV or NDJSON file of users to create, in addition to `cube.users`."""
+    users_journal: Optional[Path] = None
+    """If given, progress through `users_from` is saved to this file and resumed from."""
+    users_batch_size: int = 500
+    """Number of users of `users_from` which are created at a time."""
+    pull_detail: bool = False
+    """Whether to show the progress of each layer of images being pulled."""
+    prefetch: bool = False
+    """Whether to start pulling the images of plugins while waiting for CUBE."""
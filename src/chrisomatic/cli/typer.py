@@ -1,16 +1,17 @@
-import asyncio
 import sys
 from pathlib import Path
+from typing import Optional
 
 import typer
-from rich.console import Console
-from strictyaml import YAMLValidationError
 
 from chrisomatic.cli import Gstr_title
-from chrisomatic.cli.agenda import agenda as apply_from_config
-from chrisomatic.framework.outcome import Outcome
-from chrisomatic.spec.deserialize import deserialize_config
-from chrisomatic.spec.given import ValidationError
+from chrisomatic.cli.options import Options, OutputFormat
+from chrisomatic.framework.limits import Resource, parse_limit
+from chrisomatic.helpers.diskcache import default_cache_dir
+
+# Modules which are slow to import (aiohttp, aiochris, aiodocker, rich, serde and
+# strictyaml) are imported in `apply`, so that `chrisomatic --help` starts quickly.
+# tests/chrisomatic/test_startup.py checks that they are not imported too early.
 
 app = typer.Typer(add_completion=False)
 
@@ -30,10 +31,124 @@ def apply(
         default="chrisomatic.yml",
         help="configuration file.",
     ),
+    cache_dir: Path = typer.Option(
+        default_cache_dir(),
+        "--cache-dir",
+        file_okay=False,
+        help="Directory where data are cached between runs.",
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Do not read nor write the cache."
+    ),
+    cache_config: bool = typer.Option(
+        False,
+        "--cache-config",
+        help="Also cache the deserialized configuration file. "
+        "Cached configurations contain its passwords.",
+    ),
+    cache_ttl: float = typer.Option(
+        3600.0,
+        "--cache-ttl",
+        help="Seconds for which cached data are used without revalidation.",
+    ),
+    limit: list[str] = typer.Option(
+        [],
+        "--limit",
+        metavar="RESOURCE=N",
+        help="Maximum number of concurrent operations on a resource, "
+        "e.g. docker_pull=2. Resources are: " + ", ".join(r.value for r in Resource),
+    ),
+    output: OutputFormat = typer.Option(
+        OutputFormat.rich,
+        "--output",
+        help="Show a live display (rich), "
+        "or write events to stdout as newline-delimited JSON (ndjson).",
+    ),
+    metrics_file: Optional[Path] = typer.Option(
+        None,
+        "--metrics-file",
+        dir_okay=False,
+        help="Write timing of tasks and phases to this file, "
+        "in the Prometheus text format if its name ends with .prom, otherwise as JSON.",
+    ),
+    http_stats: bool = typer.Option(
+        False,
+        "--http-stats",
+        help="Count HTTP requests, and show the totals in the summary.",
+    ),
+    http_stats_file: Optional[Path] = typer.Option(
+        None,
+        "--http-stats-file",
+        dir_okay=False,
+        help="Write statistics about HTTP requests by endpoint to this file as JSON.",
+    ),
+    verify_passwords: bool = typer.Option(
+        False,
+        "--verify-passwords",
+        help="Log in as every existing user to check their passwords, "
+        "instead of only checking that their usernames exist.",
+    ),
+    no_adaptive: bool = typer.Option(
+        False,
+        "--no-adaptive",
+        help="Use a fixed limit for concurrent requests to CUBE, "
+        "instead of adapting it to latency and errors.",
+    ),
+    bulk_users_threshold: int = typer.Option(
+        50,
+        "--bulk-users-threshold",
+        min=0,
+        help="Create users in the CUBE container, instead of over HTTP, "
+        "if at least this many users need to be created. 0 to always use HTTP.",
+    ),
+    users_from: Optional[Path] = typer.Option(
+        None,
+        "--users-from",
+        exists=True,
+        dir_okay=False,
+        help="Also create the users of this file: CSV with a header, "
+        "or NDJSON if its name ends with .ndjson or .jsonl. "
+        "Fields are username, password and email (optional).",
+    ),
+    users_journal: Optional[Path] = typer.Option(
+        None,
+        "--users-journal",
+        dir_okay=False,
+        help="Save progress through --users-from to this file, "
+        "and resume from it if a previous run stopped.",
+    ),
+    users_batch_size: int = typer.Option(
+        500,
+        "--users-batch-size",
+        min=1,
+        help="Number of users of --users-from to create at a time.",
+    ),
+    pull_detail: bool = typer.Option(
+        False,
+        "--pull-detail",
+        help="Show the progress of every layer of images being pulled, "
+        "instead of only the totals.",
+    ),
+    prefetch: bool = typer.Option(
+        False,
+        "--prefetch",
+        help="Start pulling the images of plugins while waiting for CUBE, "
+        "in case they are needed to obtain plugin descriptions.",
+    ),
 ):
     """
     ChRIS backend provisioner.
     """
+    import asyncio
+
+    from rich.console import Console
+
+    from chrisomatic.cli.agenda import agenda as apply_from_config
+    from chrisomatic.framework.outcome import Outcome
+    from chrisomatic.spec.configcache import ConfigCache
+    from chrisomatic.spec.deserialize import deserialize_config
+    from chrisomatic.spec.given import ValidationError
+
     if file == Path("-"):
         input_config = sys.stdin.read()
         filename = "<stdin>"
@@ -41,16 +156,45 @@ def apply(
         input_config = file.read_text()
         filename = str(file)
 
-    console = Console(force_terminal=(True if tty else None))
+    # stdout is reserved for events if output is ndjson
+    console = Console(
+        force_terminal=(True if tty else None),
+        stderr=output is OutputFormat.ndjson,
+    )
 
+    config_cache = None
+    if cache_config and not no_cache:
+        config_cache = ConfigCache(cache_dir / "configs")
     try:
-        config = deserialize_config(input_config, filename, console)
-    except (ValidationError, YAMLValidationError) as e:
-        print(e)
+        config = deserialize_config(input_config, filename, console, config_cache)
+    except ValidationError as e:
+        print(e, file=sys.stderr)
         raise typer.Abort()
 
+    try:
+        limits = dict(parse_limit(s) for s in limit)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--limit")
+    options = Options(
+        cache_dir=None if no_cache else cache_dir,
+        cache_ttl=cache_ttl,
+        limits=limits,
+        output=output,
+        metrics_file=metrics_file,
+        http_stats=http_stats,
+        http_stats_file=http_stats_file,
+        verify_passwords=verify_passwords,
+        adaptive=not no_adaptive,
+        bulk_users_threshold=bulk_users_threshold,
+        users_from=users_from,
+        users_journal=users_journal,
+        users_batch_size=users_batch_size,
+        pull_detail=pull_detail,
+        prefetch=prefetch,
+    )
+
     console.print(Gstr_title)
-    final_result = asyncio.run(apply_from_config(config, console))
+    final_result = asyncio.run(apply_from_config(config, console, options))
     if final_result.summary[Outcome.FAILED] > 0:
         raise typer.Exit(1)
 
@@ -0,0 +1,316 @@
+"""
+Indexes of the plugins of a CUBE, in memory and on disk.
+"""
+
+import asyncio
+import dataclasses
+import time
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar, Optional, Sequence, Any
+
+import aiohttp
+import yarl
+from aiochris.client.base import BaseChrisClient
+from aiochris.errors import raise_for_status, BaseClientError
+from aiochris.link.linked import deserialize_linked
+from aiochris.models.public import PublicPlugin, ComputeResource
+from aiochris.types import ChrisURL, ComputeResourceName, PluginId
+from serde import serde, from_dict, to_dict
+
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
+from chrisomatic.helpers.diskcache import DiskCache
+
+P = TypeVar("P", bound=PublicPlugin)
+
+_SEARCHABLE_FIELDS = ("name_exact", "version", "dock_image")
+"""
+Query parameters of `GET /api/v1/plugins/search/` which are answered by `PluginCatalog`.
+Other parameters (such as `public_repo`) are ignored, same as how CUBE ignores them.
+"""
+
+
+@dataclass
+class PluginCatalog(Generic[P]):
+    """
+    A `PluginCatalog` pages through the list of all plugins of a CUBE once,
+    then answers plugin searches by (name, version, dock_image) from memory.
+
+    The list of plugins is retrieved the first time `search` is called.
+    A `PluginCatalog` is meant to be shared by every task of a run.
+
+    `resource` of `limiter` is held during each request for a page of plugins,
+    not while waiting for the list of plugins or while searching it.
+    """
+
+    client: BaseChrisClient
+    page_size: int = 100
+    cache: Optional["PeerCatalogCache"] = None
+    """
+    Persistent cache of the plugin list. Should only be used for peers,
+    since chrisomatic does not modify their plugins.
+    """
+    limiter: ResourceLimiter = NO_LIMITS
+    resource: Resource = Resource.CUBE_HTTP
+
+    _plugins: list[P] = field(init=False, default_factory=list)
+    _by_name: dict[str, list[P]] = field(init=False, default_factory=dict)
+    _by_image: dict[str, list[P]] = field(init=False, default_factory=dict)
+    _loaded: bool = field(init=False, default=False)
+    _lock: asyncio.Lock = field(init=False, default_factory=asyncio.Lock)
+
+    @property
+    def url(self) -> ChrisURL:
+        return self.client.url
+
+    async def search(self, query: dict[str, str]) -> Optional[P]:
+        """
+        Get the first plugin which matches the given query.
+        The semantics are the same as `client.search_plugins(**query).first()`.
+        """
+        await self.load()
+        candidates = self._candidates_for(query)
+        return next((p for p in candidates if self._matches(p, query)), None)
+
+    async def load(self) -> None:
+        """
+        Retrieve the list of all plugins, if not retrieved already.
+        """
+        async with self._lock:
+            if self._loaded:
+                return
+            await self._load_all()
+            self._loaded = True
+
+    async def _load_all(self) -> None:
+        search = self.client.search_plugins(limit=self.page_size)
+        if self.cache is None:
+            items = await get_all_results(
+                self.client, search.url, self.limiter, self.resource
+            )
+        else:
+            items = await self.cache.get_plugins(
+                self.client, search.url, self.limiter, self.resource
+            )
+        for item in items:
+            self.add(deserialize_linked(self.client, search.Item, dict(item)))
+
+    def add(self, plugin: P) -> None:
+        """
+        Add a plugin to this catalog, e.g. after it was registered.
+        """
+        self._plugins.append(plugin)
+        self._by_name.setdefault(plugin.name, []).append(plugin)
+        self._by_image.setdefault(plugin.dock_image, []).append(plugin)
+
+    def _candidates_for(self, query: dict[str, str]) -> Sequence[P]:
+        if "name_exact" in query:
+            return self._by_name.get(query["name_exact"], [])
+        if "dock_image" in query:
+            return self._by_image.get(query["dock_image"], [])
+        return self._plugins
+
+    @staticmethod
+    def _matches(plugin: P, query: dict[str, str]) -> bool:
+        return all(
+            _get_field(plugin, k) == query[k] for k in _SEARCHABLE_FIELDS if k in query
+        )
+
+
+@dataclass
+class ComputeResourceIndex:
+    """
+    The compute resources of the plugins of a CUBE, found by listing the plugins
+    of each compute resource once, instead of the compute resources of each plugin.
+
+    Only `compute_resources` are indexed. They should be the compute resources
+    which existed before any plugin was registered, since compute resources
+    which are created later have no plugins yet.
+    The index is retrieved the first time `get` is called.
+    """
+
+    client: BaseChrisClient
+    compute_resources: Sequence[ComputeResource]
+    page_size: int = 100
+    limiter: ResourceLimiter = NO_LIMITS
+
+    _by_plugin: dict[PluginId, set[ComputeResourceName]] = field(
+        init=False, default_factory=dict
+    )
+    _supported: Optional[bool] = field(init=False, default=None)
+    _lock: asyncio.Lock = field(init=False, default_factory=asyncio.Lock)
+
+    async def get(
+        self, plugin_id: PluginId
+    ) -> Optional[frozenset[ComputeResourceName]]:
+        """
+        Get the names of the indexed compute resources which a plugin is registered to.
+        Returns `None` if this CUBE cannot search for plugins by compute resource.
+        """
+        async with self._lock:
+            if self._supported is None:
+                self._supported = await self._load()
+        if not self._supported:
+            return None
+        return frozenset(self._by_plugin.get(plugin_id, ()))
+
+    async def _load(self) -> bool:
+        try:
+            if not await self._is_filter_supported():
+                return False
+            for compute_resource in self.compute_resources:
+                search = self.client.search_plugins(
+                    compute_resource_id=compute_resource.id, limit=self.page_size
+                )
+                items = await get_all_results(self.client, search.url, self.limiter)
+                for item in items:
+                    names = self._by_plugin.setdefault(item["id"], set())
+                    names.add(compute_resource.name)
+        except (BaseClientError, aiohttp.ClientError, KeyError, TypeError):
+            self._by_plugin.clear()
+            return False
+        return True
+
+    async def _is_filter_supported(self) -> bool:
+        # CUBE ignores query parameters which it does not know, in which case
+        # a search for a compute resource which does not exist finds plugins.
+        search = self.client.search_plugins(compute_resource_id=0, limit=1)
+        async with self.limiter.use(Resource.CUBE_HTTP):
+            async with self.client.s.get(search.url) as res:
+                await raise_for_status(res)
+                page = await res.json()
+        return page["count"] == 0
+
+
+async def get_all_results(
+    client: BaseChrisClient,
+    url: yarl.URL | str,
+    limiter: ResourceLimiter = NO_LIMITS,
+    resource: Resource = Resource.CUBE_HTTP,
+) -> list[dict[str, Any]]:
+    """
+    Get the results of every page of a paginated collection, as JSON objects.
+    `resource` of `limiter` is held during each request, so that every hold
+    of it is the latency of one request.
+    """
+    results = []
+    while url is not None:
+        async with limiter.use(resource):
+            async with client.s.get(url) as res:
+                await raise_for_status(res)
+                page = await res.json()
+        results.extend(page["results"])
+        url = page["next"]
+    return results
+
+
+def _get_field(plugin: PublicPlugin, search_param: str) -> str:
+    if search_param == "name_exact":
+        return plugin.name
+    return getattr(plugin, search_param)
+
+
+@serde
+@dataclass(frozen=True)
+class CachedCatalog:
+    """
+    A cache entry of `PeerCatalogCache`.
+    """
+
+    fetched: float
+    """Time when the plugin list was last downloaded or revalidated."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    collection_links: dict[str, Any]
+    plugins: list[dict[str, Any]]
+    """Plugins as JSON objects, i.e. search results as they were sent by the peer."""
+
+
+@dataclass(frozen=True)
+class PeerCatalogCache:
+    """
+    Persistent cache of the plugin lists of peer CUBEs, keyed by peer URL.
+
+    Within `ttl` seconds of being downloaded, a cached plugin list is used
+    as-is. After that, it is revalidated using `ETag` or `Last-Modified`,
+    if the peer sent either of them, by making a conditional request
+    for the first page of the plugin list.
+    """
+
+    cache: DiskCache
+    ttl: float
+
+    def get(self, url: ChrisURL) -> Optional[CachedCatalog]:
+        data = self.cache.get(url)
+        if data is None:
+            return None
+        try:
+            return from_dict(CachedCatalog, data)
+        except Exception:
+            return None
+
+    def get_fresh(self, url: ChrisURL) -> Optional[CachedCatalog]:
+        """
+        Get the cache entry for a peer, if it is not older than `ttl`.
+        """
+        entry = self.get(url)
+        if entry is None or not self._is_fresh(entry):
+            return None
+        return entry
+
+    def _is_fresh(self, entry: CachedCatalog) -> bool:
+        return time.time() - entry.fetched <= self.ttl
+
+    async def get_plugins(
+        self,
+        client: BaseChrisClient,
+        first_page: yarl.URL,
+        limiter: ResourceLimiter = NO_LIMITS,
+        resource: Resource = Resource.PEER_HTTP,
+    ) -> list[dict[str, Any]]:
+        """
+        Get the list of plugins of a peer CUBE, making HTTP requests only if necessary.
+        `resource` of `limiter` is held during each request.
+        """
+        entry = self.get(client.url)
+        if entry is not None and self._is_fresh(entry):
+            return entry.plugins
+        headers = {} if entry is None else _validators_of(entry)
+        async with limiter.use(resource):
+            async with client.s.get(first_page, headers=headers) as res:
+                if res.status == 304 and entry is not None:
+                    self._put(
+                        client.url, dataclasses.replace(entry, fetched=time.time())
+                    )
+                    return entry.plugins
+                await raise_for_status(res)
+                etag = res.headers.get("ETag", None)
+                last_modified = res.headers.get("Last-Modified", None)
+                page = await res.json()
+        plugins = page["results"]
+        if page["next"] is not None:
+            plugins.extend(
+                await get_all_results(client, page["next"], limiter, resource)
+            )
+        self._put(
+            client.url,
+            CachedCatalog(
+                fetched=time.time(),
+                etag=etag,
+                last_modified=last_modified,
+                collection_links=to_dict(client.collection_links),
+                plugins=plugins,
+            ),
+        )
+        return plugins
+
+    def _put(self, url: ChrisURL, entry: CachedCatalog) -> None:
+        self.cache.put(url, to_dict(entry))
+
+
+def _validators_of(entry: CachedCatalog) -> dict[str, str]:
+    headers = {}
+    if entry.etag is not None:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified is not None:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers
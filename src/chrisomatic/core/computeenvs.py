@@ -5,6 +5,7 @@ from aiochris import ChrisAdminClient
 from aiochris.models.public import ComputeResource
 from rich.console import RenderableType
 
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
 from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
 from chrisomatic.spec.common import ComputeResource as GivenComputeResource
 
@@ -18,6 +19,7 @@ class ComputeResourceTask(ChrisomaticTask[ComputeResource]):
     cube: ChrisAdminClient
     given: GivenComputeResource
     existing: Collection[ComputeResource]
+    limiter: ResourceLimiter = NO_LIMITS
 
     def first_status(self) -> tuple[str, RenderableType]:
         return self.given.name, "checking for compute resource..."
@@ -36,14 +38,15 @@ class ComputeResourceTask(ChrisomaticTask[ComputeResource]):
         if missing:
             status.replace(f"Missing configurations: {missing}")
             return Outcome.FAILED, None
-        created_compute_resource = await self.cube.create_compute_resource(
-            name=self.given.name,
-            compute_url=self.given.url,
-            compute_user=self.given.username,
-            compute_password=self.given.password,
-            description=self.given.description,
-            compute_innetwork=self.given.innetwork,
-        )
+        async with self.limiter.use(Resource.CUBE_HTTP):
+            created_compute_resource = await self.cube.create_compute_resource(
+                name=self.given.name,
+                compute_url=self.given.url,
+                compute_user=self.given.username,
+                compute_password=self.given.password,
+                description=self.given.description,
+                compute_innetwork=self.given.innetwork,
+            )
         status.replace(created_compute_resource.url)
         return Outcome.CHANGE, created_compute_resource
 
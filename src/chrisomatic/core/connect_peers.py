@@ -1,35 +1,138 @@
 import dataclasses
-from typing import Optional
+from typing import Optional, Sequence, Iterator
 
 import aiohttp
 from aiochris import AnonChrisClient
+from aiochris.models.collection_links import AnonymousCollectionLinks
+from aiochris.models.public import PublicPlugin
 from aiochris.types import ChrisURL
 from aiochris.errors import BaseClientError
 from rich.console import RenderableType
+from serde import from_dict
 
+from chrisomatic.core.catalog import PeerCatalogCache, PluginCatalog
 from chrisomatic.framework import ChrisomaticTask, Channel, Outcome
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
+from chrisomatic.helpers.httpstats import HttpStats
 
 
 @dataclasses.dataclass(frozen=True)
 class PeerConnectionTask(ChrisomaticTask[AnonChrisClient]):
-    """Connect to a peer CUBE."""
+    """
+    Connect to a peer CUBE.
+
+    If the peer is found in `cache`, the client is created from the cached
+    collection links without making any request.
+    """
 
     cube_url: ChrisURL
     connector: Optional[aiohttp.BaseConnector] = None
     connector_owner: bool = False
+    cache: Optional[PeerCatalogCache] = None
+    limiter: ResourceLimiter = NO_LIMITS
 
     def first_status(self) -> tuple[str, RenderableType]:
         return self.cube_url, "Checking peer status..."
 
     async def run(self, status: Channel) -> tuple[Outcome, Optional[AnonChrisClient]]:
+        if (client := self.from_cache()) is not None:
+            status.replace("Connected (cached)")
+            return Outcome.NO_CHANGE, client
         try:
-            client = await AnonChrisClient.from_url(
-                self.cube_url,
-                connector=self.connector,
-                connector_owner=self.connector_owner,
-            )
+            async with self.limiter.use(Resource.PEER_HTTP):
+                client = await AnonChrisClient.from_url(
+                    self.cube_url,
+                    connector=self.connector,
+                    connector_owner=self.connector_owner,
+                )
             status.replace("Connected")
             return Outcome.NO_CHANGE, client
         except BaseClientError as e:
             status.replace(f"Error: {str(e)}")
             return Outcome.FAILED, None
+
+    def from_cache(self) -> Optional[AnonChrisClient]:
+        if self.cache is None:
+            return None
+        if (entry := self.cache.get_fresh(self.cube_url)) is None:
+            return None
+        try:
+            links = from_dict(AnonymousCollectionLinks, entry.collection_links)
+        except Exception:
+            return None
+        # same as what is done by AnonChrisClient.new, minus the request
+        session = aiohttp.ClientSession(
+            headers={"Accept": "application/json"},
+            raise_for_status=False,
+            connector=self.connector,
+            connector_owner=self.connector_owner,
+        )
+        return AnonChrisClient(
+            url=self.cube_url,
+            s=session,
+            collection_links=links,
+            max_search_requests=100,
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class PeerCatalogs:
+    """
+    The `PluginCatalog` of every peer CUBE which `PeerCatalogTask` connected to,
+    in the order of `urls`. It is filled in while the peers are connected to.
+    """
+
+    urls: Sequence[ChrisURL]
+    _connected: dict[ChrisURL, PluginCatalog[PublicPlugin]] = dataclasses.field(
+        init=False, default_factory=dict
+    )
+
+    def add(self, url: ChrisURL, catalog: PluginCatalog[PublicPlugin]) -> None:
+        self._connected[url] = catalog
+
+    def __iter__(self) -> Iterator[PluginCatalog[PublicPlugin]]:
+        return (self._connected[url] for url in self.urls if url in self._connected)
+
+    def broken(self) -> frozenset[ChrisURL]:
+        """
+        Peers which could not be connected to.
+        """
+        return frozenset(self.urls) - self._connected.keys()
+
+
+@dataclasses.dataclass(frozen=True)
+class PeerCatalogTask(ChrisomaticTask[PluginCatalog[PublicPlugin]]):
+    """
+    Connect to a peer CUBE, and add a `PluginCatalog` of its plugins to `catalogs`.
+
+    A peer which cannot be connected to is skipped, so the outcome is never failed.
+    """
+
+    connection: PeerConnectionTask
+    catalogs: PeerCatalogs
+    http_stats: Optional[HttpStats] = None
+
+    @property
+    def kind(self) -> str:
+        return self.connection.kind
+
+    def first_status(self) -> tuple[str, RenderableType]:
+        return self.connection.first_status()
+
+    async def run(
+        self, status: Channel
+    ) -> tuple[Outcome, Optional[PluginCatalog[PublicPlugin]]]:
+        outcome, client = await self.connection.run(status)
+        if outcome is Outcome.FAILED:
+            status.append("Skipped")
+            return Outcome.NO_CHANGE, None
+        if self.http_stats is not None:
+            self.http_stats.attach(client.s)
+        catalog = PluginCatalog(
+            client,
+            cache=self.connection.cache,
+            limiter=self.connection.limiter,
+            resource=Resource.PEER_HTTP,
+        )
+        self.catalogs.add(self.connection.cube_url, catalog)
+        return outcome, catalog
@@ -1,38 +1,152 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Collection
 
 import aiohttp
-from aiochris import ChrisClient
-from aiochris.errors import BaseClientError, IncorrectLoginError
+from aiochris import ChrisClient, ChrisAdminClient
+from aiochris.errors import BaseClientError, IncorrectLoginError, BadRequestError
 from aiochris.models.data import UserData
-from aiochris.types import ChrisURL
+from aiochris.types import ChrisURL, Username
 from rich.console import RenderableType
 
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
 from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
+from chrisomatic.helpers.bulkusers import BulkUserCreation, BulkResult
+from chrisomatic.helpers.httpstats import HttpStats
 from chrisomatic.spec.common import User
 
+_ALL_USERS_GROUP = "all_users"
+"""Name of the group of CUBE which every user is a member of."""
+
+
+async def list_usernames(
+    admin: ChrisAdminClient, page_size: int = 100, limiter: ResourceLimiter = NO_LIMITS
+) -> Optional[frozenset[Username]]:
+    """
+    List the usernames of all users of CUBE, which are the members of its
+    `all_users` group, following pagination. (The `users/` endpoint of CUBE
+    only creates users, its list is always empty.)
+    `Resource.CUBE_HTTP` of `limiter` is held during each request.
+
+    Returns `None` if the users cannot be listed, e.g. if this version of CUBE
+    does not have the group, or if the admin is not one of the users listed.
+    """
+    groups = await _get_all_results(
+        admin, admin.url + "groups/search/", {"name": _ALL_USERS_GROUP}, limiter
+    )
+    if not groups:
+        return None
+    try:
+        members_url = groups[0]["users"]
+    except (KeyError, TypeError):
+        return None
+    members = await _get_all_results(admin, members_url, {"limit": page_size}, limiter)
+    if members is None:
+        return None
+    try:
+        usernames = frozenset(member["user_username"] for member in members)
+    except (KeyError, TypeError):
+        return None
+    async with limiter.use(Resource.CUBE_HTTP):
+        admin_username = await admin.username()
+    if admin_username not in usernames:
+        return None
+    return usernames
+
+
+async def _get_all_results(
+    admin: ChrisAdminClient, url: str, params: dict, limiter: ResourceLimiter
+) -> Optional[list]:
+    """
+    Get the results of all pages of a collection, or `None` if any page
+    could not be gotten.
+    """
+    results = []
+    while url is not None:
+        async with limiter.use(Resource.CUBE_HTTP):
+            async with admin.s.get(url, params=params) as res:
+                if res.status != 200:
+                    return None
+                try:
+                    body = await res.json()
+                    results.extend(body["results"])
+                except (aiohttp.ContentTypeError, KeyError, TypeError):
+                    return None
+        url = body.get("next", None)
+        params = None  # "next" already has the query string
+    return results
+
 
 @dataclass
 class CreateUsersTask(ChrisomaticTask[UserData]):
+    """
+    Create a user if it does not exist.
+
+    If `existing` usernames are given, a user is considered to exist if its username
+    is one of them. Otherwise, whether a user exists is checked by logging in,
+    which also verifies its password.
+
+    If the user is one of the users of `bulk`, it is created together with them,
+    and over HTTP only if that fails.
+    """
+
     url: ChrisURL
     user: User
     connector: Optional[aiohttp.BaseConnector] = None
+    limiter: ResourceLimiter = NO_LIMITS
+    http_stats: Optional[HttpStats] = None
+    existing: Optional[Collection[Username]] = None
+    bulk: Optional[BulkUserCreation] = None
 
     def first_status(self) -> tuple[str, RenderableType]:
         return self.user.username, "checking if user exists..."
 
     async def run(self, status: Channel) -> tuple[Outcome, Optional[UserData]]:
         try:
-            if user := await self._login():
+            if self.bulk is not None and self.user.username in self.bulk:
+                status.replace("creating users in CUBE container...")
+                result = await self.bulk.get(self.user.username)
+                if result is BulkResult.CREATED:
+                    status.replace("user created in CUBE container")
+                    return Outcome.CHANGE, None
+                if result is BulkResult.EXISTS:
+                    status.replace("user exists")
+                    return Outcome.NO_CHANGE, None
+                status.replace("creating user over HTTP...")
+            if self.existing is not None:
+                return await self._create_if_missing(status)
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                user = await self._login()
+            if user:
                 status.replace(user.url)
                 return Outcome.NO_CHANGE, user
-            user = await self._create_user()
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                user = await self._create_user()
             status.replace(user.url)
             return Outcome.CHANGE, user
         except BaseClientError as e:
             status.replace(f"Error: {e}")
             return Outcome.FAILED, None
 
+    async def _create_if_missing(
+        self, status: Channel
+    ) -> tuple[Outcome, Optional[UserData]]:
+        if self.user.username in self.existing:
+            status.replace("user exists")
+            return Outcome.NO_CHANGE, None
+        try:
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                user = await self._create_user()
+        except BadRequestError as e:
+            # user might have been created since the usernames were listed
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                user = await self._login()
+            if user is None:
+                raise e
+            status.replace(user.url)
+            return Outcome.NO_CHANGE, user
+        status.replace(user.url)
+        return Outcome.CHANGE, user
+
     async def _login(self) -> Optional[UserData]:
         """Returns True if the user is able to log in."""
         try:
@@ -52,6 +166,8 @@ class CreateUsersTask(ChrisomaticTask[UserData]):
         async with aiohttp.ClientSession(
             connector=self.connector, connector_owner=False
         ) as session:
+            if self.http_stats is not None:
+                self.http_stats.attach(session)
             return await ChrisClient.create_user(
                 url=self.url,
                 username=self.user.username,
@@ -1,12 +1,23 @@
 """
 Docker-related helpers.
 """
+import asyncio
 import enum
-from typing import Optional, Sequence, AsyncContextManager
-from rich.progress import Progress, TaskID
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, AsyncContextManager, Iterable
+from rich.console import RenderableType
+from rich.filesize import decimal
+from rich.progress_bar import ProgressBar
+from rich.table import Table
+from rich.text import Text
 import aiodocker
 from contextlib import asynccontextmanager
 from aiodocker.containers import DockerContainer
+from chrisomatic.core.images import ImageIndex, normalize_ref
+from chrisomatic.framework.limits import add_queue_wait
 from chrisomatic.framework.task import Channel
 
 
@@ -66,18 +77,146 @@ async def check_output(docker: aiodocker.Docker, image: str, cmd: Sequence[str])
         return "".join(output)
 
 
-async def get_cmd(docker: aiodocker.Docker, image: str) -> list[str]:
-    info = await docker.images.inspect(image)
+async def inspect_image(
+    docker: aiodocker.Docker, image: str, images: Optional[ImageIndex] = None
+) -> dict:
+    """
+    Get the details of a local image, i.e. `docker image inspect`.
+    """
+    if images is not None and (info := await images.inspect(image)) is not None:
+        return info
+    return await docker.images.inspect(image)
+
+
+async def get_cmd(
+    docker: aiodocker.Docker, image: str, images: Optional[ImageIndex] = None
+) -> list[str]:
+    info = await inspect_image(docker, image, images)
     return info["Config"]["Cmd"]
 
 
+async def get_image_id(
+    docker: aiodocker.Docker, image: str, images: Optional[ImageIndex] = None
+) -> str:
+    if images is not None and (image_id := await images.get_id(image)) is not None:
+        return image_id
+    info = await docker.images.inspect(image)
+    return info["Id"]
+
+
+@dataclass(frozen=True)
+class LayerProgress:
+    description: str
+    completed: float = 0
+    total: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class PullProgress:
+    """
+    Progress of an image being pulled: the bytes of its layers which were
+    downloaded, and optionally a progress bar for each layer.
+    """
+
+    layers: tuple[LayerProgress, ...] = ()
+    """Progress of each layer, only if layer detail was requested."""
+    completed: int = 0
+    """Bytes downloaded."""
+    total: int = 0
+    """Bytes to download, as far as they are known."""
+    layers_done: int = 0
+    layers_total: int = 0
+
+    def __rich__(self) -> RenderableType:
+        table = Table.grid(padding=(0, 1))
+        if self.layers_total:
+            size = f"{decimal(self.completed)}/{decimal(self.total)}"
+            table.add_row(
+                f"{self.layers_done}/{self.layers_total} layers",
+                ProgressBar(
+                    total=self.total or None, completed=self.completed, width=40
+                ),
+                Text(size, style="progress.download"),
+            )
+        for layer in self.layers:
+            percentage = f"{layer.completed / layer.total:>4.0%}" if layer.total else ""
+            table.add_row(
+                layer.description,
+                ProgressBar(total=layer.total, completed=layer.completed, width=40),
+                Text(percentage, style="progress.percentage"),
+            )
+        return table
+
+
+@dataclass
+class _LayerState:
+    status: str = ""
+    downloaded: int = 0
+    size: int = 0
+    done: bool = False
+
+
+@dataclass
+class _PullTracker:
+    """
+    Folds the events of `docker.images.pull` into byte totals, keeping only
+    a few numbers per layer.
+    """
+
+    detail: bool = False
+    layers: dict[str, _LayerState] = field(default_factory=dict)
+
+    def update(self, event: dict) -> None:
+        layer = self.layers.setdefault(event["id"], _LayerState())
+        layer.status = event.get("status", "")
+        if layer.status == "Downloading" and _is_progress_update(event):
+            layer.downloaded = event["progressDetail"]["current"]
+            layer.size = event["progressDetail"]["total"]
+        elif layer.status in _DOWNLOADED:
+            layer.downloaded = layer.size
+        if layer.status in _LAYER_DONE:
+            layer.done = True
+
+    def snapshot(self) -> PullProgress:
+        layers = ()
+        if self.detail:
+            layers = tuple(
+                LayerProgress(f"({id}) {layer.status}", layer.downloaded, layer.size)
+                for id, layer in self.layers.items()
+            )
+        return PullProgress(
+            layers=layers,
+            completed=sum(layer.downloaded for layer in self.layers.values()),
+            total=sum(layer.size for layer in self.layers.values()),
+            layers_done=sum(layer.done for layer in self.layers.values()),
+            layers_total=len(self.layers),
+        )
+
+
+_DOWNLOADED = frozenset(
+    ("Verifying Checksum", "Download complete", "Extracting", "Pull complete")
+)
+_LAYER_DONE = frozenset(("Pull complete", "Already exists"))
+
+PULL_PROGRESS_INTERVAL = 0.25
+"""Minimum seconds between updates of the progress of a pull."""
+
+
 class PullResult(enum.Enum):
     not_pulled = "not pulled"
     pulled = "pulled"
     error = "error"
 
 
-async def has_image(docker: aiodocker.Docker, image: str) -> bool:
+async def has_image(
+    docker: aiodocker.Docker, image: str, images: Optional[ImageIndex] = None
+) -> bool:
+    """
+    Check whether an image exists locally. If `images` is given, it is used
+    instead of making a Docker API call.
+    """
+    if images is not None:
+        return await images.has(image)
     try:
         await docker.images.inspect(image)
         return True
@@ -88,16 +227,18 @@ async def has_image(docker: aiodocker.Docker, image: str) -> bool:
 
 
 async def rich_pull(
-    docker: aiodocker.Docker, image: str, status: Channel
+    docker: aiodocker.Docker, image: str, status: Channel, detail: bool = False
 ) -> PullResult:
     """
-    Pull an image, while creating and updating its progress as a
-    [`rich.progress.Progress`](https://rich.readthedocs.io/en/latest/progress.html)
-    to `emit`. This should be used inside the context of a
-    [`rich.live.Live`](https://rich.readthedocs.io/en/latest/live.html).
+    Pull an image. `status.title` is set to the image, and the current status
+    of `status` is replaced by a `PullProgress` snapshot of the pull's progress,
+    which the runner of the task renders.
+
+    Progress is reported at most every `PULL_PROGRESS_INTERVAL` seconds.
+    If `detail`, the progress of each layer is reported as well as the totals.
 
     `aiodocker.DockerError` (such as 400 "invalid reference format", 404 "not found")
-    are caught, and `emit.state` is set to the error message.
+    are caught, and the current status of `status` is replaced by the error message.
     """
     # when pulling via docker API, if tag is not specified, then *all* tags
     # are pulled, and that's definitely not what we want!
@@ -110,46 +251,201 @@ async def rich_pull(
     repo, tag = parsed_image
 
     # images are pulled in layers, each layer needs to be downloaded and extracted.
-    # each layer will be represented by a task of the progress bar.
-    layers: dict[str, TaskID] = {}
-    progress = Progress()
-    status.replace(progress)
+    # the Docker API streams many events per layer, which are folded into totals.
+    # a PullProgress is a snapshot, so that it can be rendered from another thread.
+    tracker = _PullTracker(detail)
+    status.replace(PullProgress())
+    last_update = time.monotonic()
     try:
         async for current in docker.images.pull(repo, tag=tag, stream=True):
-            if "id" not in current:
+            if "id" not in current or current["id"] == tag:
                 continue
-            # noinspection PyShadowingBuiltins
-            id = current["id"]
-            if id == tag:
-                continue
-            if id not in layers:
-                layers[id] = progress.add_task(f"({id})")
-            task = layers[id]
-            progress.update(task, description=f'({id}) {current["status"]}')
-            # progress.update(task, description=f'[{id}]')
-            if not __is_progress_update(current):
-                continue
-            detail = current["progressDetail"]
-            progress.update(
-                task,
-                description=f'({id}) {current["status"]}',
-                completed=detail["current"],
-                total=detail["total"],
-            )
+            tracker.update(current)
+            if (now := time.monotonic()) - last_update >= PULL_PROGRESS_INTERVAL:
+                status.replace(tracker.snapshot())
+                last_update = now
 
     except aiodocker.DockerError as e:
         status.replace(str(e))
         return PullResult.error
 
+    status.replace(tracker.snapshot())
     return PullResult.pulled
 
 
 async def rich_pull_if_missing(
-    docker: aiodocker.Docker, image: str, status: Channel
+    docker: aiodocker.Docker,
+    image: str,
+    status: Channel,
+    images: Optional[ImageIndex] = None,
+    detail: bool = False,
 ) -> PullResult:
-    if await has_image(docker, image):
+    if await has_image(docker, image, images):
         return PullResult.not_pulled
-    return await rich_pull(docker, image, status)
+    result = await rich_pull(docker, image, status, detail)
+    if result is PullResult.pulled and images is not None:
+        await images.refresh(image)
+    return result
+
+
+@dataclass(eq=False)
+class _Pull:
+    """
+    A pull which is shared by every task which needs the same image.
+    """
+
+    image: str
+    channel: Channel = field(init=False)
+    subscribers: list[Channel] = field(init=False, default_factory=list)
+    started: asyncio.Event = field(init=False, default_factory=asyncio.Event)
+    result: asyncio.Future[PullResult] = field(init=False)
+    priority: Optional[int] = field(init=False, default=None)
+    """Priority with which this pull is queued, lower is sooner."""
+
+    def __post_init__(self):
+        self.channel = Channel(self.image, None, on_change=self.publish)
+        self.result = asyncio.get_running_loop().create_future()
+
+    def subscribe(self, status: Channel) -> None:
+        status.title = self.image
+        self.subscribers.append(status)
+        if rows := self.channel.rows():
+            status.replace(rows[-1])
+        else:
+            status.replace("waiting to pull...")
+
+    def publish(self) -> None:
+        if rows := self.channel.rows():
+            for status in self.subscribers:
+                status.replace(rows[-1])
+
+
+@dataclass(eq=False)
+class PullScheduler:
+    """
+    Pulls images for many tasks:
+
+    - requests to pull the same image are merged into one pull (single-flight),
+      and the progress of the pull is shown in the `Channel` of every task
+      which requested it.
+    - at most `max_concurrent` images are pulled at a time.
+    - images which are probably mostly present already are pulled first,
+      since they finish sooner. The layers of an image are not known before
+      it is pulled, so an image is assumed to be mostly present if another
+      tag of its repository is a local image.
+    """
+
+    docker: aiodocker.Docker
+    max_concurrent: int = 4
+    images: Optional[ImageIndex] = None
+    detail: bool = False
+    """Whether to show the progress of each layer."""
+    _pulls: dict[str, _Pull] = field(init=False, default_factory=dict)
+    _queue: list[tuple[int, int, _Pull]] = field(init=False, default_factory=list)
+    _counter: itertools.count = field(init=False, default_factory=itertools.count)
+    _running: int = field(init=False, default=0)
+    _tasks: set[asyncio.Task] = field(init=False, default_factory=set)
+
+    async def pull_if_missing(self, image: str, status: Channel) -> PullResult:
+        if await has_image(self.docker, image, self.images):
+            return PullResult.not_pulled
+        return await self.pull(image, status)
+
+    async def pull(self, image: str, status: Channel) -> PullResult:
+        pull = self._request(image, await self._priority(image))
+        start = time.monotonic()
+        pull.subscribe(status)
+        try:
+            await pull.started.wait()
+            add_queue_wait(time.monotonic() - start)
+            return await asyncio.shield(pull.result)
+        finally:
+            pull.subscribers.remove(status)
+
+    def prefetch(self, images: Iterable[str]) -> None:
+        """
+        Start pulling the images which are not local in the background, in case
+        they are needed later. Prefetched images are pulled after the images
+        which are needed now, and tasks which need an image that is being
+        prefetched wait for that pull instead of starting another.
+        """
+        task = asyncio.create_task(self._prefetch(images))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """
+        Cancel all pulls, e.g. prefetched images which were not needed after all.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _prefetch(self, images: Iterable[str]) -> None:
+        for image in images:
+            try:
+                if await has_image(self.docker, image, self.images):
+                    continue
+            except aiodocker.DockerError:
+                continue
+            pull = self._request(image, _PREFETCH + await self._priority(image))
+            # the result of a prefetch does not matter if nothing waits for it
+            pull.result.add_done_callback(_ignore_result)
+
+    def _request(self, image: str, priority: int) -> _Pull:
+        key = normalize_ref(image) or image
+        if (pull := self._pulls.get(key)) is None:
+            pull = _Pull(image)
+            self._pulls[key] = pull
+        elif pull.started.is_set() or pull.priority <= priority:
+            return pull
+        # a pull which is queued with a lower priority is queued again,
+        # and its other entry is skipped by _start_next.
+        pull.priority = priority
+        heapq.heappush(self._queue, (priority, next(self._counter), pull))
+        self._start_next()
+        return pull
+
+    async def _priority(self, image: str) -> int:
+        if self.images is not None and await self.images.has_repository(image):
+            return 0
+        return 1
+
+    def _start_next(self) -> None:
+        while self._running < self.max_concurrent and self._queue:
+            _, _, pull = heapq.heappop(self._queue)
+            if pull.started.is_set():
+                continue
+            pull.started.set()
+            self._running += 1
+            task = asyncio.create_task(self._run(pull))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pull: _Pull) -> None:
+        try:
+            result = await rich_pull(self.docker, pull.image, pull.channel, self.detail)
+            if result is PullResult.pulled and self.images is not None:
+                await self.images.refresh(pull.image)
+            pull.result.set_result(result)
+        except asyncio.CancelledError:
+            pull.result.cancel()
+            raise
+        except Exception as e:
+            pull.result.set_exception(e)
+        finally:
+            self._running -= 1
+            self._pulls.pop(normalize_ref(pull.image) or pull.image, None)
+            self._start_next()
+
+
+_PREFETCH = 2
+"""Added to the priority of prefetched images, so that they are pulled last."""
+
+
+def _ignore_result(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
 
 
 def parse_image_tag(image: str) -> Optional[tuple[str, str]]:
@@ -168,7 +464,7 @@ def parse_image_tag(image: str) -> Optional[tuple[str, str]]:
     return image, "latest"
 
 
-def __is_progress_update(p: dict) -> bool:
+def _is_progress_update(p: dict) -> bool:
     return (
         "progressDetail" in p
         and "current" in p["progressDetail"]
@@ -2,15 +2,18 @@ import asyncio
 import dataclasses
 from typing import Optional
 
+import aiohttp
 from aiodocker import Docker, DockerError
 
 from aiochris.types import ImageTag, Username
+from chrisomatic.core.images import ImageIndex
 from chrisomatic.spec.given import GivenCubePlugin, GivenConfig, ExpandedConfig
 
 
 async def smart_expand_config(
     given_config: GivenConfig,
     docker: Docker,
+    images: Optional[ImageIndex] = None,
 ) -> ExpandedConfig:
     """
     Expand the given config, i.e. fill in default values, but use information
@@ -21,9 +24,15 @@ async def smart_expand_config(
     - if a plugin string is a docker image known by the docker daemon, then mark it as such
     - if a plugin's owner is not specified, provide a default value
     - TODO add all required plugins from pipelines to plugin list
+
+    If `images` is given, plugin strings are looked up in it instead of inspecting
+    each of them using Docker.
     """
     resolved_plugins: tuple[str | GivenCubePlugin, ...] = await asyncio.gather(
-        *(mark_if_is_image(docker, plugin) for plugin in given_config.cube.plugins)
+        *(
+            mark_if_is_image(docker, plugin, images)
+            for plugin in given_config.cube.plugins
+        )
     )
     realized_config: GivenConfig = dataclasses.replace(
         given_config,
@@ -33,22 +42,28 @@ async def smart_expand_config(
 
 
 async def mark_if_is_image(
-    docker: Optional[Docker], plugin: str | GivenCubePlugin
+    docker: Optional[Docker],
+    plugin: str | GivenCubePlugin,
+    images: Optional[ImageIndex] = None,
 ) -> str | GivenCubePlugin:
     if isinstance(plugin, GivenCubePlugin):
         return plugin
     if docker is None:
         return plugin
-    if await is_local_image(docker, plugin):
+    if await is_local_image(docker, plugin, images):
         return GivenCubePlugin(dock_image=ImageTag(plugin))
     return plugin
 
 
-async def is_local_image(docker: Docker, name: str) -> bool:
+async def is_local_image(
+    docker: Docker, name: str, images: Optional[ImageIndex] = None
+) -> bool:
     if "://" in name:
         return False
     try:
+        if images is not None:
+            return await images.has(name)
         await docker.images.inspect(name)
         return True
-    except DockerError:
+    except (DockerError, aiohttp.ClientError):
         return False
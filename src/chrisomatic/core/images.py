@@ -0,0 +1,136 @@
+"""
+An index of the images of the Docker daemon, so that checking whether images
+exist does not need a Docker API call per image.
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass, field
+from typing import Optional, Any
+
+import aiodocker
+
+_IMAGE_ID = re.compile(r"^(sha256:)?[0-9a-f]{12,64}$")
+
+
+def normalize_ref(ref: str) -> Optional[str]:
+    """
+    Normalize an image reference like Docker does, so that different ways to
+    refer to the same image are equal. For example, `"python"` and
+    `"docker.io/library/python:latest"` are both `"docker.io/library/python:latest"`.
+
+    References pinned by digest are normalized to `repository@digest`.
+    Returns `None` if `ref` is not a reference to a repository.
+    """
+    if not ref or "://" in ref or "<none>" in ref or any(c.isspace() for c in ref):
+        return None
+    name, _, digest = ref.partition("@")
+    slash = name.rfind("/")
+    colon = name.rfind(":")
+    if colon > slash:
+        repo, tag = name[:colon], name[colon + 1 :]
+    else:
+        repo, tag = name, "latest"
+    if not repo or not tag:
+        return None
+    domain, _, remainder = repo.partition("/")
+    if not remainder or not ("." in domain or ":" in domain or domain == "localhost"):
+        domain, remainder = "docker.io", repo
+    if domain == "index.docker.io":
+        domain = "docker.io"
+    if domain == "docker.io" and "/" not in remainder:
+        remainder = f"library/{remainder}"
+    if digest:
+        return f"{domain}/{remainder}@{digest}"
+    return f"{domain}/{remainder}:{tag}"
+
+
+def _repository_of(normalized: str) -> str:
+    name = normalized.partition("@")[0]
+    return name[: name.rfind(":")] if name.rfind(":") > name.rfind("/") else name
+
+
+@dataclass(eq=False)
+class ImageIndex:
+    """
+    A snapshot of the images of the Docker daemon, taken using a single
+    `docker.images.list` call the first time it is needed, and indexed by
+    repository tags and digests.
+
+    Images which are pulled afterwards should be added using `refresh`.
+    Images which are removed by someone else are not noticed.
+
+    The details of images (`docker image inspect`) are memoized by image ID.
+    """
+
+    docker: aiodocker.Docker
+    _ids: Optional[dict[str, str]] = field(init=False, default=None)
+    _repositories: set[str] = field(init=False, default_factory=set)
+    _details: dict[str, dict[str, Any]] = field(init=False, default_factory=dict)
+    _lock: Optional[asyncio.Lock] = field(init=False, default=None)
+
+    async def get_id(self, ref: str) -> Optional[str]:
+        """
+        Get the ID of a local image, or `None` if there is no such image.
+        """
+        ids = await self._index()
+        if (normalized := normalize_ref(ref)) is not None and normalized in ids:
+            return ids[normalized]
+        if _IMAGE_ID.match(ref):
+            prefix = ref if ref.startswith("sha256:") else f"sha256:{ref}"
+            for image_id in ids.values():
+                if image_id.startswith(prefix):
+                    return image_id
+        return None
+
+    async def has(self, ref: str) -> bool:
+        return await self.get_id(ref) is not None
+
+    async def has_repository(self, ref: str) -> bool:
+        """
+        Check whether any image of the same repository as `ref` exists locally,
+        e.g. a different version of it.
+        """
+        await self._index()
+        if (normalized := normalize_ref(ref)) is None:
+            return False
+        return _repository_of(normalized) in self._repositories
+
+    async def inspect(self, ref: str) -> Optional[dict[str, Any]]:
+        """
+        Get the details of a local image, or `None` if there is no such image.
+        """
+        if (image_id := await self.get_id(ref)) is None:
+            return None
+        if image_id not in self._details:
+            self._details[image_id] = await self.docker.images.inspect(image_id)
+        return self._details[image_id]
+
+    async def refresh(self, ref: str) -> None:
+        """
+        Add an image which was just pulled.
+        """
+        info = await self.docker.images.inspect(ref)
+        ids = await self._index()
+        self._add(info)
+        if (normalized := normalize_ref(ref)) is not None:
+            ids[normalized] = info["Id"]
+            self._repositories.add(_repository_of(normalized))
+        self._details[info["Id"]] = info
+
+    async def _index(self) -> dict[str, str]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._ids is None:
+                self._ids = {}
+                for image in await self.docker.images.list():
+                    self._add(image)
+        return self._ids
+
+    def _add(self, image: dict[str, Any]) -> None:
+        refs = (image.get("RepoTags") or []) + (image.get("RepoDigests") or [])
+        for ref in refs:
+            if (normalized := normalize_ref(ref)) is not None:
+                self._ids[normalized] = image["Id"]
+                self._repositories.add(_repository_of(normalized))
@@ -2,21 +2,25 @@ import dataclasses
 import enum
 import json
 from dataclasses import dataclass
-from typing import Sequence, Optional, Collection, Self, Iterable
+from typing import Optional, Collection, Self, Iterable
 
 import aiodocker
 import aiohttp
-from aiochris import ChrisAdminClient, AnonChrisClient, acollect
-from aiochris.client.base import BaseChrisClient
+import yarl
+from aiochris import ChrisAdminClient, acollect
 from aiochris.errors import BadRequestError, BaseClientError
 from aiochris.models.logged_in import Plugin
 from aiochris.models.public import PublicPlugin
 from aiochris.types import PluginName, ImageTag, PluginUrl, ComputeResourceName
 from rich.console import RenderableType
 
+from chrisomatic.core.catalog import PluginCatalog, ComputeResourceIndex
 from chrisomatic.framework import ChrisomaticTask, Channel, Outcome
-from chrisomatic.helpers.pldesc import try_obtain_json_description
-from chrisomatic.helpers.retry import RetryWrapper, R
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
+from chrisomatic.core.docker import PullScheduler
+from chrisomatic.core.images import ImageIndex
+from chrisomatic.helpers.pldesc import try_obtain_json_description, DescriptionCache
+from chrisomatic.helpers.retry import RetryWrapper, R, CircuitOpenError
 from chrisomatic.spec.given import GivenCubePlugin
 
 
@@ -118,9 +122,28 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
     """
 
     plugin: GivenCubePlugin
-    other_stores: Sequence[AnonChrisClient]
+    other_stores: Iterable[PluginCatalog[PublicPlugin]]
+    """
+    Indexes of the plugins of peer CUBEs, shared with other `RegisterPluginTask`.
+    Only iterated once the task runs, e.g. a `PeerCatalogs` which is filled in
+    before then.
+    """
     docker: Optional[aiodocker.Docker]
     cube: ChrisAdminClient
+    catalog: PluginCatalog[Plugin]
+    """Index of the plugins of `cube`, shared with other `RegisterPluginTask`."""
+    descriptions: Optional[DescriptionCache] = None
+    """Cache of plugin JSON descriptions obtained using Docker."""
+    limiter: ResourceLimiter = NO_LIMITS
+    images: Optional[ImageIndex] = None
+    """Index of local images, shared with other `RegisterPluginTask`."""
+    pulls: Optional[PullScheduler] = None
+    """Scheduler of image pulls, shared with other `RegisterPluginTask`."""
+    compute_resources: Optional[ComputeResourceIndex] = None
+    """
+    Compute resources of the plugins of `cube`, shared with other `RegisterPluginTask`.
+    If not given, the compute resources of each existing plugin are retrieved separately.
+    """
 
     def first_status(self) -> tuple[str, RenderableType]:
         return self.plugin.title, "checking compute resources..."
@@ -147,7 +170,7 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
         """Get the requested plugin from CUBE (check whether it already exists or not)."""
         q = self.plugin.to_store_search()
         status.replace(f"Searching...")
-        return await self.cube.search_plugins(**q).first()
+        return await self.catalog.search(q)
 
     async def register_from_self_to_others(
         self, p: Plugin, status: Channel
@@ -176,7 +199,8 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
         status: Channel,
     ) -> Optional[Plugin]:
         try:
-            return await self.cube.register_plugin_from_store(plugin_url, cr_names)
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                return await self.cube.register_plugin_from_store(plugin_url, cr_names)
         except BadRequestError as e:
             if (
                 len(e.args) == 4
@@ -215,9 +239,16 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
             return frozenset()
         return wanted
 
-    @staticmethod
-    async def _get_compute_resources_of(p: Plugin) -> frozenset[ComputeResourceName]:
-        compute_resources = await acollect(p.get_compute_resources())
+    async def _get_compute_resources_of(
+        self, p: Plugin
+    ) -> frozenset[ComputeResourceName]:
+        if (
+            self.compute_resources is not None
+            and (names := await self.compute_resources.get(p.id)) is not None
+        ):
+            return names
+        async with self.limiter.use(Resource.CUBE_HTTP):
+            compute_resources = await acollect(p.get_compute_resources())
         return frozenset(c.name for c in compute_resources)
 
     async def find_then_maybe_register_from_peer(
@@ -229,11 +260,15 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
         return None
 
     async def _get_plugin_url_from(
-        self, peer: BaseChrisClient, status: Channel
+        self, peer: PluginCatalog[PublicPlugin], status: Channel
     ) -> Optional[PluginUrl]:
         status.replace(f"Searching in {peer.url}...")
         query = self.plugin.to_store_search()
-        if peer_plugin := await self._get_first_plugin(peer, query, status):
+        try:
+            peer_plugin = await self._get_first_plugin(peer, query, status)
+        except CircuitOpenError:
+            return None
+        if peer_plugin:
             status.replace(f"Found {peer_plugin.url}")
             return peer_plugin.url
         return None
@@ -242,9 +277,11 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
         self, plugin_url: PluginUrl, status: Channel
     ) -> tuple[Outcome, Optional[PluginRegistration]]:
         try:
-            registered_plugin = await self.cube.register_plugin_from_store(
-                plugin_url, self.plugin.compute_resource
-            )
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                registered_plugin = await self.cube.register_plugin_from_store(
+                    plugin_url, self.plugin.compute_resource
+                )
+            self.catalog.add(registered_plugin)
             status.replace(registered_plugin.url)
             return Outcome.CHANGE, PluginRegistration(
                 registered_plugin, plugin_url, PluginOrigin.public_store
@@ -263,9 +300,11 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
         inferred = InferredPluginInfo.from_given(self.plugin)
         plugin_dict = inferred.fill(json_str)
         try:
-            registered_plugin = await self.cube.add_plugin(
-                plugin_dict, self.plugin.compute_resource
-            )
+            async with self.limiter.use(Resource.CUBE_HTTP):
+                registered_plugin = await self.cube.add_plugin(
+                    plugin_dict, self.plugin.compute_resource
+                )
+            self.catalog.add(registered_plugin)
             status.replace(registered_plugin.url)
             return Outcome.CHANGE, PluginRegistration(
                 registered_plugin, None, PluginOrigin.docker_chris_plugin_info
@@ -276,22 +315,32 @@ class RegisterPluginTask(ChrisomaticTask[PluginRegistration]):
 
     @staticmethod
     async def _get_first_plugin(
-        chris: BaseChrisClient, query: dict[str, str], status: Channel
+        catalog: PluginCatalog[PublicPlugin], query: dict[str, str], status: Channel
     ) -> PublicPlugin:
         """
-        Wraps `client.get_first_plugin` with `_RetryOnDisconnect`.
+        Wraps `catalog.search` with `_RetryOnDisconnect`.
         """
 
         async def get_first_plugin():
-            return await chris.search_plugins(**query).first()
+            return await catalog.search(query)
 
-        return await _RetryOnDisconnect[PublicPlugin](get_first_plugin).call(status)
+        host = yarl.URL(catalog.url).host
+        retry = _RetryOnDisconnect[PublicPlugin](get_first_plugin, host=host)
+        return await retry.call(status)
 
     async def _upload_to_store(self, status: Channel) -> Optional[Plugin]:
         ...
 
     async def _get_json_representation(self, status: Channel) -> Optional[str]:
-        return await try_obtain_json_description(self.docker, self.plugin, status)
+        return await try_obtain_json_description(
+            self.docker,
+            self.plugin,
+            status,
+            self.descriptions,
+            self.limiter,
+            self.images,
+            self.pulls,
+        )
 
 
 class _RetryOnDisconnect(RetryWrapper[R]):
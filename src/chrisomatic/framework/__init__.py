@@ -12,23 +12,46 @@ to the console.
 
 Tasks transmit status information to `TaskRunner` via a `Channel`.
 
-There are two implementations of `TaskRunner`:
+There are three implementations of `TaskRunner`:
 
 - `TableTaskRunner` is suitable for a small number of concurrent tasks. The status of each task
   is shown in a table.
 - `ProgressTaskRunner` is suitable for a large number of quick tasks. Status information from
   individual tasks is not shown. Instead, a progress bar is shown and updated whenever a task
   completes.
+- `NdjsonTaskRunner` does not use a display. Instead, it writes an event as a line of JSON
+  whenever a task starts, changes its status, or finishes.
+
+Which of them are used is decided by a `Reporter`.
+
+Tasks of different kinds can be run by the same `TaskRunner` when there are dependencies
+between them: a `TaskGraph` wraps each task in a `Node` which waits for its dependencies.
+
+Names are imported lazily, so that importing a module of this package
+(e.g. `chrisomatic.framework.limits`) does not import all of them.
 """
 
-from chrisomatic.framework.task import ChrisomaticTask, Channel
-from chrisomatic.framework.runner import (
-    TaskRunner,
-    TableTaskRunner,
-    ProgressTaskRunner,
-    TableDisplayConfig,
-)
-from chrisomatic.framework.outcome import Outcome
+import importlib
+
+_EXPORTS = {
+    "ChrisomaticTask": "chrisomatic.framework.task",
+    "Channel": "chrisomatic.framework.task",
+    "TaskRunner": "chrisomatic.framework.runner",
+    "TableTaskRunner": "chrisomatic.framework.runner",
+    "ProgressTaskRunner": "chrisomatic.framework.runner",
+    "TableDisplayConfig": "chrisomatic.framework.runner",
+    "NdjsonTaskRunner": "chrisomatic.framework.ndjson",
+    "Outcome": "chrisomatic.framework.outcome",
+    "TaskGraph": "chrisomatic.framework.graph",
+    "Node": "chrisomatic.framework.graph",
+}
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
+
 
 __all__ = [
     "ChrisomaticTask",
@@ -37,5 +60,8 @@ __all__ = [
     "TableTaskRunner",
     "TableDisplayConfig",
     "ProgressTaskRunner",
+    "NdjsonTaskRunner",
     "Outcome",
+    "TaskGraph",
+    "Node",
 ]
@@ -0,0 +1,135 @@
+"""
+A concurrency limit which adapts to how well a server is coping, using
+additive-increase/multiplicative-decrease (AIMD), like TCP congestion control.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Optional, AsyncIterator
+
+
+def _never(_e: BaseException) -> bool:
+    return False
+
+
+@dataclass(eq=False)
+class AimdLimit:
+    """
+    Limits the number of concurrent operations to `limit`, which changes as
+    operations finish:
+
+    - while operations succeed with a normal latency, `limit` is increased by one
+      for every `limit` operations.
+    - when an operation fails with an error which indicates congestion (decided by
+      `is_congestion`), or latency spikes, `limit` is multiplied by `backoff`.
+      The limit is reduced at most once for operations which were started at the
+      same time, so a burst of errors does not collapse the limit to `min_limit`.
+
+    Latency is considered to spike when its short-term average is more than
+    `latency_tolerance` times its long-term average.
+    """
+
+    max_limit: int
+    min_limit: int = 1
+    initial: Optional[int] = None
+    """Initial limit. By default, half of `max_limit`."""
+    backoff: float = 0.5
+    latency_tolerance: float = 3.0
+    is_congestion: Callable[[BaseException], bool] = _never
+    limit: float = field(init=False)
+    trajectory: list[tuple[float, int]] = field(init=False, default_factory=list)
+    """Changes of the limit, as seconds since this `AimdLimit` was created and limit."""
+
+    _in_flight: int = field(init=False, default=0)
+    _waiters: deque[asyncio.Future] = field(init=False, default_factory=deque)
+    _short_latency: float = field(init=False, default=0.0)
+    _long_latency: float = field(init=False, default=0.0)
+    _samples: int = field(init=False, default=0)
+    _last_decrease: float = field(init=False, default=float("-inf"))
+    _created: float = field(init=False, default_factory=time.monotonic)
+
+    _WARMUP = 20
+    """Number of samples before latency is used to detect congestion."""
+
+    def __post_init__(self):
+        if not 1 <= self.min_limit <= self.max_limit:
+            raise ValueError(f"Invalid limits: {self.min_limit}, {self.max_limit}")
+        initial = self.initial if self.initial is not None else self.max_limit // 2
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.trajectory.append((0.0, int(self.limit)))
+
+    @asynccontextmanager
+    async def use(self) -> AsyncIterator[None]:
+        await self._acquire()
+        start = time.monotonic()
+        congested: Optional[bool] = None
+        try:
+            yield
+            congested = False
+        except Exception as e:
+            congested = self.is_congestion(e)
+            raise
+        finally:
+            self._release(start, congested)
+
+    async def _acquire(self) -> None:
+        while self._in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    self._wake()
+                raise
+        self._in_flight += 1
+
+    def _release(self, start: float, congested: Optional[bool]) -> None:
+        """
+        Release a slot, and adjust the limit. If `congested` is `None`, the operation
+        was cancelled, so it says nothing about the server.
+        """
+        self._in_flight -= 1
+        if congested is not None:
+            now = time.monotonic()
+            if congested or self._observe(now - start):
+                if start > self._last_decrease:
+                    self._last_decrease = now
+                    self._set_limit(self.limit * self.backoff)
+            else:
+                self._set_limit(self.limit + 1 / self.limit)
+        self._wake()
+
+    def _observe(self, latency: float) -> bool:
+        """
+        Add a latency sample. Returns `True` if latency has spiked.
+        """
+        if self._samples == 0:
+            self._short_latency = self._long_latency = latency
+        self._short_latency += 0.2 * (latency - self._short_latency)
+        self._long_latency += 0.02 * (latency - self._long_latency)
+        self._samples += 1
+        return (
+            self._samples > self._WARMUP
+            and self._short_latency > self.latency_tolerance * self._long_latency
+        )
+
+    def _set_limit(self, limit: float) -> None:
+        previous = int(self.limit)
+        self.limit = min(max(limit, float(self.min_limit)), float(self.max_limit))
+        if int(self.limit) != previous:
+            elapsed = round(time.monotonic() - self._created, 3)
+            self.trajectory.append((elapsed, int(self.limit)))
+
+    def _wake(self) -> None:
+        available = int(self.limit) - self._in_flight
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
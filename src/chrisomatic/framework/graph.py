@@ -0,0 +1,100 @@
+"""
+Dependencies between tasks.
+
+A `TaskGraph` is a set of tasks with explicit edges between them. Each task
+is wrapped by a `Node`, which waits for the nodes it depends on to finish
+before running its task. All nodes of a `TaskGraph` should be given to the
+same `TaskRunner`, so that every task starts as soon as its dependencies
+have finished, rather than after every task of a previous batch has finished.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar, Optional, Sequence, Iterable
+
+from rich.console import RenderableType
+
+from chrisomatic.framework.limits import add_queue_wait
+from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
+
+_R = TypeVar("_R")
+
+
+@dataclass(eq=False)
+class Node(ChrisomaticTask[_R], Generic[_R]):
+    """
+    A `ChrisomaticTask` which runs `task` after every node of `after` has finished,
+    regardless of their outcomes.
+    """
+
+    task: ChrisomaticTask[_R]
+    after: Sequence["Node"] = ()
+    _title: str = field(init=False)
+    _first_status: RenderableType = field(init=False)
+    _outcome: Optional[Outcome] = field(init=False, default=None)
+    _finished: asyncio.Event = field(init=False, default_factory=asyncio.Event)
+
+    def __post_init__(self):
+        self._title, self._first_status = self.task.first_status()
+
+    @property
+    def title(self) -> str:
+        return self._title
+
+    @property
+    def kind(self) -> str:
+        return self.task.kind
+
+    def first_status(self) -> tuple[str, RenderableType]:
+        if not self.after:
+            return self._title, self._first_status
+        waiting_for = ", ".join(n.title for n in self.after)
+        return self._title, f"waiting for {waiting_for}..."
+
+    async def run(self, status: Channel) -> tuple[Outcome, Optional[_R]]:
+        outcome = Outcome.FAILED
+        try:
+            if self.after:
+                start = time.monotonic()
+                await asyncio.gather(*(n.wait() for n in self.after))
+                add_queue_wait(time.monotonic() - start)
+                status.replace(self._first_status)
+            outcome, result = await self.task.run(status)
+            return outcome, result
+        finally:
+            self._outcome = outcome
+            self._finished.set()
+
+    async def wait(self) -> Outcome:
+        """
+        Wait for this node to finish, and get its outcome.
+        """
+        await self._finished.wait()
+        return self._outcome
+
+
+@dataclass
+class TaskGraph(Generic[_R]):
+    """
+    Builder for a set of `Node`.
+
+    Nodes can only depend on nodes which were added before them,
+    so a `TaskGraph` can never have a cycle.
+    """
+
+    nodes: list[Node[_R]] = field(default_factory=list)
+    _members: set[Node] = field(init=False, default_factory=set)
+
+    def add(self, task: ChrisomaticTask[_R], after: Iterable[Node] = ()) -> Node[_R]:
+        """
+        Add a task which runs after the given nodes have finished.
+        """
+        after = tuple(after)
+        for dependency in after:
+            if dependency not in self._members:
+                raise ValueError(f"{dependency.title} is not a node of this graph")
+        node = Node(task, after)
+        self.nodes.append(node)
+        self._members.add(node)
+        return node
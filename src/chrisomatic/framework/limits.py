@@ -0,0 +1,167 @@
+"""
+Limits on the number of concurrent operations which use a shared resource.
+
+Tasks do not start all of their operations at once. Instead, each operation
+which uses a shared resource (such as making a request to CUBE, or running a
+container) is done inside `ResourceLimiter.use`, so that tasks queue for the
+resource when too many of them are using it.
+
+A resource can be limited adaptively by an `AimdLimit`, in which case its limit
+is the maximum.
+"""
+
+import asyncio
+import enum
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Mapping, AsyncIterator, Self, Callable, Optional, Iterator
+
+from chrisomatic.framework.aimd import AimdLimit
+
+_queue_wait: ContextVar[Optional[list[float]]] = ContextVar("_queue_wait", default=None)
+
+
+def add_queue_wait(seconds: float) -> None:
+    """
+    Count time which the current task spent waiting in a queue.
+    Does nothing if the current task is not being timed.
+    """
+    waits = _queue_wait.get()
+    if waits is not None:
+        waits.append(seconds)
+
+
+@contextmanager
+def collect_queue_waits() -> Iterator[list[float]]:
+    """
+    Collect the times given to `add_queue_wait` by code running in this context,
+    e.g. by `chrisomatic.framework.metrics.Metrics` while it times a task.
+    """
+    waits: list[float] = []
+    token = _queue_wait.set(waits)
+    try:
+        yield waits
+    finally:
+        _queue_wait.reset(token)
+
+
+class Resource(str, enum.Enum):
+    CUBE_HTTP = "cube_http"
+    """HTTP requests to the CUBE being provisioned."""
+    PEER_HTTP = "peer_http"
+    """HTTP requests to peer CUBEs."""
+    DOCKER_PULL = "docker_pull"
+    """Pulling container images."""
+    DOCKER_RUN = "docker_run"
+    """Running containers."""
+
+
+DEFAULT_LIMITS: Mapping[Resource, int] = {
+    Resource.CUBE_HTTP: 16,
+    Resource.PEER_HTTP: 8,
+    Resource.DOCKER_PULL: 4,
+    Resource.DOCKER_RUN: 4,
+}
+
+
+@dataclass(frozen=True)
+class ResourceLimiter:
+    """
+    Limits the number of concurrent uses of each `Resource`.
+    Resources which do not have a limit can be used without limit.
+    """
+
+    limits: Mapping[Resource, int] = field(default_factory=dict)
+    adaptive: Mapping[Resource, Callable[[BaseException], bool]] = field(
+        default_factory=dict
+    )
+    """
+    Resources which are limited by an `AimdLimit`, mapped to the function
+    which decides whether an error means that the resource is congested.
+    """
+    _semaphores: dict[Resource, asyncio.Semaphore] = field(
+        init=False, default_factory=dict
+    )
+    _adaptive_limits: dict[Resource, AimdLimit] = field(
+        init=False, default_factory=dict
+    )
+
+    def __post_init__(self):
+        for resource, limit in self.limits.items():
+            if limit < 1:
+                raise ValueError(f"Limit for {resource.value} must be at least 1")
+            if resource in self.adaptive:
+                self._adaptive_limits[resource] = AimdLimit(
+                    max_limit=limit, is_congestion=self.adaptive[resource]
+                )
+            else:
+                self._semaphores[resource] = asyncio.Semaphore(limit)
+
+    @classmethod
+    def from_overrides(
+        cls,
+        *overrides: Mapping[Resource, int],
+        adaptive: Optional[Mapping[Resource, Callable[[BaseException], bool]]] = None,
+    ) -> Self:
+        """
+        Create a `ResourceLimiter` with `DEFAULT_LIMITS`, where limits are overridden
+        by the given mappings, in order.
+        """
+        limits = dict(DEFAULT_LIMITS)
+        for override in overrides:
+            limits.update(override)
+        return cls(limits, adaptive or {})
+
+    @property
+    def adaptive_limits(self) -> Mapping[Resource, AimdLimit]:
+        return self._adaptive_limits
+
+    @asynccontextmanager
+    async def use(self, resource: Resource) -> AsyncIterator[None]:
+        """
+        Wait until `resource` is available, then hold it.
+        """
+        start = time.monotonic()
+        if (adaptive_limit := self._adaptive_limits.get(resource)) is not None:
+            async with adaptive_limit.use():
+                add_queue_wait(time.monotonic() - start)
+                yield
+            return
+        semaphore = self._semaphores.get(resource, None)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            add_queue_wait(time.monotonic() - start)
+            yield
+
+
+NO_LIMITS = ResourceLimiter()
+"""A `ResourceLimiter` which does not limit anything."""
+
+
+def parse_limit(s: str) -> tuple[Resource, int]:
+    """
+    Parse a limit given as a string, e.g. `"docker_pull=2"`
+
+    :raises ValueError: if the string is not a valid limit
+    """
+    name, sep, value = s.partition("=")
+    if not sep:
+        raise ValueError(f'Limit must be given as RESOURCE=N, got "{s}"')
+    try:
+        resource = Resource(name.strip())
+    except ValueError:
+        choices = ", ".join(r.value for r in Resource)
+        raise ValueError(f'Unknown resource "{name}", must be one of: {choices}')
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError(
+            f'Limit for {resource.value} must be an integer of at least 1, got "{value}"'
+        )
+    return resource, limit
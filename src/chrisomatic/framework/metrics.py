@@ -0,0 +1,261 @@
+"""
+Timing of tasks and phases, which can be exported as JSON or in the
+[Prometheus text format](https://prometheus.io/docs/instrumenting/exposition_formats/).
+
+A `TaskRunner` which is given a `Metrics` records a `Span` for every task it runs.
+Time which a task spends waiting, e.g. for a `ResourceLimiter`, is counted as the
+span's queue wait using `chrisomatic.framework.limits.add_queue_wait`.
+"""
+
+import bisect
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Any, Mapping
+
+from chrisomatic.framework.limits import collect_queue_waits
+from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
+
+BUCKETS: tuple[float, ...] = (
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+"""Upper bounds (in seconds) of the buckets of latency histograms."""
+
+
+@dataclass(frozen=True)
+class Span:
+    """
+    Timing of one run of a task.
+    """
+
+    kind: str
+    title: str
+    start: float
+    """Wall-clock time of when the task started, in seconds since the epoch."""
+    end: float
+    queue_wait: float
+    outcome: Outcome
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    """Number of observations in each bucket. The last bucket is unbounded."""
+    total: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[tuple[str, int]]:
+        """
+        Produce the cumulative counts of each bucket, labeled by upper bound.
+        """
+        n = 0
+        for bound, count in zip((*map(str, BUCKETS), "+Inf"), self.counts):
+            n += count
+            yield bound, n
+
+
+@dataclass
+class _KindStats:
+    durations: Histogram = field(default_factory=Histogram)
+    queue_wait: float = 0.0
+    outcomes: dict[Outcome, int] = field(
+        default_factory=lambda: {outcome: 0 for outcome in Outcome}
+    )
+    first_start: float = float("inf")
+    last_end: float = 0.0
+
+    def record(self, span: Span) -> None:
+        self.durations.observe(span.duration)
+        self.queue_wait += span.queue_wait
+        self.outcomes[span.outcome] += 1
+        self.first_start = min(self.first_start, span.start)
+        self.last_end = max(self.last_end, span.end)
+
+
+@dataclass
+class Metrics:
+    """
+    Timing information about a run of chrisomatic.
+    Spans are aggregated by the kind of task as they are recorded.
+    """
+
+    tasks: dict[str, _KindStats] = field(default_factory=dict)
+    phases: dict[str, float] = field(default_factory=dict)
+    """Durations of phases, in order."""
+    adaptive_limits: dict[str, list[tuple[float, int]]] = field(default_factory=dict)
+    """Trajectories of adaptive concurrency limits, see `AimdLimit.trajectory`."""
+
+    def record(self, span: Span) -> None:
+        self.tasks.setdefault(span.kind, _KindStats()).record(span)
+
+    async def time(
+        self, chrisomatic_task: ChrisomaticTask, status: Channel
+    ) -> tuple[Outcome, Any]:
+        """
+        Run a task, and record its `Span`.
+        """
+        start = time.time()
+        outcome = Outcome.FAILED
+        with collect_queue_waits() as waits:
+            try:
+                outcome, result = await chrisomatic_task.run(status)
+                return outcome, result
+            finally:
+                end = time.time()
+                self.record(
+                    Span(
+                        kind=chrisomatic_task.kind,
+                        title=status.title,
+                        start=start,
+                        end=end,
+                        queue_wait=sum(waits),
+                        outcome=outcome,
+                    )
+                )
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a phase of the run.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.monotonic() - start
+
+    def task_phases(self, phases: Mapping[str, str]) -> None:
+        """
+        Add a phase for each kind of task in `phases`, e.g. for the tasks of a
+        `chrisomatic.framework.graph.TaskGraph`, which run at the same time.
+        A phase lasts from when the first task of its kind started (including
+        waiting for tasks it depends on) until the last one ended, so phases
+        added this way can overlap.
+        """
+        for kind, name in phases.items():
+            if (stats := self.tasks.get(kind)) is not None:
+                self.phases[name] = stats.last_end - stats.first_start
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "phases": self.phases,
+            "tasks": {
+                kind: {
+                    "count": stats.durations.count,
+                    "duration_sum": stats.durations.total,
+                    "duration_buckets": dict(stats.durations.cumulative()),
+                    "queue_wait_sum": stats.queue_wait,
+                    "outcomes": {o.value: n for o, n in stats.outcomes.items()},
+                    "wall_time": stats.last_end - stats.first_start,
+                }
+                for kind, stats in self.tasks.items()
+            },
+            "adaptive_limits": {
+                name: {
+                    "final": trajectory[-1][1],
+                    "min": min(limit for _, limit in trajectory),
+                    "max": max(limit for _, limit in trajectory),
+                    "trajectory": trajectory,
+                }
+                for name, trajectory in self.adaptive_limits.items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP chrisomatic_phase_duration_seconds Duration of a phase of the run.",
+            "# TYPE chrisomatic_phase_duration_seconds gauge",
+        ]
+        for phase, seconds in self.phases.items():
+            lines.append(
+                f'chrisomatic_phase_duration_seconds{{phase="{phase}"}} {seconds}'
+            )
+        lines += [
+            "# HELP chrisomatic_task_duration_seconds Duration of tasks.",
+            "# TYPE chrisomatic_task_duration_seconds histogram",
+        ]
+        for kind, stats in self.tasks.items():
+            for bound, n in stats.durations.cumulative():
+                lines.append(
+                    f"chrisomatic_task_duration_seconds_bucket"
+                    f'{{kind="{kind}",le="{bound}"}} {n}'
+                )
+            lines.append(
+                f'chrisomatic_task_duration_seconds_sum{{kind="{kind}"}} '
+                f"{stats.durations.total}"
+            )
+            lines.append(
+                f'chrisomatic_task_duration_seconds_count{{kind="{kind}"}} '
+                f"{stats.durations.count}"
+            )
+        lines += [
+            "# HELP chrisomatic_task_queue_wait_seconds_total Time tasks spent waiting.",
+            "# TYPE chrisomatic_task_queue_wait_seconds_total counter",
+        ]
+        for kind, stats in self.tasks.items():
+            lines.append(
+                f'chrisomatic_task_queue_wait_seconds_total{{kind="{kind}"}} '
+                f"{stats.queue_wait}"
+            )
+        lines += [
+            "# HELP chrisomatic_tasks_total Number of tasks by outcome.",
+            "# TYPE chrisomatic_tasks_total counter",
+        ]
+        for kind, stats in self.tasks.items():
+            for outcome, n in stats.outcomes.items():
+                lines.append(
+                    f'chrisomatic_tasks_total{{kind="{kind}",outcome="{outcome.value}"}} '
+                    f"{n}"
+                )
+        lines += [
+            "# HELP chrisomatic_adaptive_limit Adaptive concurrency limit at the end.",
+            "# TYPE chrisomatic_adaptive_limit gauge",
+        ]
+        for name, trajectory in self.adaptive_limits.items():
+            lines.append(
+                f'chrisomatic_adaptive_limit{{resource="{name}"}} {trajectory[-1][1]}'
+            )
+        lines += [
+            "# HELP chrisomatic_adaptive_limit_min Lowest adaptive concurrency limit.",
+            "# TYPE chrisomatic_adaptive_limit_min gauge",
+        ]
+        for name, trajectory in self.adaptive_limits.items():
+            lowest = min(limit for _, limit in trajectory)
+            lines.append(
+                f'chrisomatic_adaptive_limit_min{{resource="{name}"}} {lowest}'
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """
+        Write metrics to a file. If its name ends with `.prom`, the Prometheus text
+        format is used. Otherwise, the metrics are written as JSON.
+        """
+        if path.suffix == ".prom":
+            path.write_text(self.to_prometheus())
+        else:
+            path.write_text(json.dumps(self.to_dict(), indent=2))
@@ -0,0 +1,102 @@
+"""
+A headless `TaskRunner` which reports progress as newline-delimited JSON.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Sequence, TypeVar, TextIO, Any
+
+from rich.text import Text
+
+from chrisomatic.framework.runner import TaskRunner
+from chrisomatic.framework.task import Channel, ChrisomaticTask, Outcome
+
+_R = TypeVar("_R")
+
+
+@dataclass
+class NdjsonWriter:
+    """
+    Writes one compact JSON object per line to `stream`, which should be buffered.
+    """
+
+    stream: TextIO
+    _next_id: int = field(init=False, default=0)
+
+    def new_id(self) -> int:
+        """
+        Get a number which identifies a task in the events it emits.
+        """
+        self._next_id += 1
+        return self._next_id
+
+    def emit(self, event: str, **data: Any) -> None:
+        data = {"time": round(time.time(), 3), "event": event, **data}
+        self.stream.write(json.dumps(data, separators=(",", ":")))
+        self.stream.write("\n")
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+@dataclass
+class NdjsonTaskRunner(TaskRunner[_R]):
+    """
+    `NdjsonTaskRunner` emits an event when a task starts, when the text of its status
+    changes, and when it finishes. Statuses which are not text (e.g. progress bars)
+    are not reported.
+    """
+
+    writer: NdjsonWriter = field(kw_only=True)
+    group: str = ""
+
+    async def apply(self) -> Sequence[tuple[Outcome, _R]]:
+        try:
+            return await asyncio.gather(*(self._run(t) for t in self.tasks))
+        finally:
+            self.writer.flush()
+
+    async def _run(self, chrisomatic_task: ChrisomaticTask[_R]) -> tuple[Outcome, _R]:
+        task_id = self.writer.new_id()
+        title, first_status = chrisomatic_task.first_status()
+        status = Channel(title, first_status)
+        last_status = _plain(status)
+        self.writer.emit(
+            "start", id=task_id, group=self.group, title=title, status=last_status
+        )
+
+        def on_change():
+            nonlocal last_status
+            current = _plain(status)
+            if current and current != last_status:
+                last_status = current
+                self.writer.emit(
+                    "status", id=task_id, title=status.title, status=current
+                )
+
+        status.on_change = on_change
+        try:
+            outcome, result = await self._run_task(chrisomatic_task, status)
+        except BaseException as e:
+            self.writer.emit(
+                "finish",
+                id=task_id,
+                title=status.title,
+                outcome=Outcome.FAILED.value,
+                error=repr(e),
+            )
+            raise
+        self.writer.emit(
+            "finish", id=task_id, title=status.title, outcome=outcome.value
+        )
+        return outcome, result
+
+
+def _plain(status: Channel) -> str:
+    return "\n".join(
+        row.plain if isinstance(row, Text) else row
+        for row in status.rows()
+        if isinstance(row, (Text, str))
+    )
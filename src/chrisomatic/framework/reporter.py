@@ -0,0 +1,123 @@
+"""
+A `Reporter` decides how the progress of tasks is reported,
+by creating the `TaskRunner` for each batch of tasks.
+"""
+
+import abc
+from dataclasses import dataclass
+from typing import Sequence, TypeVar, Mapping, Optional
+
+from rich.console import Console
+
+from chrisomatic.framework.metrics import Metrics
+from chrisomatic.framework.ndjson import NdjsonWriter, NdjsonTaskRunner
+from chrisomatic.framework.outcome import Outcome
+from chrisomatic.framework.runner import (
+    TaskRunner,
+    TableTaskRunner,
+    ProgressTaskRunner,
+    TableDisplayConfig,
+    _DEFAULT_DISPLAY_CONFIG,
+)
+from chrisomatic.framework.task import ChrisomaticTask
+
+_R = TypeVar("_R")
+
+
+class Reporter(abc.ABC):
+    @abc.abstractmethod
+    def table(
+        self,
+        tasks: Sequence[ChrisomaticTask[_R]],
+        config: TableDisplayConfig = _DEFAULT_DISPLAY_CONFIG,
+    ) -> TaskRunner[_R]:
+        """
+        Create a runner for tasks which each have a status worth showing.
+        """
+        ...
+
+    @abc.abstractmethod
+    def progress(
+        self,
+        tasks: Sequence[ChrisomaticTask[_R]],
+        title: str,
+        noisy: bool = True,
+        transient: bool = False,
+    ) -> TaskRunner[_R]:
+        """
+        Create a runner for many quick tasks, where only overall progress is shown.
+        """
+        ...
+
+    def finish(self, outcomes: Mapping[Outcome, int]) -> None:
+        """
+        Report the total outcomes of a run.
+        """
+        pass
+
+
+@dataclass(frozen=True)
+class RichReporter(Reporter):
+    """
+    Shows live statuses on a terminal using [rich](https://rich.readthedocs.io/).
+    """
+
+    console: Console
+    metrics: Optional[Metrics] = None
+
+    def table(
+        self,
+        tasks: Sequence[ChrisomaticTask[_R]],
+        config: TableDisplayConfig = _DEFAULT_DISPLAY_CONFIG,
+    ) -> TaskRunner[_R]:
+        return TableTaskRunner(
+            tasks=tasks, console=self.console, metrics=self.metrics, config=config
+        )
+
+    def progress(
+        self,
+        tasks: Sequence[ChrisomaticTask[_R]],
+        title: str,
+        noisy: bool = True,
+        transient: bool = False,
+    ) -> TaskRunner[_R]:
+        return ProgressTaskRunner(
+            tasks=tasks,
+            console=self.console,
+            metrics=self.metrics,
+            title=title,
+            noisy=noisy,
+            transient=transient,
+        )
+
+
+@dataclass(frozen=True)
+class NdjsonReporter(Reporter):
+    """
+    Writes events as newline-delimited JSON, without using rich.
+    """
+
+    writer: NdjsonWriter
+    metrics: Optional[Metrics] = None
+
+    def table(
+        self,
+        tasks: Sequence[ChrisomaticTask[_R]],
+        config: TableDisplayConfig = _DEFAULT_DISPLAY_CONFIG,
+    ) -> TaskRunner[_R]:
+        return NdjsonTaskRunner(tasks=tasks, metrics=self.metrics, writer=self.writer)
+
+    def progress(
+        self,
+        tasks: Sequence[ChrisomaticTask[_R]],
+        title: str,
+        noisy: bool = True,
+        transient: bool = False,
+    ) -> TaskRunner[_R]:
+        return NdjsonTaskRunner(
+            tasks=tasks, metrics=self.metrics, writer=self.writer, group=title
+        )
+
+    def finish(self, outcomes: Mapping[Outcome, int]) -> None:
+        self.writer.emit("summary", outcomes={o.value: n for o, n in outcomes.items()})
+        self.writer.flush()
@@ -3,16 +3,21 @@ Everything to do with the rich display and parallel execution of tasks.
 """
 import abc
 import asyncio
+import itertools
+import queue
+import threading
+from collections import Counter
 from dataclasses import dataclass, InitVar, field
-from typing import Sequence, TypeVar, Generic, Awaitable, Optional
+from typing import Sequence, TypeVar, Generic, Awaitable, Optional, Callable, Self
 
-from rich.console import RenderableType, ConsoleRenderable, Console
+from rich.console import RenderableType, ConsoleRenderable, Console, Group
 from rich.live import Live
 from rich.progress import Progress, TaskID
 from rich.spinner import Spinner
 from rich.table import Table, Column
 from rich.text import Text
 
+from chrisomatic.framework.metrics import Metrics
 from chrisomatic.framework.task import Channel, ChrisomaticTask, Outcome
 
 _R = TypeVar("_R")
@@ -23,16 +28,29 @@ class _RunningTableTask(Generic[_R]):
 
     chrisomatic_task: InitVar[ChrisomaticTask[_R]]
     spinner: RenderableType
+    on_change: InitVar[Callable[[], None]]
+    run: InitVar[
+        Callable[[ChrisomaticTask[_R], Channel], Awaitable[tuple[Outcome, _R]]]
+    ]
     task: asyncio.Task = field(init=False)
     status: Channel = field(init=False)
+    _row: Optional[tuple[RenderableType, ...]] = field(init=False, default=None)
+    _row_key: tuple[int, bool] = field(init=False, default=(-1, False))
 
-    def __post_init__(self, chrisomatic_task: ChrisomaticTask):
+    def __post_init__(self, chrisomatic_task: ChrisomaticTask, on_change, run):
         title, first_status = chrisomatic_task.first_status()
-        self.status = Channel(title, first_status)
-        self.task = asyncio.create_task(chrisomatic_task.run(self.status))
+        self.status = Channel(title, first_status, on_change)
+        self.task = asyncio.create_task(run(chrisomatic_task, self.status))
 
     def to_row(self) -> tuple[RenderableType, RenderableType, RenderableType]:
-        return self.__get_icon(), self.__get_title(), self.status.render()
+        """
+        Get the row of this task, which is only rebuilt if the task has changed.
+        """
+        key = (self.status.version, self.done())
+        if self._row is None or key != self._row_key:
+            self._row = self.__get_icon(), self.__get_title(), self.status.render()
+            self._row_key = key
+        return self._row
 
     def done(self) -> bool:
         return self.task.done()
@@ -63,6 +81,8 @@ class TaskRunner(Generic[_R], abc.ABC):
 
     tasks: Sequence[ChrisomaticTask[_R]]
     console: Optional[Console] = None
+    metrics: Optional[Metrics] = None
+    """If given, the timing of every task is recorded."""
 
     @abc.abstractmethod
     async def apply(self) -> Sequence[tuple[Outcome, _R]]:
@@ -71,26 +91,149 @@ class TaskRunner(Generic[_R], abc.ABC):
         """
         ...
 
+    def _run_task(
+        self, chrisomatic_task: ChrisomaticTask[_R], status: Channel
+    ) -> Awaitable[tuple[Outcome, _R]]:
+        if self.metrics is None:
+            return chrisomatic_task.run(status)
+        return self.metrics.time(chrisomatic_task, status)
+
 
 @dataclass(frozen=True)
 class TableDisplayConfig:
     refresh_per_second: float = 15
     polling_interval: float = 0.25
+    """Minimum time between rebuilds of the table."""
     # task_title_width: int = 20
     # task_status_width: int = 50
     spinner: Spinner = Spinner("dots")
     spinner_width: int = 3
+    max_rows: int = 40
+    """
+    If there are more tasks than this, only running and failed tasks are shown,
+    followed by a line which counts all tasks.
+    """
 
 
 _DEFAULT_DISPLAY_CONFIG = TableDisplayConfig()
 
 
+@dataclass
+class _TableView:
+    """
+    The rows of a `TableTaskRunner` which are shown, which is updated
+    when a task changes instead of being computed from every task.
+    """
+
+    config: TableDisplayConfig
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    tasks: list[_RunningTableTask] = field(default_factory=list)
+    running: dict[int, _RunningTableTask] = field(default_factory=dict)
+    failed: list[_RunningTableTask] = field(default_factory=list)
+    counts: Counter[Outcome] = field(default_factory=Counter)
+
+    def start(
+        self,
+        chrisomatic_task: ChrisomaticTask,
+        run: Callable[[ChrisomaticTask, Channel], Awaitable[tuple[Outcome, object]]],
+    ) -> None:
+        i = len(self.tasks)
+        running_task = _RunningTableTask(
+            chrisomatic_task,
+            spinner=self.config.spinner,
+            on_change=self.changed.set,
+            run=run,
+        )
+        self.tasks.append(running_task)
+        self.running[i] = running_task
+        running_task.task.add_done_callback(lambda _: self.__finished(i))
+
+    def __finished(self, i: int) -> None:
+        running_task = self.running.pop(i)
+        task = running_task.task
+        if task.cancelled() or task.exception() is not None:
+            outcome = Outcome.FAILED
+        else:
+            outcome = running_task.outcome
+        self.counts[outcome] += 1
+        if outcome is Outcome.FAILED:
+            self.failed.append(running_task)
+        self.changed.set()
+
+    def all_done(self) -> bool:
+        return not self.running
+
+    @property
+    def windowed(self) -> bool:
+        return len(self.tasks) > self.config.max_rows
+
+    def snapshot(self) -> "_TableFrame":
+        """
+        Copy the rows which are shown. The returned `_TableFrame` is not changed by
+        the tasks, so it can be rendered from another thread.
+        """
+        if not self.windowed:
+            return _TableFrame(self.config, tuple(t.to_row() for t in self.tasks))
+        shown = itertools.islice(
+            itertools.chain(self.running.values(), self.failed), self.config.max_rows
+        )
+        hidden = len(self.running) + len(self.failed) - self.config.max_rows
+        return _TableFrame(
+            self.config,
+            tuple(t.to_row() for t in shown),
+            total=len(self.tasks),
+            counts=tuple((o, self.counts[o]) for o in Outcome),
+            hidden=max(hidden, 0),
+        )
+
+
+@dataclass(frozen=True)
+class _TableFrame:
+    """
+    An immutable snapshot of the rows of a `TableTaskRunner`.
+    The table itself is only built when the frame is rendered.
+    """
+
+    config: TableDisplayConfig
+    rows: tuple[tuple[RenderableType, ...], ...]
+    total: Optional[int] = None
+    """Number of tasks, if the rows are a window over the tasks."""
+    counts: tuple[tuple[Outcome, int], ...] = ()
+    hidden: int = 0
+
+    def __rich__(self) -> ConsoleRenderable:
+        table = Table.grid(
+            Column(width=self.config.spinner_width, justify="center"),
+            Column(ratio=3, min_width=20, max_width=120),
+            Column(ratio=8, min_width=40),
+            expand=True,
+        )
+        for row in self.rows:
+            table.add_row(*row)
+        if self.total is None:
+            return table
+        return Group(table, self.__summary())
+
+    def __summary(self) -> Text:
+        done = sum(n for _, n in self.counts)
+        text = Text(f"{done}/{self.total} done (")
+        text.append(", ".join(f"{n} {o.value}" for o, n in self.counts), style="dim")
+        text.append(")")
+        if self.hidden > 0:
+            text.append(f", {self.hidden} more not shown", style="dim")
+        return text
+
+
 @dataclass
 class TableTaskRunner(TaskRunner[_R]):
     """
     `TableTaskRunner` shows the live statuses from the states of all its running tasks.
     It is more suitable for task sets which have few tasks,
     and tasks that take a long time.
+
+    The table is only rebuilt after a task's status has changed. When there are more
+    tasks than `TableDisplayConfig.max_rows`, only running and failed tasks are shown.
+    The table is drawn from a separate thread, using snapshots of the tasks' statuses.
     """
 
     config: TableDisplayConfig = _DEFAULT_DISPLAY_CONFIG
@@ -99,40 +242,25 @@ class TableTaskRunner(TaskRunner[_R]):
         """
         Execute all tasks in parallel while displaying a table that shows their live statuses.
         """
-        running_tasks = tuple(
-            _RunningTableTask(t, spinner=self.config.spinner) for t in self.tasks
-        )
+        view = _TableView(self.config)
+        for t in self.tasks:
+            view.start(t, self._run_task)
+        frame = view.snapshot()
+        # Live renders the current frame from its own refresh thread, so
+        # the event loop only has to replace the frame, and never waits
+        # for the terminal.
         with Live(
-            self._render(running_tasks),
+            get_renderable=lambda: frame,
             refresh_per_second=self.config.refresh_per_second,
             console=self.console,
-        ) as live:
-            while not self._all_done(running_tasks):
+        ):
+            while not view.all_done():
+                await view.changed.wait()
+                # coalesce changes which happen in quick succession
                 await asyncio.sleep(self.config.polling_interval)
-                live.update(self._render(running_tasks))
-        return tuple(t.result() for t in running_tasks)
-
-    def _render(self, tasks: Sequence[_RunningTableTask]) -> ConsoleRenderable:
-        table = Table.grid(
-            Column(width=self.config.spinner_width, justify="center"),
-            Column(ratio=3, min_width=20, max_width=120),
-            Column(ratio=8, min_width=40),
-            expand=True,
-        )
-        for running_task in tasks:
-            table.add_row(*running_task.to_row())
-        # panel = Panel(
-        #     table,
-        #     title=self.title,
-        #     title_align='left',
-        #     border_style=self.given_config.border_style,
-        # )
-        # return panel
-        return table
-
-    @staticmethod
-    def _all_done(tasks: Sequence[_RunningTableTask]) -> bool:
-        return all(t.done() for t in tasks)
+                view.changed.clear()
+                frame = view.snapshot()
+        return tuple(t.result() for t in view.tasks)
 
 
 @dataclass
@@ -148,12 +276,18 @@ class ProgressTaskRunner(TaskRunner[_R]):
     transient: bool = False
 
     async def apply(self) -> Sequence[tuple[Outcome, _R]]:
-        with Progress(console=self.console, transient=self.transient) as progress:
+        with (
+            Progress(console=self.console, transient=self.transient) as progress,
+            _BackgroundPrinter(progress.console) as printer,
+        ):
             progress_task = progress.add_task(
                 f"[yellow]{self.title}", total=len(self.tasks)
             )
             return await asyncio.gather(
-                *(self.wrap_update(progress, progress_task, ct) for ct in self.tasks)
+                *(
+                    self.wrap_update(progress, progress_task, ct, printer)
+                    for ct in self.tasks
+                )
             )
 
     def wrap_update(
@@ -161,6 +295,7 @@ class ProgressTaskRunner(TaskRunner[_R]):
         progress: Progress,
         progress_task: TaskID,
         chrisomatic_task: ChrisomaticTask,
+        printer: "_BackgroundPrinter",
     ) -> Awaitable[tuple[Outcome, _R]]:
         """
         Wrap a `ChrisomaticTask` so that it updates a progress bar after it finishes.
@@ -169,18 +304,57 @@ class ProgressTaskRunner(TaskRunner[_R]):
         async def run_and_update() -> tuple[Outcome, _R]:
             title, first_status = chrisomatic_task.first_status()
             status_channel = Channel(title, first_status)
-            outcome, result = await chrisomatic_task.run(status_channel)
+            outcome, result = await self._run_task(chrisomatic_task, status_channel)
             progress.update(progress_task, advance=1)
             if self.noisy:
-                msg = self.__format_noise(outcome, status_channel)
-                progress.console.print(msg)
+                printer.print(_Noise(outcome, title, status_channel.render()))
             return outcome, result
 
         return run_and_update()
 
-    @staticmethod
-    def __format_noise(outcome: Outcome, status: Channel) -> RenderableType:
-        title = Text(f"[{status.title}] ", style=outcome.style)
+
+@dataclass(frozen=True)
+class _Noise:
+    """
+    The final status of a task run by `ProgressTaskRunner`.
+    """
+
+    outcome: Outcome
+    title: str
+    status: RenderableType
+
+    def __rich__(self) -> RenderableType:
+        title = Text(f"[{self.title}] ", style=self.outcome.style)
         table = Table.grid(Column(ratio=3), Column(ratio=8), expand=True)
-        table.add_row(title, status.render())
+        table.add_row(title, self.status)
         return table
+
+
+@dataclass
+class _BackgroundPrinter:
+    """
+    Prints to a console from a separate thread, so that the event loop
+    does not wait for the terminal.
+    """
+
+    console: Console
+    _queue: queue.SimpleQueue = field(init=False, default_factory=queue.SimpleQueue)
+    _thread: threading.Thread = field(init=False)
+
+    def __post_init__(self):
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._queue.put(None)
+        self._thread.join()
+
+    def print(self, renderable: RenderableType) -> None:
+        self._queue.put(renderable)
+
+    def __run(self) -> None:
+        while (renderable := self._queue.get()) is not None:
+            self.console.print(renderable)
@@ -1,5 +1,6 @@
 import abc
-from typing import TypeVar, Generic, Optional
+from collections import deque
+from typing import TypeVar, Generic, Optional, Callable
 from dataclasses import dataclass, field, InitVar
 from chrisomatic.framework.outcome import Outcome
 from rich.console import RenderableType, Group
@@ -14,24 +15,43 @@ highlighter = ReprHighlighter()
 class Channel:
     """
     A channel for a task to communicate status/progress information during `ChrisomaticTask.run` to some live display.
+
+    Statuses are stored as given, and only highlighted when they are rendered.
+    At most `max_rows` statuses are kept: older ones are dropped.
     """
 
     title: str
     first_status: InitVar[Optional[RenderableType]]
-    __frozen_rows: list[RenderableType] = field(init=False, default_factory=list)
-    __rows: list[RenderableType] = field(init=False, default_factory=list)
+    on_change: Optional[Callable[[], None]] = field(default=None, repr=False)
+    """Called whenever the status changes."""
+    max_rows: int = 16
+    """Maximum number of statuses to keep, both current and permanent."""
+    version: int = field(init=False, default=0)
+    """Incremented whenever the status changes."""
+    __frozen_rows: deque[RenderableType] = field(init=False)
+    __rows: deque[RenderableType] = field(init=False)
 
     def __post_init__(self, first_status: Optional[RenderableType]):
+        self.__frozen_rows = deque(maxlen=self.max_rows)
+        self.__rows = deque(maxlen=self.max_rows)
         if first_status is not None:
             self.append(first_status)
 
     def render(self) -> RenderableType:
-        return Group(*self.__rows)
+        """
+        Get the current status. The returned value is a copy, which does not change
+        when the status changes.
+        """
+        return Group(*(self.__highlight(s) for s in self.__rows))
+
+    def rows(self) -> tuple[RenderableType, ...]:
+        """Get a copy of the current status, without highlighting."""
+        return tuple(self.__rows)
 
     def append(self, s: RenderableType) -> None:
         """Append to this status."""
-        highlighted = self.__highlight(s)
-        self.__rows.append(highlighted)
+        self.__rows.append(s)
+        self.__changed()
 
     def replace(self, s: RenderableType) -> None:
         """Set a new status."""
@@ -46,6 +66,12 @@ class Channel:
         """
         self.__frozen_rows.extend(self.__rows)
         self.__rows.clear()
+        self.__changed()
+
+    def __changed(self) -> None:
+        self.version += 1
+        if self.on_change is not None:
+            self.on_change()
 
     @staticmethod
     def __highlight(s: RenderableType) -> RenderableType:
@@ -71,3 +97,10 @@ class ChrisomaticTask(abc.ABC, Generic[_R]):
         Returns the title and initial status text for this task.
         """
         ...
+
+    @property
+    def kind(self) -> str:
+        """
+        Name for the type of this task, used to group timing information.
+        """
+        return type(self).__name__
@@ -0,0 +1,162 @@
+"""
+Creating many users at once by running a script in the CUBE container,
+instead of making an HTTP request for each user.
+"""
+
+import asyncio
+import enum
+import json
+import logging
+from dataclasses import dataclass, field
+from inspect import cleandoc
+from typing import Optional, Sequence
+
+import aiodocker
+from aiochris.types import Username
+
+from chrisomatic.core.docker import find_cube
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
+from chrisomatic.spec.common import User
+
+_logger = logging.getLogger(__name__)
+
+_RESULT_MARKER = "CHRISOMATIC_RESULT "
+
+
+class BulkResult(str, enum.Enum):
+    CREATED = "created"
+    EXISTS = "exists"
+    ERROR = "error"
+
+
+def create_users_script() -> str:
+    """
+    Python script for `manage.py shell` which reads users from a line of stdin
+    (see `users_payload`), creates them, and prints the result for each user
+    as JSON on a line starting with `_RESULT_MARKER`.
+
+    Users are not part of the script, so that the command line of the process
+    does not contain passwords, and is not limited in size by `MAX_ARG_STRLEN`.
+    """
+    return cleandoc(
+        f"""
+        import json, sys
+        from django.contrib.auth.models import User
+        from users.serializers import UserSerializer
+        given = json.loads(sys.stdin.readline())
+        existing = set(
+            User.objects.filter(username__in=[u["username"] for u in given])
+            .values_list("username", flat=True)
+        )
+        results = {{}}
+        for u in given:
+            if u["username"] in existing:
+                results[u["username"]] = "exists"
+                continue
+            serializer = UserSerializer(data=u)
+            try:
+                if serializer.is_valid():
+                    serializer.save()
+                    results[u["username"]] = "created"
+                    continue
+            except Exception:
+                pass
+            results[u["username"]] = "error"
+        print({_RESULT_MARKER!r} + json.dumps(results))
+        """
+    )
+
+
+def users_payload(users: Sequence[User]) -> bytes:
+    """
+    Input for the script from `create_users_script`: the users as JSON, on one line.
+    """
+    payload = json.dumps(
+        [
+            {"username": u.username, "password": u.password, "email": u.email}
+            for u in users
+        ]
+    )
+    return payload.encode("utf-8") + b"\n"
+
+
+def parse_results(output: str) -> Optional[dict[Username, BulkResult]]:
+    """
+    Parse the output of the script from `create_users_script`.
+    Returns `None` if the output does not contain results.
+
+    :raises ValueError: if the results are malformed
+    """
+    for line in reversed(output.splitlines()):
+        if line.startswith(_RESULT_MARKER):
+            results = json.loads(line[len(_RESULT_MARKER) :])
+            if not isinstance(results, dict):
+                raise ValueError(f"Results are not an object: {line}")
+            return {
+                Username(username): BulkResult(result)
+                for username, result in results.items()
+            }
+    return None
+
+
+@dataclass
+class BulkUserCreation:
+    """
+    Creates `users` using CUBE's own `UserSerializer` in a single `manage.py shell`
+    of the CUBE container. The users are created the first time any of their results
+    is requested, and results are shared by every `CreateUsersTask`.
+
+    `UserSerializer` is used instead of `User.objects.bulk_create`, because CUBE
+    does more than insert a row when a user is created (e.g. creating its home
+    folder and adding it to groups).
+    """
+
+    docker: aiodocker.Docker
+    users: Sequence[User]
+    limiter: ResourceLimiter = NO_LIMITS
+    _usernames: frozenset[Username] = field(init=False)
+    _results: Optional[dict[Username, BulkResult]] = field(init=False, default=None)
+    _lock: Optional[asyncio.Lock] = field(init=False, default=None)
+
+    def __post_init__(self):
+        self._usernames = frozenset(user.username for user in self.users)
+
+    def __contains__(self, username: Username) -> bool:
+        return username in self._usernames
+
+    async def get(self, username: Username) -> BulkResult:
+        """
+        Get the result of creating a user. `BulkResult.ERROR` means that the user
+        should be created another way.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._results is None:
+                self._results = await self._create_all()
+        return self._results.get(username, BulkResult.ERROR)
+
+    async def _create_all(self) -> dict[Username, BulkResult]:
+        try:
+            async with self.limiter.use(Resource.DOCKER_RUN):
+                results = await self._exec()
+        except (aiodocker.DockerError, ValueError) as e:
+            _logger.warning("Failed to create users in CUBE container: %s", e)
+            return {}
+        return {} if results is None else results
+
+    async def _exec(self) -> Optional[dict[Username, BulkResult]]:
+        if (cube := await find_cube(self.docker)) is None:
+            return None
+        cmd = ("python", "manage.py", "shell", "-c", create_users_script())
+        exec_instance = await cube.exec(cmd, stdin=True)
+        chunks = []
+        async with exec_instance.start(detach=False) as stream:
+            await stream.write_in(users_payload(self.users))
+            while (message := await stream.read_out()) is not None:
+                if message.stream == 1:
+                    chunks.append(message.data)
+        output = b"".join(chunks).decode("utf-8")
+        if (results := parse_results(output)) is None:
+            _logger.warning("Unexpected output from CUBE container: %s", output)
+        return results
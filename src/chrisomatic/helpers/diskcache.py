@@ -0,0 +1,67 @@
+"""
+A persistent cache of JSON documents, stored as files in a directory.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> Path:
+    """
+    Get the default location for chrisomatic's cache, following the XDG base directory specification.
+    """
+    if xdg_cache_home := os.getenv("XDG_CACHE_HOME"):
+        return Path(xdg_cache_home) / "chrisomatic"
+    return Path.home() / ".cache" / "chrisomatic"
+
+
+@dataclass(frozen=True)
+class DiskCache:
+    """
+    A directory where values are stored as JSON files, one per key.
+
+    The cache is best-effort: unreadable entries are treated as missing,
+    and failures to write are logged then ignored.
+    """
+
+    directory: Path
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with self.path_for(key).open("r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read cache entry for %s: %s", key, e)
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Write a cache entry. The entry is replaced atomically, so that concurrent
+        runs of chrisomatic never see a partially written file.
+        """
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(value, f)
+                os.replace(tmp, self.path_for(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.warning("Could not write cache entry for %s: %s", key, e)
+
+    def path_for(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.json"
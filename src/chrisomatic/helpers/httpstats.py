@@ -0,0 +1,155 @@
+"""
+Statistics about HTTP requests, collected using
+[client tracing](https://docs.aiohttp.org/en/stable/tracing_reference.html).
+"""
+
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+import yarl
+
+from chrisomatic.helpers.retry import current_attempt
+
+
+def endpoint_of(method: str, url: yarl.URL) -> str:
+    """
+    Get the endpoint template of a request, where numerical IDs are replaced by `{id}`
+    and the query string is dropped,
+    e.g. `"GET http://chris:8000/api/v1/plugins/{id}/"`
+    """
+    path = "/".join("{id}" if s.isdigit() else s for s in url.raw_path.split("/"))
+    return f"{method} {url.origin()}{path}"
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    """Requests which raised an exception, or got a 5XX response."""
+    retries: int = 0
+    """Requests which were retries of a previous request."""
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def percentile(self, q: float) -> float:
+        """
+        Get a percentile of latency, in seconds, using the nearest-rank method.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = math.ceil(q / 100 * len(ordered))
+        return ordered[max(rank - 1, 0)]
+
+    def merge(self, other: "EndpointStats") -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.retries += other.retries
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.new_connections += other.new_connections
+        self.reused_connections += other.reused_connections
+        self.latencies.extend(other.latencies)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "latency_p50": self.percentile(50),
+            "latency_p90": self.percentile(90),
+            "latency_p99": self.percentile(99),
+        }
+
+
+@dataclass
+class HttpStats:
+    """
+    Collects `EndpointStats` for every `aiohttp.ClientSession` it is attached to.
+    """
+
+    endpoints: dict[str, EndpointStats] = field(default_factory=dict)
+    trace_config: aiohttp.TraceConfig = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_request_end.append(self._on_request_end)
+        self.trace_config.on_request_exception.append(self._on_request_exception)
+        self.trace_config.on_request_chunk_sent.append(self._on_request_chunk_sent)
+        self.trace_config.on_response_chunk_received.append(
+            self._on_response_chunk_received
+        )
+        self.trace_config.on_connection_create_end.append(
+            self._on_connection_create_end
+        )
+        self.trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        self.trace_config.freeze()
+
+    def attach(self, session: aiohttp.ClientSession) -> None:
+        """
+        Trace the requests made by a session which was already created,
+        e.g. by `aiochris`.
+        """
+        if self.trace_config not in session.trace_configs:
+            session.trace_configs.append(self.trace_config)
+
+    def total(self) -> EndpointStats:
+        total = EndpointStats()
+        for stats in self.endpoints.values():
+            total.merge(stats)
+        return total
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "total": self.total().to_dict(),
+            "endpoints": {
+                endpoint: stats.to_dict()
+                for endpoint, stats in sorted(self.endpoints.items())
+            },
+        }
+
+    def write(self, path: Path) -> None:
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+    async def _on_request_start(self, _session, ctx: SimpleNamespace, params) -> None:
+        endpoint = endpoint_of(params.method, params.url)
+        ctx.stats = self.endpoints.setdefault(endpoint, EndpointStats())
+        ctx.stats.requests += 1
+        if current_attempt() > 0:
+            ctx.stats.retries += 1
+        ctx.start = time.monotonic()
+
+    async def _on_request_end(self, _session, ctx: SimpleNamespace, params) -> None:
+        ctx.stats.latencies.append(time.monotonic() - ctx.start)
+        if params.response.status >= 500:
+            ctx.stats.errors += 1
+
+    async def _on_request_exception(self, _session, ctx: SimpleNamespace, _) -> None:
+        ctx.stats.latencies.append(time.monotonic() - ctx.start)
+        ctx.stats.errors += 1
+
+    async def _on_request_chunk_sent(self, _session, ctx: SimpleNamespace, params):
+        ctx.stats.bytes_sent += len(params.chunk)
+
+    async def _on_response_chunk_received(self, _session, ctx: SimpleNamespace, params):
+        ctx.stats.bytes_received += len(params.chunk)
+
+    async def _on_connection_create_end(self, _session, ctx: SimpleNamespace, _):
+        ctx.stats.new_connections += 1
+
+    async def _on_connection_reuseconn(self, _session, ctx: SimpleNamespace, _):
+        ctx.stats.reused_connections += 1
@@ -0,0 +1,56 @@
+"""
+A journal of progress through a file of users, so that an interrupted run
+can resume where it stopped.
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Journal:
+    """
+    An append-only file of checkpoints. Every checkpoint is a line of JSON
+    saying how many records of a source were done.
+
+    A checkpoint is written with a single `write` and flushed to disk,
+    so if a run crashes, at worst the last line is incomplete and is ignored.
+    """
+
+    path: Path
+
+    def done(self, fingerprint: str) -> int:
+        """
+        Get the number of records of the source identified by `fingerprint`
+        which were done, according to the last checkpoint.
+        """
+        done = 0
+        try:
+            with self.path.open("r") as f:
+                for line in f:
+                    try:
+                        checkpoint = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if checkpoint.get("source") == fingerprint:
+                        done = checkpoint["done"]
+                    else:
+                        done = 0
+        except FileNotFoundError:
+            return 0
+        except (OSError, KeyError, TypeError, AttributeError) as e:
+            logger.warning("Could not read journal %s: %s", self.path, e)
+            return 0
+        return done
+
+    def checkpoint(self, fingerprint: str, done: int) -> None:
+        line = json.dumps({"source": fingerprint, "done": done}) + "\n"
+        with self.path.open("a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
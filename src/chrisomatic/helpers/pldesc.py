@@ -1,58 +1,248 @@
 """
 Helpers for getting the ChRIS plugin JSON description from a container image.
 """
+import hashlib
+import json
+from dataclasses import dataclass, field
 from typing import Optional, Callable, Awaitable, Sequence
 
 import aiodocker
 from rich.text import Text
+from serde import serde
 
 from chrisomatic.core.docker import (
     rich_pull_if_missing,
     PullResult,
     get_cmd,
+    inspect_image,
     check_output,
     NonZeroExitCodeError,
+    PullScheduler,
 )
+from chrisomatic.core.images import ImageIndex
+from chrisomatic.framework.limits import ResourceLimiter, Resource, NO_LIMITS
 from chrisomatic.framework.task import Channel
+from chrisomatic.helpers.diskcache import DiskCache
 from chrisomatic.spec.given import GivenCubePlugin
 
 
+@serde
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+
+_LINEAGE_KEY = "lineages"
+"""Key of the cache entry of the methods which worked for each image lineage."""
+
+_MAX_LINEAGES = 10000
+"""Maximum number of image lineages for which the method which worked is kept."""
+
+
+@dataclass(frozen=True)
+class DescriptionCache:
+    """
+    Persistent cache of plugin JSON descriptions, keyed by image ID or digest.
+
+    The key also includes the arguments which the plugin's `GivenCubePlugin`
+    would give to `chris_plugin_info`, since they affect its output.
+
+    The name of the method which obtained a description is also remembered for
+    the lineage of the image (see `lineage_of`), since images which are built
+    from the same base image are usually described by the same method.
+    Those are kept in memory until `save` is called.
+    """
+
+    cache: DiskCache
+    stats: CacheStats = field(default_factory=CacheStats)
+    _lineages: dict[str, str] = field(init=False, default_factory=dict)
+    _unsaved: set[str] = field(init=False, default_factory=set)
+
+    def __post_init__(self):
+        if isinstance(lineages := self.cache.get(_LINEAGE_KEY), dict):
+            self._lineages.update(lineages)
+
+    def get(
+        self, image_id: str, plugin: GivenCubePlugin, count_miss: bool = True
+    ) -> Optional[str]:
+        """
+        Get a cached JSON description. Malformed entries are treated as missing.
+
+        Unless `count_miss`, a miss is not counted in `stats`, e.g. because
+        the description is going to be looked up by another key.
+        """
+        entry = self.cache.get(self._key(image_id, plugin))
+        if not isinstance(entry, dict) or not isinstance(entry.get("json"), str):
+            if count_miss:
+                self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.stats.bytes_read += len(entry["json"].encode("utf-8"))
+        return entry["json"]
+
+    def put(
+        self, image_id: str, plugin: GivenCubePlugin, method: str, json_repr: str
+    ) -> None:
+        """
+        Save a JSON description along with the name of the method which obtained it.
+        """
+        entry = {"method": method, "json": json_repr}
+        self.cache.put(self._key(image_id, plugin), entry)
+        self.stats.bytes_written += len(json_repr.encode("utf-8"))
+
+    def remembered_method(self, lineage: Sequence[str]) -> Optional[str]:
+        """
+        Get the name of the method which worked for the image which shares
+        the longest lineage with `lineage`.
+        """
+        return next(
+            (self._lineages[key] for key in lineage if key in self._lineages), None
+        )
+
+    def remember_method(self, lineage: Sequence[str], method: str) -> None:
+        for key in lineage:
+            self._lineages.pop(key, None)
+            self._lineages[key] = method
+        self._unsaved.update(lineage)
+        while len(self._lineages) > _MAX_LINEAGES:
+            del self._lineages[next(iter(self._lineages))]
+
+    def save(self) -> None:
+        """
+        Write the remembered methods to disk, if any were remembered since
+        the cache was loaded or last saved.
+        """
+        if self._unsaved:
+            self.cache.put(_LINEAGE_KEY, self._lineages)
+            self._unsaved.clear()
+
+    @staticmethod
+    def _key(image_id: str, plugin: GivenCubePlugin) -> str:
+        return json.dumps(
+            [image_id, plugin.dock_image, plugin.name, plugin.public_repo]
+        )
+
+
 async def try_obtain_json_description(
-    docker: Optional[aiodocker.Docker], plugin: GivenCubePlugin, status: Channel
+    docker: Optional[aiodocker.Docker],
+    plugin: GivenCubePlugin,
+    status: Channel,
+    cache: Optional[DescriptionCache] = None,
+    limiter: ResourceLimiter = NO_LIMITS,
+    images: Optional[ImageIndex] = None,
+    pulls: Optional[PullScheduler] = None,
 ) -> Optional[str]:
     """
     Attempt to use Docker to run containers of the plugin to extract its JSON description.
+
+    If `cache` is given, containers are not run for images which were described before.
+    When `plugin.dock_image` is pinned by digest, Docker is not used at all for a cache hit.
+    If `images` is given, it is used to check for and inspect local images.
+    If `pulls` is given, images are pulled by it instead of under `limiter`.
     """
+    # with Docker, a miss by digest is followed by a lookup by image ID,
+    # so only one miss is counted.
+    if (
+        cache is not None
+        and (digest := _digest_of(plugin.dock_image)) is not None
+        and (cached := cache.get(digest, plugin, count_miss=docker is None)) is not None
+    ):
+        status.replace("Using cached description")
+        return cached
     if docker is None:
         status.replace("Docker not available")
         return None
     if plugin.dock_image is None:
         status.replace("Unknown image name")
         return None
-    pull_result = await rich_pull_if_missing(docker, plugin.dock_image, status)
+    if pulls is not None:
+        pull_result = await pulls.pull_if_missing(plugin.dock_image, status)
+    else:
+        async with limiter.use(Resource.DOCKER_PULL):
+            pull_result = await rich_pull_if_missing(
+                docker, plugin.dock_image, status, images
+            )
     if pull_result == PullResult.error:
         return None
     if pull_result == PullResult.pulled:
         status.keep_current()
-    guessing_methods: list[
-        Callable[
-            [aiodocker.Docker, GivenCubePlugin, Channel],
-            Awaitable[Optional[str]],
-        ]
-    ] = [
-        _json_from_chris_plugin_info_post030,
-        _json_from_chris_plugin_info_pre030,
-        _json_from_old_chrisapp,
-    ]
-    for guess_method in guessing_methods:
-        json_representation = await guess_method(docker, plugin, status)
+    info = await inspect_image(docker, plugin.dock_image, images)
+    image_id = info["Id"]
+    if cache is not None and (cached := cache.get(image_id, plugin)) is not None:
+        status.replace("Using cached description")
+        return cached
+    lineage = lineage_of(info)
+    remembered = cache.remembered_method(lineage) if cache is not None else None
+    for method in rank_methods(info, remembered):
+        guess_method = _GUESSING_METHODS[method]
+        async with limiter.use(Resource.DOCKER_RUN):
+            json_representation = await guess_method(docker, plugin, status, images)
         if json_representation is not None:
+            if cache is not None:
+                for key in (image_id, _digest_of(plugin.dock_image)):
+                    if key is not None:
+                        cache.put(key, plugin, method, json_representation)
+                cache.remember_method(lineage, method)
             return json_representation
     return None
 
 
+def lineage_of(info: dict) -> list[str]:
+    """
+    Identify the lineage of an image by its layers: a key for every image
+    which it could have been built from, from the image itself to its first layer.
+    """
+    layers = (info.get("RootFS") or {}).get("Layers") or []
+    keys = []
+    h = hashlib.sha256()
+    for layer in layers:
+        h.update(layer.encode("utf-8"))
+        keys.append(h.hexdigest())
+    return keys[::-1]
+
+
+def rank_methods(info: dict, remembered: Optional[str] = None) -> list[str]:
+    """
+    Order the names of the methods of obtaining a JSON description by how likely
+    they are to work for an image, given its details (`docker image inspect`).
+
+    Images created from `cookiecutter-chrisapp` are recognized by its
+    `APPROOT` environment variable or `--help` default arguments. Otherwise,
+    the method which worked for another image of the same lineage goes first.
+    The image's own metadata wins, since a shared lineage might only be
+    a common base image such as `python`.
+    """
+    ranked = list(_GUESSING_METHODS)
+    if remembered in ranked:
+        ranked.remove(remembered)
+        ranked.insert(0, remembered)
+    config = info.get("Config") or {}
+    env = config.get("Env") or []
+    cmd = config.get("Cmd") or []
+    if any(e.startswith("APPROOT=") for e in env) or cmd[-1:] == ["--help"]:
+        ranked.remove("old_chrisapp")
+        ranked.insert(0, "old_chrisapp")
+    return ranked
+
+
+def _digest_of(image: Optional[str]) -> Optional[str]:
+    """
+    Get the digest from an image reference which is pinned by digest,
+    e.g. `"docker.io/fnndsc/pl-dircopy@sha256:abc..."` -> `"sha256:abc..."`
+    """
+    if image is None or "@" not in image:
+        return None
+    return image.rsplit("@", maxsplit=1)[1]
+
+
 async def _json_from_chris_plugin_info_post030(
-    docker: aiodocker.Docker, plugin: GivenCubePlugin, status: Channel
+    docker: aiodocker.Docker,
+    plugin: GivenCubePlugin,
+    status: Channel,
+    _images: Optional[ImageIndex] = None,
 ) -> Optional[str]:
     """
     Run `chris_plugin_info` with its usage since version 0.3.0
@@ -66,7 +256,10 @@ async def _json_from_chris_plugin_info_post030(
 
 
 async def _json_from_chris_plugin_info_pre030(
-    docker: aiodocker.Docker, plugin: GivenCubePlugin, status: Channel
+    docker: aiodocker.Docker,
+    plugin: GivenCubePlugin,
+    status: Channel,
+    _images: Optional[ImageIndex] = None,
 ) -> Optional[str]:
     """
     Run `chris_plugin_info` with its usage from before version 0.3.0
@@ -75,9 +268,12 @@ async def _json_from_chris_plugin_info_pre030(
 
 
 async def _json_from_old_chrisapp(
-    docker: aiodocker.Docker, plugin: GivenCubePlugin, status: Channel
+    docker: aiodocker.Docker,
+    plugin: GivenCubePlugin,
+    status: Channel,
+    images: Optional[ImageIndex] = None,
 ) -> Optional[str]:
-    cmd = await get_cmd(docker, plugin.dock_image)
+    cmd = await get_cmd(docker, plugin.dock_image, images)
     if len(cmd) == 0:
         return None
     return await _try_run(docker, plugin, status, (cmd[0], "--json"))
@@ -98,3 +294,20 @@ async def _try_run(
         return None
     except NonZeroExitCodeError:
         return None
+
+
+_GUESSING_METHODS: dict[
+    str,
+    Callable[
+        [aiodocker.Docker, GivenCubePlugin, Channel, Optional[ImageIndex]],
+        Awaitable[Optional[str]],
+    ],
+] = {
+    method.__name__.removeprefix("_json_from_"): method
+    for method in (
+        _json_from_chris_plugin_info_post030,
+        _json_from_chris_plugin_info_pre030,
+        _json_from_old_chrisapp,
+    )
+}
+"""Methods of obtaining a JSON description, by name, in their default order."""
@@ -1,18 +1,145 @@
 import asyncio
 import abc
+import enum
 import random
-from dataclasses import dataclass
-from typing import TypeVar, Generic, Callable, Awaitable
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TypeVar, Generic, Callable, Awaitable, Optional
 from rich.text import Text
 from chrisomatic.framework.task import Channel
 
 R = TypeVar("R")
+_attempt: ContextVar[int] = ContextVar("_attempt", default=0)
+
+
+def current_attempt() -> int:
+    """
+    Get the number of times the function being called by `RetryWrapper` was
+    already attempted, i.e. `0` if it is not a retry.
+    """
+    return _attempt.get()
+
+
+@dataclass(eq=False)
+class RetryBudget:
+    """
+    Limits retries to a fraction of all calls, so that retries cannot multiply
+    the load on a server which is already struggling.
+
+    Every call deposits `ratio` tokens, and every retry withdraws one token.
+    The budget starts with `reserve` tokens, so that a few retries are allowed
+    before many calls were made.
+    """
+
+    ratio: float = 0.2
+    reserve: float = 10.0
+    capacity: float = 100.0
+    tokens: float = field(init=False)
+
+    def __post_init__(self):
+        self.tokens = self.reserve
+
+    def deposit(self) -> None:
+        self.tokens = min(self.tokens + self.ratio, self.capacity)
+
+    def withdraw(self) -> bool:
+        """
+        Take a token for a retry. Returns `False` if the budget is exhausted.
+        """
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class _CircuitState(enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+@dataclass
+class CircuitBreaker:
+    """
+    Stops calls to a host after `failure_threshold` consecutive failures.
+    After `reset_timeout` seconds, one call is let through: if it succeeds,
+    calls are allowed again.
+    """
+
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    failures: int = field(init=False, default=0)
+    state: _CircuitState = field(init=False, default=_CircuitState.CLOSED)
+    opened_at: float = field(init=False, default=0.0)
+
+    def allow(self) -> bool:
+        if self.state is _CircuitState.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        # let one trial call through. If it does not finish within reset_timeout,
+        # another one is let through.
+        self.state = _CircuitState.HALF_OPEN
+        self.opened_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = _CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if (
+            self.state is _CircuitState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self.state = _CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+
+@dataclass(eq=False)
+class CircuitBreakers:
+    """
+    A `CircuitBreaker` for every host.
+    """
+
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    breakers: dict[str, CircuitBreaker] = field(init=False, default_factory=dict)
+
+    def get(self, host: str) -> CircuitBreaker:
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+        return self.breakers[host]
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a function when its host is considered to be down.
+    """
+
+    pass
+
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+"""Retry budget shared by all `RetryWrapper` which are not given their own."""
+DEFAULT_CIRCUIT_BREAKERS = CircuitBreakers()
+"""Circuit breakers shared by all `RetryWrapper` which are not given their own."""
 
 
 @dataclass(frozen=True)
 class RetryWrapper(Generic[R], abc.ABC):
     """
     This helper class provides a mechanism for retrying a function call.
+
+    Retries wait for an exponentially increasing, randomized amount of time,
+    so that concurrent callers do not retry in lockstep. Retries are also limited by
+    a `RetryBudget` shared with other `RetryWrapper`, and if `host` is given, calls
+    fail fast with `CircuitOpenError` when the host seems to be down.
     """
 
     fn: Callable[[], Awaitable[R]]
@@ -22,33 +149,72 @@ class RetryWrapper(Generic[R], abc.ABC):
     might not happen again when simply called again.
     """
     wait_min: float = 1.0
-    wait_max: float = 2.0
-    max_attempt: int = 2
+    """Base of the exponential backoff, in seconds."""
+    wait_max: float = 30.0
+    """Maximum time to wait before a retry, in seconds."""
+    max_attempt: int = 3
+    """Maximum number of times to call `fn`."""
+    host: Optional[str] = None
+    """Host which `fn` makes requests to, used for circuit breaking."""
+    budget: RetryBudget = DEFAULT_RETRY_BUDGET
+    breakers: CircuitBreakers = DEFAULT_CIRCUIT_BREAKERS
 
     def __post_init__(self):
         if self.wait_min > self.wait_max:
             raise ValueError(f"wait_min > wait_max ({self.wait_min} > {self.wait_max})")
 
-    async def call(self, status: Channel, attempt: int = 0) -> R:
-        try:
-            return await self.fn()
-        except BaseException as e:
-            t = Text()
-            t.append(str(e), style="red")
-            t.append(f" (attempt {attempt + 1}/{self.max_attempt})", style="dim")
-            explanation = self.explanation
-            if self.explanation:
-                t.append(f"\n{explanation}", style="dim")
-            status.append(t)
-
-            if attempt >= self.max_attempt:
-                raise e
-            if not self.check_exception(e):
-                raise e
-
-            wait = random.random() * (self.wait_max - self.wait_min) + self.wait_min
-            await asyncio.sleep(wait)
-            return await self.call(status, attempt + 1)
+    async def call(self, status: Channel) -> R:
+        breaker = None if self.host is None else self.breakers.get(self.host)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                status.append(Text(f"{self.host} seems to be down", style="red"))
+                raise CircuitOpenError(self.host)
+            token = _attempt.set(attempt)
+            try:
+                result = await self.fn()
+            except Exception as e:
+                expected = self.check_exception(e)
+                if breaker is not None:
+                    # unexpected errors come from a host which is up
+                    if expected:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                self.__report(e, attempt, status)
+                if not expected:
+                    raise e
+                if attempt + 1 >= self.max_attempt:
+                    raise e
+                if not self.budget.withdraw():
+                    status.append(Text("retry budget exhausted", style="dim"))
+                    raise e
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                return result
+            finally:
+                _attempt.reset(token)
+            attempt += 1
+            await asyncio.sleep(self.backoff(attempt))
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Time to wait before the given attempt, using "full jitter":
+        a random amount of time up to an exponentially increasing limit.
+        """
+        limit = min(self.wait_max, self.wait_min * 2**attempt)
+        return random.uniform(0, limit)
+
+    def __report(self, e: BaseException, attempt: int, status: Channel) -> None:
+        t = Text()
+        t.append(str(e), style="red")
+        t.append(f" (attempt {attempt + 1}/{self.max_attempt})", style="dim")
+        explanation = self.explanation
+        if self.explanation:
+            t.append(f"\n{explanation}", style="dim")
+        status.append(t)
 
     @abc.abstractmethod
     def check_exception(self, e: BaseException) -> bool:
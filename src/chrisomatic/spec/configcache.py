@@ -0,0 +1,101 @@
+"""
+A persistent cache of deserialized configurations, so that a configuration file
+which did not change is not parsed and validated again.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from chrisomatic.__version__ import __version__
+from chrisomatic.spec.given import GivenConfig
+
+logger = logging.getLogger(__name__)
+
+_ENVIRONMENT = ("CHRIS_USERNAME", "CHRIS_PASSWORD")
+"""Environment variables which are read during deserialization."""
+
+_SPEC_MODULES = (
+    "schema.py",
+    "given.py",
+    "common.py",
+    "deserialize.py",
+    "fastload.py",
+)
+"""Modules of `chrisomatic.spec` which affect the result of deserialization."""
+
+
+def _spec_digest() -> bytes:
+    h = hashlib.sha256()
+    for name in _SPEC_MODULES:
+        h.update((Path(__file__).parent / name).read_bytes())
+    return h.digest()
+
+
+@dataclass(frozen=True)
+class CachedConfig:
+    """
+    A deserialized configuration.
+    """
+
+    config: GivenConfig
+    warnings: tuple[str, ...]
+    """Warnings which were printed during deserialization, to be printed again."""
+
+
+@dataclass(frozen=True)
+class ConfigCache:
+    """
+    Pickled `CachedConfig` objects stored as files in a directory. The key of a
+    configuration is a hash of its content and file name (which warnings mention),
+    the environment variables read during deserialization, the version of
+    chrisomatic, and the source code of the schema.
+
+    Like `chrisomatic.helpers.diskcache.DiskCache`, the cache is best-effort.
+    Entries contain passwords, so they are only readable by their owner.
+    """
+
+    directory: Path
+
+    def key(self, input_config: str, filename: str) -> str:
+        h = hashlib.sha256()
+        h.update(__version__.encode("utf-8"))
+        h.update(_spec_digest())
+        for name in _ENVIRONMENT:
+            h.update(repr(os.getenv(name)).encode("utf-8"))
+        h.update(repr(filename).encode("utf-8"))
+        h.update(input_config.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedConfig]:
+        try:
+            with self._path_for(key).open("rb") as f:
+                config = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # unpickling can fail in many ways
+            logger.warning("Could not read cached config %s: %s", key, e)
+            return None
+        return config if isinstance(config, CachedConfig) else None
+
+    def put(self, key: str, config: CachedConfig) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._path_for(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except (OSError, pickle.PicklingError) as e:
+            logger.warning("Could not write cached config %s: %s", key, e)
+
+    def _path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.pickle"
@@ -1,18 +1,47 @@
+import functools
 import os
+from typing import Optional, Callable, Any
 
 import serde
-import strictyaml
 import typer
 from rich.console import Console
 from rich.status import Status
 
-from chrisomatic.spec.given import GivenConfig
-from chrisomatic.spec.schema import schema
+from chrisomatic.spec import fastload
+from chrisomatic.spec.configcache import ConfigCache, CachedConfig
+from chrisomatic.spec.given import GivenConfig, ValidationError
 
 
 def deserialize_config(
-    input_config: str, filename: str, console: Console
+    input_config: str,
+    filename: str,
+    console: Console,
+    cache: Optional[ConfigCache] = None,
 ) -> GivenConfig:
+    """
+    Parse and validate a configuration. If `cache` is given, a configuration
+    which was deserialized before is read from the cache instead, and the
+    warnings of its deserialization are printed again.
+    """
+    if cache is None:
+        deserialized = _deserialize(input_config, filename, console)
+    else:
+        key = cache.key(input_config, filename)
+        if (deserialized := cache.get(key)) is None:
+            deserialized = _deserialize(input_config, filename, console)
+            cache.put(key, deserialized)
+    for warning in deserialized.warnings:
+        console.print(warning)
+    return deserialized.config
+
+
+def _deserialize(input_config: str, filename: str, console: Console) -> CachedConfig:
+    # The fast loader accepts valid input only. For invalid input, StrictYAML
+    # is used to produce an error message.
+    if fastload.is_available():
+        data = fastload.load(input_config, _fast_validator())
+        if data is not None:
+            return _from_data(data, filename, console)
     if input_config.count("\n") < 100:
         return _load_from_yaml(input_config, filename, console)
     text = (
@@ -23,20 +52,40 @@ def deserialize_config(
         return _load_from_yaml(input_config, filename, console)
 
 
-def _load_from_yaml(input_config: str, filename: str, console: Console) -> GivenConfig:
-    parsed_yaml = strictyaml.load(input_config, schema=schema, label=filename)
-    if "chris_store" in parsed_yaml.data:
-        console.print(
+@functools.cache
+def _fast_validator() -> Callable[[Any], Any]:
+    # the schema is made of StrictYAML validators, so it is only imported when
+    # a configuration is deserialized, rather than found in the cache.
+    from chrisomatic.spec.schema import schema
+
+    return fastload.compile_validator(schema)
+
+
+def _load_from_yaml(input_config: str, filename: str, console: Console) -> CachedConfig:
+    import strictyaml
+
+    from chrisomatic.spec.schema import schema
+
+    try:
+        parsed_yaml = strictyaml.load(input_config, schema=schema, label=filename)
+    except strictyaml.YAMLValidationError as e:
+        raise ValidationError(str(e)) from e
+    return _from_data(parsed_yaml.data, filename, console)
+
+
+def _from_data(data: dict, filename: str, console: Console) -> CachedConfig:
+    warnings = []
+    if "chris_store" in data:
+        warnings.append(
             f"[yellow]WARNING[/yellow]: chris_store section in {filename} is deprecated."
         )
-    if "chris_store_url" in parsed_yaml.data["on"]:
-        console.print(
+    if "chris_store_url" in data["on"]:
+        warnings.append(
             f"[yellow]WARNING[/yellow]: on.chris_store_url in {filename} is deprecated."
         )
     # messy new feature: if on.chris_superuser is not found in the YAML,
     # get the superuser credentials from environment variables instead.
-    data = parsed_yaml.data
-    if "chris_superuser" not in parsed_yaml.data["on"]:
+    if "chris_superuser" not in data["on"]:
         username = os.getenv("CHRIS_USERNAME", None)
         password = os.getenv("CHRIS_PASSWORD", None)
         if username is None or password is None:
@@ -51,4 +100,4 @@ def _load_from_yaml(input_config: str, filename: str, console: Console) -> Given
                 }
             }
         }
-    return serde.from_dict(GivenConfig, data)
+    return CachedConfig(serde.from_dict(GivenConfig, data), tuple(warnings))
@@ -0,0 +1,242 @@
+"""
+A fast alternative to `strictyaml.load`, using the C parser of
+[libyaml](https://pyyaml.org/wiki/LibYAML) when PyYAML was built with it.
+
+The fast loader only ever *accepts* input: it returns the same data as
+`strictyaml.load(...).data` would, or `None` for anything which is invalid or
+which it is unsure about (flow style, anchors, tags, duplicate keys, ...).
+In that case, the input should be loaded using StrictYAML, which produces
+the error message, so error messages are the same with or without libyaml.
+
+StrictYAML is only imported to compile a validator, so loading with
+an already compiled validator does not need it.
+"""
+
+import copy
+import re
+from typing import Any, Callable, Optional, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import strictyaml
+
+try:
+    import yaml
+    from yaml import CBaseLoader as _Loader
+except ImportError:  # PyYAML was built without libyaml
+    yaml = None
+
+_Validate = Callable[[Any], Any]
+
+_TRUE_VALUES = frozenset(("yes", "true", "on", "1", "y"))
+_FALSE_VALUES = frozenset(("no", "false", "off", "0", "n"))
+_INTEGER = re.compile(r"^[-+]?[0-9_]+$")
+"""Same as `strictyaml.utils.is_integer`."""
+
+
+class _Mismatch(Exception):
+    pass
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def is_available() -> bool:
+    return yaml is not None
+
+
+def compile_validator(validator: "strictyaml.Validator") -> _Validate:
+    """
+    Compile a StrictYAML validator to a function which validates data
+    of plain `str`, `list` and `dict`, and returns the same data as StrictYAML.
+    The function raises `_Mismatch` if the data is invalid.
+
+    :raises NotImplementedError: if the validator, or any validator it contains,
+                                 is not supported
+    """
+    import strictyaml
+
+    from chrisomatic.spec.schema import PositiveInt
+
+    match validator:
+        case strictyaml.OrValidator():
+            return _compile_or(
+                compile_validator(validator._validator_a),
+                compile_validator(validator._validator_b),
+            )
+        case strictyaml.Map():
+            return _compile_map(validator)
+        case strictyaml.Seq():
+            return _compile_seq(compile_validator(validator._validator))
+        case strictyaml.EmptyList():
+            return _scalar(_empty_list)
+        case strictyaml.Regex():
+            return _scalar(_regex(validator._fullmatch))
+        case strictyaml.Bool():
+            return _scalar(_bool)
+        case PositiveInt():
+            return _scalar(_positive_int)
+        case strictyaml.Int():
+            return _scalar(_int)
+        case strictyaml.Str():
+            return _scalar(_str)
+    raise NotImplementedError(f"Unsupported validator: {validator!r}")
+
+
+def _compile_or(a: _Validate, b: _Validate) -> _Validate:
+    def validate(value):
+        try:
+            return a(value)
+        except _Mismatch:
+            return b(value)
+
+    return validate
+
+
+def _compile_map(validator: "strictyaml.Map") -> _Validate:
+    import strictyaml
+
+    if not isinstance(validator.key_validator, strictyaml.Str):
+        raise NotImplementedError(f"Unsupported key validator: {validator!r}")
+    values = {
+        key: compile_validator(value)
+        for key, value in validator._validator_dict.items()
+    }
+    required = frozenset(validator._required_keys)
+    defaults = validator._defaults
+
+    def validate(value):
+        if not isinstance(value, dict):
+            raise _Mismatch()
+        data = {}
+        for key, item in value.items():
+            if key not in values:
+                raise _Mismatch()
+            data[key] = values[key](item)
+        if not required <= data.keys():
+            raise _Mismatch()
+        for key, default in defaults.items():
+            if key not in data:
+                data[key] = copy.deepcopy(default)
+        return data
+
+    return validate
+
+
+def _compile_seq(item: _Validate) -> _Validate:
+    def validate(value):
+        if not isinstance(value, list) or not value:
+            raise _Mismatch()
+        return [item(v) for v in value]
+
+    return validate
+
+
+def _scalar(fn: _Validate) -> _Validate:
+    def validate(value):
+        if not isinstance(value, str):
+            raise _Mismatch()
+        return fn(value)
+
+    return validate
+
+
+def _empty_list(value: str) -> list:
+    if value != "":
+        raise _Mismatch()
+    return []
+
+
+def _regex(fullmatch: Callable[[str], Any]) -> _Validate:
+    def validate(value: str) -> str:
+        if fullmatch(value) is None:
+            raise _Mismatch()
+        return value
+
+    return validate
+
+
+def _bool(value: str) -> bool:
+    lower = value.lower()
+    if lower in _TRUE_VALUES:
+        return True
+    if lower in _FALSE_VALUES:
+        return False
+    raise _Mismatch()
+
+
+def _int(value: str) -> int:
+    if _INTEGER.match(value) is None:
+        raise _Mismatch()
+    return int(value.replace("_", ""))
+
+
+def _positive_int(value: str) -> int:
+    if (i := _int(value)) < 1:
+        raise _Mismatch()
+    return i
+
+
+def _str(value: str) -> str:
+    return value
+
+
+def parse(text: str) -> Any:
+    """
+    Parse a YAML document where every scalar is a string, like StrictYAML.
+
+    :raises _Unsupported: if the document uses syntax disallowed by StrictYAML,
+                          or is not a single document
+    """
+    events = yaml.parse(text, Loader=_Loader)
+    if not isinstance(next(events), yaml.StreamStartEvent):
+        raise _Unsupported()
+    if not isinstance(next(events), yaml.DocumentStartEvent):
+        raise _Unsupported()
+    data = _build(next(events), events)
+    if not isinstance(next(events), yaml.DocumentEndEvent):
+        raise _Unsupported()
+    if not isinstance(next(events), yaml.StreamEndEvent):
+        raise _Unsupported()
+    return data
+
+
+def _build(event: "yaml.Event", events: Iterator["yaml.Event"]) -> Any:
+    if isinstance(event, yaml.ScalarEvent):
+        if event.anchor is not None or event.tag is not None:
+            raise _Unsupported()
+        return event.value
+    if isinstance(event, yaml.MappingStartEvent):
+        if event.anchor is not None or event.tag is not None or event.flow_style:
+            raise _Unsupported()
+        mapping = {}
+        while not isinstance(key := next(events), yaml.MappingEndEvent):
+            key = _build(key, events)
+            if not isinstance(key, str) or key in mapping:
+                raise _Unsupported()
+            mapping[key] = _build(next(events), events)
+        return mapping
+    if isinstance(event, yaml.SequenceStartEvent):
+        if event.anchor is not None or event.tag is not None or event.flow_style:
+            raise _Unsupported()
+        sequence = []
+        while not isinstance(item := next(events), yaml.SequenceEndEvent):
+            sequence.append(_build(item, events))
+        return sequence
+    # aliases, or anything else
+    raise _Unsupported()
+
+
+def load(text: str, validate: _Validate) -> Optional[Any]:
+    """
+    Parse and validate a YAML document.
+
+    :return: the validated data, or `None` if the document should be loaded
+             using StrictYAML instead.
+    """
+    if yaml is None:
+        return None
+    try:
+        return validate(parse(text))
+    except (_Mismatch, _Unsupported, StopIteration, yaml.YAMLError):
+        return None
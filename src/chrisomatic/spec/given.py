@@ -220,6 +220,8 @@ class GivenConfig:
     version: str
     on: On
     cube: GivenCube
+    concurrency: dict[str, int] = field(default_factory=dict)
+    """Limits on concurrent operations, see `chrisomatic.framework.limits.Resource`."""
 
     def expand(self) -> ExpandedConfig:
         """
@@ -1,4 +1,28 @@
-from strictyaml import Str, Map, Regex, Optional, Seq, EmptyList, Bool, Any, NullNone
+from strictyaml import (
+    Str,
+    Map,
+    Regex,
+    Optional,
+    Seq,
+    EmptyList,
+    Bool,
+    Any,
+    NullNone,
+    Int,
+)
+
+
+class PositiveInt(Int):
+    """
+    An integer which is at least 1.
+    """
+
+    def validate_scalar(self, chunk):
+        value = super().validate_scalar(chunk)
+        if value < 1:
+            chunk.expecting_but_found("when expecting an integer of at least 1")
+        return value
+
 
 api_url = Regex(r"^https?:\/\/.+\/api\/v1\/$")
 
@@ -22,6 +46,15 @@ plugin_specific = Map(
 
 plugins_list = Seq(Str() | plugin_specific)
 
+concurrency = Map(
+    {
+        Optional("cube_http"): PositiveInt(),
+        Optional("peer_http"): PositiveInt(),
+        Optional("docker_pull"): PositiveInt(),
+        Optional("docker_run"): PositiveInt(),
+    }
+)
+
 schema = Map(
     {
         Optional("version", default="1.2"): Regex(r"^1\.2$"),
@@ -54,5 +87,6 @@ schema = Map(
                 Optional("plugins", default=[]): EmptyList() | plugins_list,
             }
         ),
+        Optional("concurrency"): concurrency,
     }
 )
@@ -0,0 +1,88 @@
+"""
+Users given in a CSV or NDJSON file, instead of `cube.users` of the configuration.
+
+The file is read lazily, so that any number of users can be created using
+a constant amount of memory.
+"""
+
+import csv
+import itertools
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Iterable, Sequence, TextIO
+
+from aiochris.types import Username, Password
+
+from chrisomatic.spec.common import User
+from chrisomatic.spec.given import ValidationError
+
+_NDJSON_SUFFIXES = frozenset({".ndjson", ".jsonl"})
+
+
+@dataclass(frozen=True)
+class UserSource:
+    """
+    A file of users. Files named `*.ndjson` or `*.jsonl` have one JSON object per
+    line, other files are CSV with a header. Either way, every user has the fields
+    `username`, `password` and optionally `email`.
+    """
+
+    path: Path
+
+    @property
+    def is_ndjson(self) -> bool:
+        return self.path.suffix in _NDJSON_SUFFIXES
+
+    def fingerprint(self) -> str:
+        """
+        Identifies the content of the file, so that progress saved for a previous
+        version of the file is not used.
+        """
+        stat = self.path.stat()
+        return f"{self.path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def read(self, skip: int = 0) -> Iterator[User]:
+        """
+        Read users one by one, skipping the first `skip` users.
+
+        :raises ValidationError: if a user is invalid
+        """
+        with self.path.open(newline="") as f:
+            records = _ndjson_records(f) if self.is_ndjson else _csv_records(f)
+            for line, record in itertools.islice(records, skip, None):
+                yield _to_user(record, f"{self.path}:{line}")
+
+
+def _ndjson_records(f: TextIO) -> Iterator[tuple[int, object]]:
+    for line, text in enumerate(f, start=1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValidationError(f"{f.name}:{line}: {e}")
+
+
+def _csv_records(f: TextIO) -> Iterator[tuple[int, object]]:
+    reader = csv.DictReader(f)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _to_user(record: object, where: str) -> User:
+    if not isinstance(record, dict):
+        raise ValidationError(f"{where}: user must be an object")
+    username = record.get("username")
+    password = record.get("password")
+    if not username or not password:
+        raise ValidationError(f"{where}: username and password are required")
+    return User(Username(username), Password(password), record.get("email") or None)
+
+
+def batched(users: Iterable[User], size: int) -> Iterator[Sequence[User]]:
+    """
+    Split users into lists of at most `size`.
+    """
+    it = iter(users)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+import pytest
+
+
+@dataclass
+class FakeImages:
+    """
+    `aiodocker.Docker.images` of a Docker daemon which has the `local` images.
+    Pulls wait for `release` to be set.
+    """
+
+    local: list[dict]
+    calls: list[str] = field(default_factory=list)
+    pulled: list[str] = field(default_factory=list)
+    running: int = 0
+    max_running: int = 0
+    release: asyncio.Event = field(default_factory=asyncio.Event)
+
+    async def list(self):
+        self.calls.append("list")
+        return self.local
+
+    async def inspect(self, ref: str):
+        self.calls.append(f"inspect {ref}")
+        for image in self.local:
+            refs = image.get("RepoTags", []) + image.get("RepoDigests", [])
+            if ref == image["Id"] or ref in refs:
+                return {"Config": {}} | image
+        image_id = "sha256:" + hashlib.sha256(ref.encode()).hexdigest()
+        return {"Id": image_id, "RepoTags": [ref], "Config": {}}
+
+    async def pull(self, repo: str, tag: str, stream: bool):
+        self.pulled.append(f"{repo}:{tag}")
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await self.release.wait()
+        for n in range(100):
+            yield {
+                "id": "abc",
+                "status": "Downloading",
+                "progressDetail": {"current": n, "total": 100},
+            }
+        yield {"id": "abc", "status": "Pull complete"}
+        self.running -= 1
+
+
+@dataclass
+class FakeDocker:
+    images: FakeImages
+
+
+@pytest.fixture
+def fake_docker() -> Callable[[Iterable[dict]], FakeDocker]:
+    """
+    Create a fake `aiodocker.Docker` which has the given images.
+    """
+
+    def create(local: Iterable[dict] = ()) -> FakeDocker:
+        return FakeDocker(FakeImages(list(local)))
+
+    return create
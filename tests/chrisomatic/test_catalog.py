@@ -0,0 +1,176 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from types import SimpleNamespace
+from typing import Any
+
+import yarl
+from serde import serde
+
+from chrisomatic.core.catalog import PluginCatalog, ComputeResourceIndex
+from chrisomatic.core.plugins import RegisterPluginTask
+from chrisomatic.framework.limits import ResourceLimiter, Resource
+from chrisomatic.framework.task import Channel
+
+
+@serde
+@dataclass
+class _Plugin:
+    name: str
+    version: str
+    dock_image: str
+
+
+_PLUGINS = [
+    _Plugin("pl-dircopy", "2.1.2", "ghcr.io/fnndsc/pl-dircopy:2.1.2"),
+    _Plugin("pl-dircopy", "2.1.1", "ghcr.io/fnndsc/pl-dircopy:2.1.1"),
+    _Plugin("pl-tsdircopy", "1.2.1", "ghcr.io/fnndsc/pl-tsdircopy:1.2.1"),
+]
+
+
+@dataclass
+class _FakeResponse:
+    body: Any
+    status: int = 200
+
+    async def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+@dataclass
+class _FakeSession:
+    """Serves `_PLUGINS` two per page."""
+
+    requests: list[str] = field(default_factory=list)
+    delay: float = 0.0
+
+    @asynccontextmanager
+    async def get(self, url):
+        self.requests.append(str(url))
+        await asyncio.sleep(self.delay)
+        offset = int(yarl.URL(url).query.get("offset", 0))
+        results = [asdict(p) for p in _PLUGINS[offset : offset + 2]]
+        next_url = None
+        if offset + 2 < len(_PLUGINS):
+            next_url = f"https://example.com/api/v1/plugins/search/?offset={offset + 2}"
+        yield _FakeResponse({"next": next_url, "results": results})
+
+
+@dataclass
+class _FakeSearch:
+    url: yarl.URL
+    Item: type = _Plugin
+
+
+@dataclass
+class _FakeClient:
+    url: str = "https://example.com/api/v1/"
+    s: Any = field(default_factory=_FakeSession)
+    searches: int = 0
+
+    def search_plugins(self, **query) -> _FakeSearch:
+        self.searches += 1
+        return _FakeSearch((yarl.URL(self.url) / "plugins/search/").with_query(query))
+
+
+async def test_plugin_catalog():
+    client = _FakeClient()
+    catalog = PluginCatalog(client)
+    assert await catalog.search({"name_exact": "pl-dircopy"}) == _PLUGINS[0]
+    assert (
+        await catalog.search({"name_exact": "pl-dircopy", "version": "2.1.1"})
+        == _PLUGINS[1]
+    )
+    assert (
+        await catalog.search({"dock_image": "ghcr.io/fnndsc/pl-tsdircopy:1.2.1"})
+        == _PLUGINS[2]
+    )
+    assert await catalog.search({"name_exact": "pl-dircopy", "version": "9"}) is None
+    assert await catalog.search({"name_exact": "pl-dne"}) is None
+    assert client.searches == 1
+    assert len(client.s.requests) == 2
+
+
+async def test_peer_catalog_is_loaded_once():
+    client = _FakeClient(s=_FakeSession(delay=0.01))
+    limiter = ResourceLimiter({Resource.PEER_HTTP: 1})
+    catalog = PluginCatalog(client, limiter=limiter, resource=Resource.PEER_HTTP)
+    status = Channel("plugin", None)
+    queries = [{"name_exact": p.name, "version": p.version} for p in _PLUGINS] * 4
+    # every RegisterPluginTask searches the same catalog of a peer at the same time
+    found = await asyncio.gather(
+        *(RegisterPluginTask._get_first_plugin(catalog, q, status) for q in queries)
+    )
+    assert found == _PLUGINS * 4
+    assert client.searches == 1
+    assert len(client.s.requests) == 2
+    # later searches are answered from memory
+    assert await catalog.search({"name_exact": "pl-tsdircopy"}) == _PLUGINS[2]
+    assert await catalog.search({"name_exact": "pl-dne"}) is None
+    assert len(client.s.requests) == 2
+
+
+async def test_plugin_catalog_add():
+    catalog = PluginCatalog(_FakeClient())
+    new_plugin = _Plugin("pl-new", "1.0.0", "docker.io/fnndsc/pl-new:1.0.0")
+    assert await catalog.search({"name_exact": "pl-new"}) is None
+    catalog.add(new_plugin)
+    assert await catalog.search({"name_exact": "pl-new"}) is new_plugin
+
+
+async def test_plugin_catalog_holds_resource_per_request():
+    limiter = ResourceLimiter({Resource.CUBE_HTTP: 1})
+    catalog = PluginCatalog(_FakeClient(), limiter=limiter)
+    await catalog.load()
+    async with limiter.use(Resource.CUBE_HTTP):
+        # searching a loaded catalog makes no request, so it does not wait
+        search = catalog.search({"name_exact": "pl-tsdircopy"})
+        assert await asyncio.wait_for(search, timeout=1) == _PLUGINS[2]
+
+
+@dataclass
+class _ComputeResourceSession:
+    """Serves plugins searched by `compute_resource_id`."""
+
+    plugins_of: dict[int, list[int]]
+    filter_supported: bool = True
+    requests: list[str] = field(default_factory=list)
+    delay: float = 0.0
+
+    @asynccontextmanager
+    async def get(self, url):
+        self.requests.append(str(url))
+        await asyncio.sleep(self.delay)
+        query = yarl.URL(url).query
+        if self.filter_supported:
+            ids = self.plugins_of.get(int(query["compute_resource_id"]), [])
+        else:
+            ids = sorted({i for ids in self.plugins_of.values() for i in ids})
+        results = [{"id": i} for i in ids]
+        yield _FakeResponse({"count": len(ids), "next": None, "results": results})
+
+
+def _compute_resource(id: int, name: str) -> SimpleNamespace:
+    return SimpleNamespace(id=id, name=name)
+
+
+async def test_compute_resource_index():
+    session = _ComputeResourceSession({1: [10, 11], 2: [11]})
+    client = _FakeClient(s=session)
+    crs = [_compute_resource(1, "host"), _compute_resource(2, "gpu")]
+    index = ComputeResourceIndex(client, crs)
+    assert await index.get(10) == {"host"}
+    assert await index.get(11) == {"host", "gpu"}
+    assert await index.get(12) == frozenset()
+    # one request to check the filter, then one per compute resource
+    assert len(session.requests) == 3
+
+
+async def test_compute_resource_index_unsupported():
+    session = _ComputeResourceSession({1: [10]}, filter_supported=False)
+    index = ComputeResourceIndex(_FakeClient(s=session), [_compute_resource(1, "host")])
+    assert await index.get(10) is None
+    assert len(session.requests) == 1
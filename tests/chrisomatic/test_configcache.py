@@ -0,0 +1,58 @@
+import io
+from pathlib import Path
+
+import pytest
+from rich.console import Console
+
+from chrisomatic.spec.configcache import ConfigCache, CachedConfig
+from chrisomatic.spec.deserialize import deserialize_config
+
+_CONFIG = """
+on:
+  cube_url: http://localhost:8000/api/v1/
+  chris_superuser:
+    username: chris
+    password: chris1234
+cube:
+  compute_resource:
+    - name: host
+      url: http://localhost:5005/api/v1/
+      username: pfcon
+      password: pfcon1234
+"""
+
+
+def test_cached_config(tmp_path: Path):
+    cache = ConfigCache(tmp_path)
+    console = Console(quiet=True)
+    config = deserialize_config(_CONFIG, "chrisomatic.yml", console, cache)
+    assert cache.get(cache.key(_CONFIG, "chrisomatic.yml")).config == config
+    assert deserialize_config(_CONFIG, "chrisomatic.yml", console, cache) == config
+
+
+def test_cached_config_warnings(tmp_path: Path):
+    cache = ConfigCache(tmp_path)
+    console = Console(quiet=True)
+    config = deserialize_config(_CONFIG, "chrisomatic.yml", console, cache)
+    key = cache.key(_CONFIG, "chrisomatic.yml")
+    cache.put(key, CachedConfig(config, ("deprecated!",)))
+    file = io.StringIO()
+    console = Console(file=file)
+    assert deserialize_config(_CONFIG, "chrisomatic.yml", console, cache) == config
+    assert file.getvalue() == "deprecated!\n"
+
+
+def test_key_depends_on_environment(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    cache = ConfigCache(tmp_path)
+    monkeypatch.setenv("CHRIS_USERNAME", "alice")
+    key = cache.key("on: {}", "a.yml")
+    monkeypatch.setenv("CHRIS_USERNAME", "bob")
+    assert cache.key("on: {}", "a.yml") != key
+    assert cache.key("on: {}\n", "a.yml") != cache.key("on: {}", "a.yml")
+    assert cache.key("on: {}", "b.yml") != cache.key("on: {}", "a.yml")
+
+
+def test_corrupt_entry(tmp_path: Path):
+    cache = ConfigCache(tmp_path)
+    (tmp_path / f"{cache.key('x', 'a.yml')}.pickle").write_bytes(b"not a pickle")
+    assert cache.get(cache.key("x", "a.yml")) is None
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+
+from chrisomatic.core.connect_peers import (
+    PeerConnectionTask,
+    PeerCatalogTask,
+    PeerCatalogs,
+)
+from chrisomatic.framework.task import Channel, Outcome
+
+
+@dataclass
+class _FakeClient:
+    url: str
+    s: object = None
+
+
+@dataclass(frozen=True)
+class _FakeConnection(PeerConnectionTask):
+    async def run(self, status: Channel):
+        if "broken" in self.cube_url:
+            return Outcome.FAILED, None
+        return Outcome.NO_CHANGE, _FakeClient(self.cube_url)
+
+
+async def test_peer_catalogs_keep_order():
+    urls = ["https://a/api/v1/", "https://broken/api/v1/", "https://c/api/v1/"]
+    catalogs = PeerCatalogs(urls)
+    tasks = [PeerCatalogTask(_FakeConnection(url), catalogs) for url in urls]
+    outcomes = []
+    for task in reversed(tasks):
+        outcome, _ = await task.run(Channel(*task.first_status()))
+        outcomes.append(outcome)
+    # a broken peer is skipped, rather than failing the run
+    assert outcomes == [Outcome.NO_CHANGE] * 3
+    assert [catalog.url for catalog in catalogs] == [urls[0], urls[2]]
+    assert catalogs.broken() == frozenset({urls[1]})
@@ -0,0 +1,155 @@
+import json
+from dataclasses import dataclass
+
+import pytest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiochris.types import Username, Password
+
+from chrisomatic.core.create_users import list_usernames, CreateUsersTask
+from chrisomatic.framework.task import Channel, Outcome
+from chrisomatic.helpers.bulkusers import (
+    BulkUserCreation,
+    BulkResult,
+    create_users_script,
+    parse_results,
+    users_payload,
+)
+from chrisomatic.spec.common import User
+
+
+@dataclass
+class _FakeAdmin:
+    url: str
+    s: aiohttp.ClientSession
+    name: str = "chris"
+
+    async def username(self) -> str:
+        return self.name
+
+
+def _all_users_app(names: list[str]) -> web.Application:
+    """
+    A CUBE where the members of the `all_users` group can be listed,
+    but `users/` is always empty.
+    """
+
+    async def empty_users(_request: web.Request) -> web.Response:
+        return web.json_response({"next": None, "results": []})
+
+    async def groups(request: web.Request) -> web.Response:
+        assert request.query["name"] == "all_users"
+        users_url = str(request.url.with_path("/api/v1/groups/1/users/"))
+        group = {"id": 1, "name": "all_users", "users": users_url}
+        return web.json_response({"next": None, "results": [group]})
+
+    async def group_users(request: web.Request) -> web.Response:
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query["limit"])
+        next_url = None
+        if offset + limit < len(names):
+            next_url = str(request.url.with_query(limit=limit, offset=offset + limit))
+        results = [
+            {"group_name": "all_users", "user_username": n}
+            for n in names[offset : offset + limit]
+        ]
+        return web.json_response({"next": next_url, "results": results})
+
+    app = web.Application()
+    app.router.add_get("/api/v1/users/", empty_users)
+    app.router.add_get("/api/v1/groups/search/", groups)
+    app.router.add_get("/api/v1/groups/1/users/", group_users)
+    return app
+
+
+async def test_list_usernames():
+    names = ["chris", *(f"user{i}" for i in range(4))]
+    async with TestServer(_all_users_app(names)) as server:
+        async with aiohttp.ClientSession() as session:
+            admin = _FakeAdmin(str(server.make_url("/api/v1/")), session)
+            usernames = await list_usernames(admin, page_size=2)
+    assert usernames == frozenset(names)
+
+
+async def test_list_usernames_without_admin():
+    async with TestServer(_all_users_app(["user0"])) as server:
+        async with aiohttp.ClientSession() as session:
+            admin = _FakeAdmin(str(server.make_url("/api/v1/")), session)
+            assert await list_usernames(admin) is None
+
+
+async def test_list_usernames_not_allowed():
+    app = web.Application()
+    async with TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            admin = _FakeAdmin(str(server.make_url("/api/v1/")), session)
+            assert await list_usernames(admin) is None
+
+
+async def test_existing_user_is_not_logged_in():
+    user = User(Username("alice"), Password("password"))
+    task = CreateUsersTask(
+        "http://localhost:0/api/v1/", user, existing=frozenset({"alice"})
+    )
+    outcome, _ = await task.run(Channel(*task.first_status()))
+    assert outcome is Outcome.NO_CHANGE
+
+
+def test_create_users_script():
+    compile(create_users_script(), "<script>", "exec")
+    users = [User(Username("bob"), Password('it\'s\n"quoted"'), "bob@example.org")]
+    payload = users_payload(users)
+    assert payload.count(b"\n") == 1 and payload.endswith(b"\n")
+    assert json.loads(payload) == [
+        {"username": "bob", "password": 'it\'s\n"quoted"', "email": "bob@example.org"}
+    ]
+
+
+def test_parse_results():
+    output = 'some noise\nCHRISOMATIC_RESULT {"alice": "created", "bob": "exists"}\n'
+    assert parse_results(output) == {
+        "alice": BulkResult.CREATED,
+        "bob": BulkResult.EXISTS,
+    }
+    assert parse_results("Traceback (most recent call last):\n") is None
+    with pytest.raises(ValueError):
+        parse_results('CHRISOMATIC_RESULT {"alice": "crea')
+    with pytest.raises(ValueError):
+        parse_results('CHRISOMATIC_RESULT {"alice": "maybe"}')
+
+
+@dataclass
+class _FakeBulk(BulkUserCreation):
+    calls: int = 0
+
+    async def _exec(self):
+        self.calls += 1
+        return {"alice": BulkResult.CREATED, "bob": BulkResult.EXISTS}
+
+
+async def test_users_are_created_in_bulk_once():
+    users = [User(Username(n), Password("password")) for n in ("alice", "bob")]
+    bulk = _FakeBulk(None, users)
+    outcomes = []
+    for user in users:
+        task = CreateUsersTask(
+            "http://localhost:0/api/v1/", user, existing=frozenset(), bulk=bulk
+        )
+        outcome, _ = await task.run(Channel(*task.first_status()))
+        outcomes.append(outcome)
+    assert outcomes == [Outcome.CHANGE, Outcome.NO_CHANGE]
+    assert bulk.calls == 1
+
+
+@dataclass
+class _MalformedBulk(BulkUserCreation):
+    async def _exec(self):
+        return parse_results('CHRISOMATIC_RESULT ["alice"]')
+
+
+async def test_malformed_bulk_results_fall_back():
+    users = [User(Username("alice"), Password("password"))]
+    bulk = _MalformedBulk(None, users)
+    assert await bulk.get(Username("alice")) is BulkResult.ERROR
@@ -1,4 +1,8 @@
+import pytest
+import strictyaml
+
 from chrisomatic.spec.given import GivenCube, GivenCubePlugin
+from chrisomatic.spec.schema import schema
 from serde import from_dict
 
 
@@ -67,3 +71,15 @@ def test_deserialization_untagged_union():
     )
     actual: GivenCube = from_dict(GivenCube, data)
     assert expected.plugins == actual.plugins
+
+
+def test_concurrency_limits_must_be_positive():
+    text = (
+        "on:\n  cube_url: http://localhost:8000/api/v1/\ncube:\n  compute_resource:\n"
+        "    - name: host\nconcurrency:\n  docker_pull: {}\n"
+    )
+    assert strictyaml.load(text.format(2), schema).data["concurrency"] == {
+        "docker_pull": 2
+    }
+    with pytest.raises(strictyaml.YAMLValidationError, match="at least 1"):
+        strictyaml.load(text.format(0), schema)
@@ -0,0 +1,95 @@
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import yarl
+
+from chrisomatic.core.catalog import PeerCatalogCache, CachedCatalog
+from chrisomatic.helpers.diskcache import DiskCache
+
+
+def test_disk_cache(tmp_path: Path):
+    cache = DiskCache(tmp_path / "something")
+    assert cache.get("https://example.com/api/v1/") is None
+    cache.put("https://example.com/api/v1/", {"hello": [1, 2, 3]})
+    assert cache.get("https://example.com/api/v1/") == {"hello": [1, 2, 3]}
+    assert cache.get("https://example.org/api/v1/") is None
+    cache.path_for("https://example.com/api/v1/").write_text("not json")
+    assert cache.get("https://example.com/api/v1/") is None
+
+
+@dataclass
+class _FakeResponse:
+    status: int
+    body: Any = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    async def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+@dataclass
+class _FakeSession:
+    responses: list[_FakeResponse]
+    requests: list[dict[str, str]] = field(default_factory=list)
+
+    @asynccontextmanager
+    async def get(self, url, headers=None):
+        self.requests.append(headers or {})
+        yield self.responses.pop(0)
+
+
+@dataclass
+class _FakeClient:
+    s: _FakeSession
+    url: str = "https://example.com/api/v1/"
+    collection_links: dict = field(default_factory=dict)
+
+
+_FIRST_PAGE = yarl.URL("https://example.com/api/v1/plugins/search/?limit=100")
+
+
+async def test_peer_catalog_cache(tmp_path: Path):
+    cache = PeerCatalogCache(DiskCache(tmp_path), ttl=60.0)
+    pages = [
+        _FakeResponse(
+            200,
+            {"next": "https://example.com/page2", "results": [{"name": "a"}]},
+            {"ETag": '"v1"'},
+        ),
+        _FakeResponse(200, {"next": None, "results": [{"name": "b"}]}),
+    ]
+    session = _FakeSession(pages)
+    client = _FakeClient(session)
+    expected = [{"name": "a"}, {"name": "b"}]
+    assert await cache.get_plugins(client, _FIRST_PAGE) == expected
+    assert len(session.requests) == 2
+
+    # fresh: no requests at all
+    assert await cache.get_plugins(client, _FIRST_PAGE) == expected
+    assert len(session.requests) == 2
+    assert cache.get_fresh(client.url) is not None
+
+    # stale: revalidated with a conditional request
+    entry = cache.get(client.url)
+    cache.cache.put(client.url, _to_stale(entry))
+    assert cache.get_fresh(client.url) is None
+    session.responses.append(_FakeResponse(304))
+    assert await cache.get_plugins(client, _FIRST_PAGE) == expected
+    assert session.requests[-1] == {"If-None-Match": '"v1"'}
+    assert cache.get_fresh(client.url) is not None
+
+
+def _to_stale(entry: CachedCatalog) -> dict:
+    return {
+        "fetched": time.time() - 3600.0,
+        "etag": entry.etag,
+        "last_modified": entry.last_modified,
+        "collection_links": entry.collection_links,
+        "plugins": entry.plugins,
+    }
@@ -0,0 +1,89 @@
+import pytest
+import strictyaml
+
+from chrisomatic.spec import fastload
+from chrisomatic.spec.schema import schema
+
+pytest.importorskip("yaml")
+
+_validate = fastload.compile_validator(schema)
+
+_VALID = [
+    # docs/examples/default.yml
+    """
+version: 1.2
+
+on:
+  cube_url: http://localhost:8000/api/v1/
+  chris_superuser:
+    username: chris
+    password: chris1234
+  public_store:
+     - https://cube.chrisproject.org/api/v1/
+
+cube:
+  compute_resource:
+    - name: host
+      url: http://localhost:5005/api/v1/
+      username: pfcon
+      password: pfcon1234
+      description: Local compute environment
+""",
+    """
+on:
+  cube_url: http://localhost:8000/api/v1/
+  chris_superuser:
+    username: chris
+    password: 1234
+cube:
+  users:
+  compute_resource:
+    - name: host
+      url: http://localhost:5005/api/v1/
+      innetwork: yes
+  plugins:
+    - pl-dircopy
+    - name: pl-tsdircopy
+      version: 1.2.1
+      compute_resource:
+        - host
+concurrency:
+  docker_pull: 4
+""",
+]
+
+_INVALID = [
+    # not matching the schema
+    "on:\n  cube_url: http://localhost:8000/\ncube:\n  compute_resource:\n"
+    "    - name: host\n",
+    "on:\n  cube_url: http://localhost:8000/api/v1/\n",
+    "on:\n  cube_url: http://localhost:8000/api/v1/\ncube:\n  compute_resource:\n"
+    "    - name: host\n      innetwork: maybe\n",
+    "on:\n  cube_url: http://localhost:8000/api/v1/\ncube:\n  compute_resource:\n"
+    "    - name: host\nconcurrency:\n  docker_pull: 0\n",
+    # syntax which StrictYAML disallows
+    "on: {cube_url: http://localhost:8000/api/v1/}\ncube:\n  compute_resource:\n"
+    "    - name: host\n",
+    "on:\n  cube_url: &url http://localhost:8000/api/v1/\ncube:\n  compute_resource:\n"
+    "    - name: *url\n",
+    "on:\n  cube_url: http://localhost:8000/api/v1/\n  cube_url: http://a/api/v1/\n"
+    "cube:\n  compute_resource:\n    - name: host\n",
+    "",
+    "[",
+]
+
+
+@pytest.mark.parametrize("text", _VALID)
+def test_same_data_as_strictyaml(text: str):
+    assert fastload.load(text, _validate) == strictyaml.load(text, schema).data
+
+
+@pytest.mark.parametrize("text", _INVALID)
+def test_defers_to_strictyaml(text: str):
+    assert fastload.load(text, _validate) is None
+
+
+def test_unsupported_validator():
+    with pytest.raises(NotImplementedError):
+        fastload.compile_validator(strictyaml.Map({"a": strictyaml.Any()}))
+
@@ -0,0 +1,53 @@
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+from rich.console import RenderableType
+
+from chrisomatic.framework.graph import TaskGraph
+from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
+
+
+@dataclass
+class _LogTask(ChrisomaticTask[str]):
+    name: str
+    log: list[str]
+    delay: float = 0.0
+    outcome: Outcome = Outcome.CHANGE
+
+    def first_status(self) -> tuple[str, RenderableType]:
+        return self.name, "started"
+
+    async def run(self, status: Channel) -> tuple[Outcome, str]:
+        await asyncio.sleep(self.delay)
+        self.log.append(self.name)
+        return self.outcome, self.name
+
+
+async def test_task_graph():
+    log = []
+    graph = TaskGraph()
+    slow = graph.add(_LogTask("slow", log, delay=0.02, outcome=Outcome.FAILED))
+    fast = graph.add(_LogTask("fast", log, delay=0.01))
+    graph.add(_LogTask("after_slow", log), after=[slow])
+    graph.add(_LogTask("after_fast", log), after=[fast])
+    graph.add(_LogTask("independent", log))
+
+    results = await asyncio.gather(
+        *(node.run(Channel(*node.first_status())) for node in reversed(graph.nodes))
+    )
+    assert log == ["independent", "fast", "after_fast", "slow", "after_slow"]
+    assert [r for _, r in results] == [
+        "independent",
+        "after_fast",
+        "after_slow",
+        "fast",
+        "slow",
+    ]
+    assert await slow.wait() is Outcome.FAILED
+
+
+def test_task_graph_foreign_node():
+    node = TaskGraph().add(_LogTask("a", []))
+    with pytest.raises(ValueError):
+        TaskGraph().add(_LogTask("b", []), after=[node])
@@ -0,0 +1,39 @@
+import aiohttp
+import yarl
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from chrisomatic.helpers.httpstats import HttpStats, endpoint_of
+
+
+def test_endpoint_of():
+    url = yarl.URL("http://chris:8000/api/v1/plugins/12/?limit=10")
+    assert endpoint_of("GET", url) == "GET http://chris:8000/api/v1/plugins/{id}/"
+
+
+async def test_http_stats():
+    async def handler(request: web.Request) -> web.Response:
+        if request.match_info["id"] == "500":
+            return web.Response(status=500)
+        return web.json_response({"id": request.match_info["id"]})
+
+    app = web.Application()
+    app.router.add_get("/api/v1/things/{id}/", handler)
+    stats = HttpStats()
+    async with TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            stats.attach(session)
+            for i in (1, 2, 500):
+                async with session.get(server.make_url(f"/api/v1/things/{i}/")) as res:
+                    await res.read()
+
+    ((endpoint, endpoint_stats),) = stats.endpoints.items()
+    assert endpoint.endswith("/api/v1/things/{id}/")
+    assert endpoint_stats.requests == 3
+    assert endpoint_stats.errors == 1
+    assert endpoint_stats.retries == 0
+    assert endpoint_stats.new_connections == 1
+    assert endpoint_stats.reused_connections == 2
+    assert endpoint_stats.bytes_received > 0
+    assert len(endpoint_stats.latencies) == 3
+    assert stats.to_dict()["total"]["requests"] == 3
@@ -0,0 +1,55 @@
+from aiodocker import DockerError
+
+from chrisomatic.core.expand import is_local_image
+from chrisomatic.core.images import ImageIndex, normalize_ref
+
+_ALPINE = {
+    "Id": "sha256:" + "a" * 64,
+    "RepoTags": ["alpine:latest"],
+    "RepoDigests": ["alpine@sha256:" + "b" * 64],
+}
+_DIRCOPY = {
+    "Id": "sha256:" + "c" * 64,
+    "RepoTags": ["ghcr.io/fnndsc/pl-dircopy:2.1.1"],
+    "RepoDigests": [],
+}
+_DANGLING = {"Id": "sha256:" + "d" * 64, "RepoTags": ["<none>:<none>"]}
+
+
+def test_normalize_ref():
+    assert normalize_ref("python") == "docker.io/library/python:latest"
+    assert normalize_ref("docker.io/library/python:latest") == normalize_ref("python")
+    assert normalize_ref("fnndsc/pl-dircopy:2") == "docker.io/fnndsc/pl-dircopy:2"
+    assert normalize_ref("localhost:5000/pl-x") == "localhost:5000/pl-x:latest"
+    assert (
+        normalize_ref("ghcr.io/fnndsc/pl-x@sha256:abc")
+        == "ghcr.io/fnndsc/pl-x@sha256:abc"
+    )
+    assert normalize_ref("https://cube.chrisproject.org/api/v1/") is None
+    assert normalize_ref("<none>:<none>") is None
+
+
+async def test_image_index(fake_docker):
+    docker = fake_docker([_ALPINE, _DIRCOPY, _DANGLING])
+    index = ImageIndex(docker)
+    assert await index.has("docker.io/library/alpine")
+    assert await index.has("alpine@sha256:" + "b" * 64)
+    assert await index.has("ghcr.io/fnndsc/pl-dircopy:2.1.1")
+    assert await index.has("c" * 12)
+    assert not await index.has("ghcr.io/fnndsc/pl-dircopy:2.1.0")
+    assert not await is_local_image(docker, "pl-dne", index)
+    assert docker.images.calls == ["list"]
+
+    await index.inspect("alpine")
+    await index.inspect("alpine:latest")
+    assert docker.images.calls == ["list", "inspect " + _ALPINE["Id"]]
+
+
+async def test_image_index_unavailable(fake_docker):
+    docker = fake_docker()
+
+    async def broken_list():
+        raise DockerError(500, {"message": "daemon unavailable"})
+
+    docker.images.list = broken_list
+    assert not await is_local_image(docker, "alpine", ImageIndex(docker))
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from chrisomatic.framework.aimd import AimdLimit
+from chrisomatic.framework.limits import (
+    ResourceLimiter,
+    Resource,
+    DEFAULT_LIMITS,
+    parse_limit,
+)
+
+
+async def test_resource_limiter():
+    limiter = ResourceLimiter({Resource.DOCKER_PULL: 2})
+    running = 0
+    most_running = 0
+
+    async def use_docker_pull():
+        nonlocal running, most_running
+        async with limiter.use(Resource.DOCKER_PULL):
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(use_docker_pull() for _ in range(10)))
+    assert most_running == 2
+
+
+async def test_resource_limiter_unlimited():
+    limiter = ResourceLimiter({Resource.DOCKER_PULL: 1})
+    async with limiter.use(Resource.DOCKER_PULL):
+        async with limiter.use(Resource.CUBE_HTTP):
+            pass
+
+
+def test_from_overrides():
+    limiter = ResourceLimiter.from_overrides(
+        {Resource.DOCKER_PULL: 2, Resource.DOCKER_RUN: 3}, {Resource.DOCKER_PULL: 1}
+    )
+    assert limiter.limits[Resource.DOCKER_PULL] == 1
+    assert limiter.limits[Resource.DOCKER_RUN] == 3
+    assert limiter.limits[Resource.CUBE_HTTP] == DEFAULT_LIMITS[Resource.CUBE_HTTP]
+
+
+def test_parse_limit():
+    assert parse_limit("docker_pull=2") == (Resource.DOCKER_PULL, 2)
+    with pytest.raises(ValueError):
+        parse_limit("docker_pull")
+    with pytest.raises(ValueError):
+        parse_limit("something=2")
+    with pytest.raises(ValueError):
+        parse_limit("docker_pull=0")
+    with pytest.raises(ValueError):
+        parse_limit("docker_pull=many")
+    with pytest.raises(ValueError):
+        ResourceLimiter({Resource.DOCKER_PULL: 0})
+
+
+async def test_aimd_limit():
+    limit = AimdLimit(max_limit=8, initial=2, is_congestion=lambda e: True)
+    running = 0
+    most_running = 0
+
+    async def use(fail: bool):
+        nonlocal running, most_running
+        async with limit.use():
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            if fail:
+                raise ValueError()
+
+    await asyncio.gather(*(use(False) for _ in range(50)))
+    assert most_running <= 8
+    assert limit.limit > 2
+    grown = limit.limit
+
+    results = await asyncio.gather(
+        *(use(True) for _ in range(4)), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    # errors from concurrent operations only reduce the limit once
+    assert limit.limit == max(grown * 0.5, 1)
+    assert limit.trajectory[0] == (0.0, 2)
+
+
+async def test_resource_limiter_adaptive():
+    limiter = ResourceLimiter(
+        {Resource.CUBE_HTTP: 4}, adaptive={Resource.CUBE_HTTP: lambda e: False}
+    )
+    assert limiter.adaptive_limits[Resource.CUBE_HTTP].limit == 2
+    async with limiter.use(Resource.CUBE_HTTP):
+        pass
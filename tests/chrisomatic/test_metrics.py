@@ -0,0 +1,71 @@
+import asyncio
+import io
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from rich.console import RenderableType
+
+from chrisomatic.framework.graph import TaskGraph
+from chrisomatic.framework.limits import ResourceLimiter, Resource
+from chrisomatic.framework.metrics import Metrics, Histogram
+from chrisomatic.framework.ndjson import NdjsonTaskRunner, NdjsonWriter
+from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
+
+
+@dataclass
+class _LimitedTask(ChrisomaticTask[None]):
+    limiter: ResourceLimiter
+
+    def first_status(self) -> tuple[str, RenderableType]:
+        return "limited", "waiting"
+
+    async def run(self, status: Channel) -> tuple[Outcome, None]:
+        async with self.limiter.use(Resource.DOCKER_RUN):
+            await asyncio.sleep(0.02)
+        return Outcome.CHANGE, None
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in (0.001, 0.2, 0.2, 1000.0):
+        histogram.observe(value)
+    cumulative = dict(histogram.cumulative())
+    assert cumulative["0.01"] == 1
+    assert cumulative["0.25"] == 3
+    assert cumulative["300.0"] == 3
+    assert cumulative["+Inf"] == 4
+    assert histogram.count == 4
+
+
+async def test_metrics(tmp_path: Path):
+    metrics = Metrics()
+    limiter = ResourceLimiter({Resource.DOCKER_RUN: 1})
+    graph = TaskGraph()
+    first = graph.add(_LimitedTask(limiter))
+    graph.add(_LimitedTask(limiter))
+    graph.add(_LimitedTask(limiter), after=[first])
+    runner = NdjsonTaskRunner(
+        tasks=graph.nodes, metrics=metrics, writer=NdjsonWriter(io.StringIO())
+    )
+    with metrics.phase("limited"):
+        await runner.apply()
+
+    stats = metrics.tasks["_LimitedTask"]
+    assert stats.outcomes[Outcome.CHANGE] == 3
+    assert stats.durations.count == 3
+    assert stats.queue_wait >= 0.03
+    assert metrics.phases["limited"] >= 0.06
+    metrics.task_phases({"_LimitedTask": "limited.tasks", "_Missing": "missing"})
+    assert 0.06 <= metrics.phases["limited.tasks"] <= metrics.phases["limited"]
+    assert "missing" not in metrics.phases
+
+    json_file = tmp_path / "metrics.json"
+    metrics.write(json_file)
+    assert json.loads(json_file.read_text())["tasks"]["_LimitedTask"]["count"] == 3
+
+    prom_file = tmp_path / "metrics.prom"
+    metrics.write(prom_file)
+    prom = prom_file.read_text()
+    assert 'chrisomatic_task_duration_seconds_count{kind="_LimitedTask"} 3' in prom
+    assert 'chrisomatic_phase_duration_seconds{phase="limited"}' in prom
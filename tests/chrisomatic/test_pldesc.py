@@ -0,0 +1,107 @@
+from pathlib import Path
+
+from aiochris.types import ImageTag, PluginName
+
+from chrisomatic.framework.task import Channel
+from chrisomatic.helpers.diskcache import DiskCache
+from chrisomatic.helpers.pldesc import (
+    DescriptionCache,
+    try_obtain_json_description,
+    lineage_of,
+    rank_methods,
+)
+from chrisomatic.spec.given import GivenCubePlugin
+
+_DIGEST = "sha256:" + "e" * 64
+_IMAGE = "docker.io/fnndsc/pl-simpledsapp@" + _DIGEST
+
+
+async def test_description_cache_pinned_by_digest(tmp_path: Path):
+    cache = DescriptionCache(DiskCache(tmp_path))
+    plugin = GivenCubePlugin(dock_image=ImageTag(_IMAGE))
+    status = Channel("pl-simpledsapp", None)
+    assert await try_obtain_json_description(None, plugin, status, cache) is None
+    assert cache.stats.misses == 1
+
+    cache.put(_DIGEST, plugin, "chris_plugin_info_post030", '{"a": 1}')
+    assert await try_obtain_json_description(None, plugin, status, cache) == '{"a": 1}'
+    assert cache.stats.hits == 1
+    assert cache.stats.bytes_read == len('{"a": 1}')
+
+    other_plugin = GivenCubePlugin(dock_image=ImageTag(_IMAGE), name=PluginName("pl-b"))
+    assert cache.get(_DIGEST, other_plugin) is None
+
+
+async def test_digest_miss_is_counted_once(tmp_path: Path, fake_docker):
+    image_id = "sha256:" + "f" * 64
+    docker = fake_docker([{"Id": image_id, "RepoTags": [], "RepoDigests": [_IMAGE]}])
+    cache = DescriptionCache(DiskCache(tmp_path))
+    plugin = GivenCubePlugin(dock_image=ImageTag(_IMAGE))
+    cache.put(image_id, plugin, "old_chrisapp", '{"a": 1}')
+    status = Channel("pl-simpledsapp", None)
+    json_repr = await try_obtain_json_description(docker, plugin, status, cache)
+    assert json_repr == '{"a": 1}'
+    assert cache.stats.misses == 0
+    assert cache.stats.hits == 1
+
+
+def test_malformed_entries_are_misses(tmp_path: Path):
+    cache = DescriptionCache(DiskCache(tmp_path))
+    plugin = GivenCubePlugin(dock_image=ImageTag(_IMAGE))
+    for entry in ({"json": 1}, ["not", "a", "dict"], {"method": "old_chrisapp"}):
+        cache.cache.put(cache._key(_DIGEST, plugin), entry)
+        assert cache.get(_DIGEST, plugin) is None
+    assert cache.stats.misses == 3
+    assert cache.stats.hits == 0
+
+
+def test_bytes_are_counted(tmp_path: Path):
+    cache = DescriptionCache(DiskCache(tmp_path))
+    plugin = GivenCubePlugin(dock_image=ImageTag(_IMAGE))
+    cache.put(_DIGEST, plugin, "old_chrisapp", '"café"')
+    assert cache.get(_DIGEST, plugin) == '"café"'
+    assert cache.stats.bytes_written == cache.stats.bytes_read == 7
+
+
+def _image_info(layers: list[str], cmd: list[str], env: tuple[str, ...] = ()) -> dict:
+    return {"RootFS": {"Layers": layers}, "Config": {"Cmd": cmd, "Env": list(env)}}
+
+
+def test_rank_methods():
+    chris_plugin = _image_info(["sha256:a", "sha256:b"], ["dircopy"])
+    assert rank_methods(chris_plugin)[0] == "chris_plugin_info_post030"
+    chrisapp = _image_info(["sha256:a"], ["simpledsapp", "--help"], ["APPROOT=/a"])
+    assert rank_methods(chrisapp)[0] == "old_chrisapp"
+    # the image's own metadata wins over a shared lineage
+    assert rank_methods(chrisapp, "chris_plugin_info_pre030") == [
+        "old_chrisapp",
+        "chris_plugin_info_pre030",
+        "chris_plugin_info_post030",
+    ]
+    assert rank_methods(chris_plugin, "chris_plugin_info_pre030") == [
+        "chris_plugin_info_pre030",
+        "chris_plugin_info_post030",
+        "old_chrisapp",
+    ]
+
+
+def test_remembered_method_by_lineage(tmp_path: Path):
+    base = ["sha256:base1", "sha256:base2"]
+    first = lineage_of(_image_info([*base, "sha256:one"], ["a"]))
+    second = lineage_of(_image_info([*base, "sha256:two"], ["b"]))
+    unrelated = lineage_of(_image_info(["sha256:other"], ["c"]))
+    assert len(first) == 3 and first[1:] == second[1:]
+
+    cache = DescriptionCache(DiskCache(tmp_path))
+    cache.remember_method(first, "old_chrisapp")
+    assert cache.remembered_method(second) == "old_chrisapp"
+    assert cache.remembered_method(unrelated) is None
+    # the most similar image wins
+    cache.remember_method(second, "chris_plugin_info_pre030")
+    assert cache.remembered_method(first) == "old_chrisapp"
+    # and it is persisted when saved
+    assert DescriptionCache(DiskCache(tmp_path)).remembered_method(second) is None
+    cache.save()
+    assert DescriptionCache(DiskCache(tmp_path)).remembered_method(second) == (
+        "chris_plugin_info_pre030"
+    )
@@ -0,0 +1,122 @@
+import asyncio
+import io
+
+from rich.console import Console
+
+from chrisomatic.core.docker import (
+    PullScheduler,
+    PullResult,
+    PullProgress,
+    _PullTracker,
+    rich_pull,
+)
+from chrisomatic.core.images import ImageIndex
+from chrisomatic.framework.task import Channel
+
+
+def _status() -> Channel:
+    return Channel("plugin", "checking...")
+
+
+async def test_identical_pulls_are_merged(fake_docker):
+    docker = fake_docker()
+    pulls = PullScheduler(docker)
+    a, b = _status(), _status()
+    results = asyncio.gather(
+        pulls.pull("fnndsc/pl-x:1", a), pulls.pull("docker.io/fnndsc/pl-x:1", b)
+    )
+    await asyncio.sleep(0)
+    docker.images.release.set()
+    assert await results == [PullResult.pulled, PullResult.pulled]
+    assert docker.images.pulled == ["fnndsc/pl-x:1"]
+    assert a.title == b.title == "fnndsc/pl-x:1"
+
+
+async def test_concurrency_and_priority(fake_docker):
+    local = [{"Id": "sha256:" + "a" * 64, "RepoTags": ["fnndsc/pl-warm:1"]}]
+    docker = fake_docker(local)
+    images = ImageIndex(docker)
+    pulls = PullScheduler(docker, max_concurrent=1, images=images)
+    cold = [f"fnndsc/pl-cold{i}:1" for i in range(3)]
+    tasks = [asyncio.create_task(pulls.pull(image, _status())) for image in cold]
+    await asyncio.sleep(0.01)
+    warm = asyncio.create_task(pulls.pull_if_missing("fnndsc/pl-warm:2", _status()))
+    await asyncio.sleep(0.01)
+    docker.images.release.set()
+    await asyncio.gather(*tasks, warm)
+    assert docker.images.max_running == 1
+    # the first pull started before the warm image was requested
+    assert docker.images.pulled == [
+        "fnndsc/pl-cold0:1",
+        "fnndsc/pl-warm:2",
+        "fnndsc/pl-cold1:1",
+        "fnndsc/pl-cold2:1",
+    ]
+    assert await images.has("fnndsc/pl-warm:2")
+
+
+def test_pull_tracker_totals():
+    tracker = _PullTracker()
+    events = [
+        {"id": "a", "status": "Already exists"},
+        {"id": "b", "status": "Waiting"},
+        *(
+            {
+                "id": "b",
+                "status": "Downloading",
+                "progressDetail": {"current": n, "total": 1000},
+            }
+            for n in range(0, 1000, 10)
+        ),
+        {
+            "id": "c",
+            "status": "Downloading",
+            "progressDetail": {"current": 5, "total": 50},
+        },
+        {"id": "b", "status": "Download complete"},
+        {"id": "b", "status": "Pull complete"},
+    ]
+    for event in events:
+        tracker.update(event)
+    progress = tracker.snapshot()
+    assert progress == PullProgress(
+        completed=1005, total=1050, layers_done=2, layers_total=3
+    )
+    file = io.StringIO()
+    Console(file=file, width=120).print(progress)
+    assert "2/3 layers" in file.getvalue()
+    assert "(b)" not in file.getvalue()
+
+    tracker.detail = True
+    assert [layer.description for layer in tracker.snapshot().layers] == [
+        "(a) Already exists",
+        "(b) Pull complete",
+        "(c) Downloading",
+    ]
+
+
+async def test_progress_is_throttled(fake_docker):
+    docker = fake_docker()
+    docker.images.release.set()
+    status = _status()
+    await rich_pull(docker, "fnndsc/pl-x:1", status)
+    # "pulling...", empty progress, and the final progress
+    assert status.version <= 4
+
+
+async def test_prefetch(fake_docker):
+    local = [{"Id": "sha256:" + "a" * 64, "RepoTags": ["fnndsc/pl-local:1"]}]
+    docker = fake_docker(local)
+    pulls = PullScheduler(docker, max_concurrent=1, images=ImageIndex(docker))
+    pulls.prefetch(["fnndsc/pl-local:1", "fnndsc/pl-a:1", "fnndsc/pl-b:1"])
+    await asyncio.sleep(0.01)
+    assert docker.images.pulled == ["fnndsc/pl-a:1"]
+    # needed now, so it is pulled before the rest of the prefetched images
+    needed = asyncio.create_task(pulls.pull_if_missing("fnndsc/pl-c:1", _status()))
+    prefetched = asyncio.create_task(pulls.pull_if_missing("fnndsc/pl-a:1", _status()))
+    await asyncio.sleep(0.01)
+    docker.images.release.set()
+    assert await prefetched == PullResult.pulled
+    assert await needed == PullResult.pulled
+    assert docker.images.pulled == ["fnndsc/pl-a:1", "fnndsc/pl-c:1", "fnndsc/pl-b:1"]
+    await pulls.close()
@@ -0,0 +1,81 @@
+import pytest
+
+from chrisomatic.framework.task import Channel
+from chrisomatic.helpers.retry import (
+    RetryWrapper,
+    RetryBudget,
+    CircuitBreakers,
+    CircuitOpenError,
+    current_attempt,
+)
+
+
+class _RetryOnValueError(RetryWrapper[int]):
+    def check_exception(self, e: BaseException) -> bool:
+        return isinstance(e, ValueError)
+
+
+def _flaky(failures: int, attempts: list[int]):
+    async def fn() -> int:
+        attempts.append(current_attempt())
+        if len(attempts) <= failures:
+            raise ValueError("flaky")
+        return 42
+
+    return fn
+
+
+async def test_retry_until_success():
+    attempts = []
+    retry = _RetryOnValueError(
+        _flaky(2, attempts), wait_min=0.001, wait_max=0.002, budget=RetryBudget()
+    )
+    assert await retry.call(Channel("test", None)) == 42
+    assert attempts == [0, 1, 2]
+
+
+async def test_retry_max_attempt():
+    attempts = []
+    retry = _RetryOnValueError(
+        _flaky(5, attempts), wait_min=0.001, wait_max=0.002, budget=RetryBudget()
+    )
+    with pytest.raises(ValueError):
+        await retry.call(Channel("test", None))
+    assert len(attempts) == 3
+
+
+async def test_retry_budget():
+    budget = RetryBudget(ratio=0.0, reserve=1.0)
+    attempts = []
+    retry = _RetryOnValueError(
+        _flaky(5, attempts), wait_min=0.001, wait_max=0.002, budget=budget
+    )
+    with pytest.raises(ValueError):
+        await retry.call(Channel("test", None))
+    assert len(attempts) == 2
+    assert budget.tokens == 0.0
+
+
+async def test_circuit_breaker():
+    breakers = CircuitBreakers(failure_threshold=2, reset_timeout=60.0)
+    attempts = []
+    retry = _RetryOnValueError(
+        _flaky(5, attempts),
+        wait_min=0.001,
+        wait_max=0.002,
+        host="example.com",
+        budget=RetryBudget(),
+        breakers=breakers,
+    )
+    with pytest.raises(CircuitOpenError):
+        await retry.call(Channel("test", None))
+    assert len(attempts) == 2
+    with pytest.raises(CircuitOpenError):
+        await retry.call(Channel("test", None))
+    assert len(attempts) == 2
+
+
+def test_backoff():
+    retry = _RetryOnValueError(_flaky(0, []), wait_min=1.0, wait_max=5.0)
+    assert all(0 <= retry.backoff(1) <= 2.0 for _ in range(100))
+    assert all(0 <= retry.backoff(10) <= 5.0 for _ in range(100))
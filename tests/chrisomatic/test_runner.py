@@ -0,0 +1,107 @@
+import asyncio
+import io
+import json
+from dataclasses import dataclass
+
+from rich.console import Console, RenderableType
+
+from chrisomatic.core.docker import PullProgress, LayerProgress
+from chrisomatic.framework.ndjson import NdjsonWriter, NdjsonTaskRunner
+from chrisomatic.framework.runner import (
+    TableTaskRunner,
+    TableDisplayConfig,
+    ProgressTaskRunner,
+)
+from chrisomatic.framework.task import ChrisomaticTask, Channel, Outcome
+
+
+@dataclass
+class _SleepTask(ChrisomaticTask[int]):
+    n: int
+
+    def first_status(self) -> tuple[str, RenderableType]:
+        return f"task {self.n}", "sleeping"
+
+    async def run(self, status: Channel) -> tuple[Outcome, int]:
+        await asyncio.sleep(0.001 * (self.n % 5))
+        status.replace("awake")
+        outcome = Outcome.FAILED if self.n % 10 == 0 else Outcome.CHANGE
+        return outcome, self.n
+
+
+async def test_table_task_runner_windowed():
+    file = io.StringIO()
+    console = Console(file=file, width=120, force_terminal=False)
+    config = TableDisplayConfig(polling_interval=0.001, max_rows=5)
+    runner = TableTaskRunner(
+        tasks=[_SleepTask(n) for n in range(100)], console=console, config=config
+    )
+    results = await runner.apply()
+    assert [r for _, r in results] == list(range(100))
+    output = file.getvalue()
+    assert "100/100 done" in output
+    assert "10 failed" in output
+    assert "5 more not shown" in output
+    assert "task 1 " not in output
+
+
+def test_channel_version():
+    changes = []
+    status = Channel("title", "first", lambda: changes.append(None))
+    assert status.version == 1
+    status.replace("second")
+    status.keep_current()
+    assert status.version == 3
+    assert len(changes) == 3
+
+
+async def test_progress_task_runner_prints_from_thread():
+    file = io.StringIO()
+    console = Console(file=file, width=120, force_terminal=False)
+    runner = ProgressTaskRunner(
+        tasks=[_SleepTask(n) for n in range(3)], console=console, noisy=True
+    )
+    results = await runner.apply()
+    assert [r for _, r in results] == [0, 1, 2]
+    output = file.getvalue()
+    for n in range(3):
+        assert f"[task {n}]" in output
+
+
+def test_pull_progress():
+    progress = PullProgress(
+        (LayerProgress("(abc) Downloading", 50, 100), LayerProgress("(def) Waiting"))
+    )
+    file = io.StringIO()
+    Console(file=file, width=120).print(progress)
+    assert "(abc) Downloading" in file.getvalue()
+    assert "50%" in file.getvalue()
+
+
+async def test_ndjson_task_runner():
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream)
+    runner = NdjsonTaskRunner(tasks=[_SleepTask(n) for n in (1, 10)], writer=writer)
+    results = await runner.apply()
+    assert [r for _, r in results] == [1, 10]
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(e["event"], e["id"]) for e in events] == [
+        ("start", 1),
+        ("start", 2),
+        ("status", 2),
+        ("finish", 2),
+        ("status", 1),
+        ("finish", 1),
+    ]
+    assert events[0]["status"] == "sleeping"
+    assert events[2]["status"] == "awake"
+    assert events[3]["outcome"] == "failed"
+
+
+def test_channel_bounded():
+    status = Channel("title", None, max_rows=3)
+    for i in range(10):
+        status.append(f"attempt {i}")
+    assert status.rows() == ("attempt 7", "attempt 8", "attempt 9")
+    status.keep_current()
+    assert status.rows() == ()
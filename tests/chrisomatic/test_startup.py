@@ -0,0 +1,60 @@
+"""
+`chrisomatic` runs as an init container, so the time it takes to start matters.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET = 0.3
+"""Maximum time to import `chrisomatic.cli.typer`, in seconds."""
+
+_LAZY_MODULES = ("aiohttp", "aiochris", "aiodocker", "serde", "strictyaml")
+"""
+Modules which should only be imported once `chrisomatic apply` runs.
+(`rich` is not one of them, because typer imports it.)
+"""
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    env = os.environ | {"PYTHONPATH": os.pathsep.join(sys.path)}
+    return subprocess.run(
+        [sys.executable, *args], env=env, capture_output=True, text=True, check=True
+    )
+
+
+def test_heavy_modules_are_imported_lazily():
+    result = _python(
+        "-c",
+        "import json, sys, chrisomatic.cli.typer; print(json.dumps(list(sys.modules)))",
+    )
+    imported = {name.split(".")[0] for name in json.loads(result.stdout)}
+    assert imported.isdisjoint(_LAZY_MODULES)
+
+
+def test_strictyaml_is_imported_lazily():
+    # a cached configuration is deserialized without StrictYAML
+    result = _python(
+        "-c",
+        "import json, sys, chrisomatic.spec.deserialize; "
+        "print(json.dumps(list(sys.modules)))",
+    )
+    assert "strictyaml" not in json.loads(result.stdout)
+
+
+def _import_time() -> float:
+    result = _python("-X", "importtime", "-c", "import chrisomatic.cli.typer")
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == "chrisomatic.cli.typer":
+            return int(cumulative) / 1_000_000
+    raise ValueError(f"chrisomatic.cli.typer not in output: {result.stderr}")
+
+
+def test_import_time_budget():
+    # best of a few runs, so that a busy machine does not fail the test
+    assert min(_import_time() for _ in range(3)) < IMPORT_TIME_BUDGET
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+
+from chrisomatic.helpers.journal import Journal
+from chrisomatic.spec.common import User
+from chrisomatic.spec.given import ValidationError
+from chrisomatic.spec.usersource import UserSource, batched
+
+
+def test_read_csv(tmp_path: Path):
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "username,password,email\n"
+        "alice,alice1234,alice@example.org\n"
+        "bob,bob12345,\n"
+    )
+    assert list(UserSource(path).read()) == [
+        User("alice", "alice1234", "alice@example.org"),
+        User("bob", "bob12345"),
+    ]
+
+
+def test_read_ndjson_skip(tmp_path: Path):
+    path = tmp_path / "users.ndjson"
+    path.write_text(
+        "".join(f'{{"username": "user{i}", "password": "pw{i}"}}\n' for i in range(5))
+    )
+    users = list(UserSource(path).read(skip=3))
+    assert [u.username for u in users] == ["user3", "user4"]
+
+
+def test_read_invalid(tmp_path: Path):
+    path = tmp_path / "users.jsonl"
+    path.write_text(
+        '{"username": "alice", "password": "alice1234"}\n{"username": "bob"}\n'
+    )
+    with pytest.raises(ValidationError, match=r"users.jsonl:2"):
+        list(UserSource(path).read())
+
+
+def test_batched():
+    users = [User(f"user{i}", "password") for i in range(5)]
+    assert [len(b) for b in batched(users, 2)] == [2, 2, 1]
+
+
+def test_journal(tmp_path: Path):
+    journal = Journal(tmp_path / "journal")
+    assert journal.done("a") == 0
+    journal.checkpoint("a", 100)
+    journal.checkpoint("a", 200)
+    assert journal.done("a") == 200
+    assert journal.done("b") == 0
+    # a crash while writing a checkpoint leaves an incomplete line
+    with (tmp_path / "journal").open("a") as f:
+        f.write('{"source": "a", "do')
+    assert journal.done("a") == 200